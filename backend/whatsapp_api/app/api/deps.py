@@ -3,40 +3,71 @@ from fastapi.security import OAuth2PasswordBearer
 from jose import jwt, JWTError
 from pydantic import ValidationError
 from datetime import datetime, timedelta
+import time
 
+from app.core.cache import TTLCache
 from app.core.config import app_settings
 from app.models.user import User, Role
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl=app_settings.token_url)
 
-async def get_current_user(token: str = Depends(oauth2_scheme)):
+# token -> (user_id, exp); entries never outlive the token itself
+_token_cache = TTLCache(maxsize=app_settings.auth_token_cache_size, ttl=app_settings.auth_user_cache_ttl)
+# user_id -> User; short TTL bounds staleness across workers
+_user_cache = TTLCache(maxsize=app_settings.auth_user_cache_size, ttl=app_settings.auth_user_cache_ttl)
+
+def invalidate_user_cache(user_id: str):
+    """Drop a cached user after it was updated or deactivated"""
+    _user_cache.pop(str(user_id))
+
+def _credentials_exception() -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        detail="Could not validate credentials",
+        headers={"WWW-Authenticate": "Bearer"},
+    )
+
+def decode_token(token: str) -> str:
+    """Return the user ID of a valid access token, caching the parsed token"""
+    cached = _token_cache.get(token)
+    if cached is not None:
+        user_id, expires_at = cached
+        if expires_at is None or expires_at > time.time():
+            return user_id
+        _token_cache.pop(token)
+        raise _credentials_exception()
+
     try:
         payload = jwt.decode(
             token, app_settings.secret_key, algorithms=["HS256"]
         )
         user_id = payload.get("sub")
         if user_id is None:
-            raise HTTPException(
-                status_code=status.HTTP_401_UNAUTHORIZED,
-                detail="Could not validate credentials",
-                headers={"WWW-Authenticate": "Bearer"},
-            )
+            raise _credentials_exception()
     except (JWTError, ValidationError):
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Could not validate credentials",
-            headers={"WWW-Authenticate": "Bearer"},
-        )
-        
-    user = await User.get(user_id)
+        raise _credentials_exception()
+
+    _token_cache.set(token, (user_id, payload.get("exp")))
+    return user_id
+
+async def get_user_from_token(token: str) -> User:
+    user_id = decode_token(token)
+    
+    user = _user_cache.get(user_id)
     if user is None:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="User not found"
-        )
+        user = await User.get(user_id)
+        if user is None:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="User not found"
+            )
+        _user_cache.set(user_id, user)
     
     return user
 
+async def get_current_user(token: str = Depends(oauth2_scheme)):
+    return await get_user_from_token(token)
+
 async def get_current_admin_user(current_user: User = Depends(get_current_user)):
     if current_user.role != Role.ADMIN:
         raise HTTPException(
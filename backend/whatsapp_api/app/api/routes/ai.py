@@ -2,7 +2,8 @@ from fastapi import APIRouter, Depends, HTTPException, status
 from typing import Dict, Any, Optional
 
 from app.models.ai_config import AIConfig
-from app.services.ai_assistant import AIAssistant, AIProvider
+from app.services.ai_assistant import AIAssistant, AIAssistantConfig, AIProvider
+from app.services.ai_cache import ai_reply_cache
 from app.api.deps import get_current_user
 from app.models.user import User, Role
 
@@ -70,6 +71,7 @@ async def update_ai_config(
         config.deepseek_url = config_data["deepseek_url"]
     
     await config.save()
+    ai_reply_cache.clear(current_user.tenant_id)
     
     return {
         "provider": config.provider,
@@ -79,6 +81,13 @@ async def update_ai_config(
         "deepseek_url": config.deepseek_url
     }
 
+@router.get("/cache/stats", response_model=Dict[str, Any])
+async def get_ai_cache_stats(current_user: User = Depends(get_current_user)):
+    """
+    AI reply cache hits and misses for the current tenant on this worker
+    """
+    return ai_reply_cache.stats(current_user.tenant_id)
+
 @router.post("/test-connection", response_model=Dict[str, Any])
 async def test_ai_connection(
     config_data: Dict[str, Any],
@@ -92,18 +101,23 @@ async def test_ai_connection(
         
         assistant = AIAssistant(
             tenant_id=current_user.tenant_id,
-            config={
-                "provider": provider,
-                "api_key": config_data.get("api_key"),
-                "model": config_data.get("model", "gpt-3.5-turbo"),
-                "temperature": float(config_data.get("temperature", 0.7)),
-                "max_tokens": int(config_data.get("max_tokens", 500)),
-                "deepseek_url": config_data.get("deepseek_url", "https://dayloul.sat.mr/api/v1/chat/completions")
-            }
+            config=AIAssistantConfig(
+                provider=provider,
+                api_key=config_data.get("api_key"),
+                model=config_data.get("model", "gpt-3.5-turbo"),
+                temperature=float(config_data.get("temperature", 0.7)),
+                max_tokens=int(config_data.get("max_tokens", 500)),
+                deepseek_url=config_data.get("deepseek_url", "https://dayloul.sat.mr/api/v1/chat/completions")
+            )
         )
         
         response = await assistant._get_ai_response("Hello, this is a test message.")
         
+        if response and response[1] != assistant.config.provider:
+            return {
+                "success": False,
+                "message": f"{provider.upper()} API did not answer; replies fell back to {response[1].value.upper()}"
+            }
         if response:
             return {
                 "success": True,
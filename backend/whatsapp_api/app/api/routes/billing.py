@@ -0,0 +1,83 @@
+from fastapi import APIRouter, Depends, HTTPException, status, Query
+from typing import List, Dict, Any, Optional
+from datetime import datetime
+import re
+
+from app.models.billing import BillingRollup, BillingPeriod
+from app.models.user import User, Role, Permission
+from app.services.billing import month_to_date, build_invoice
+from app.api.deps import get_current_user
+
+router = APIRouter()
+
+MONTH_PATTERN = re.compile(r"^\d{4}-\d{2}$")
+
+def _can_view_all_tenants(user: User) -> bool:
+    return user.role in [Role.ADMIN, Role.BILLING]
+
+def _billing_tenant_id(user: User, tenant_id: Optional[str]) -> Optional[str]:
+    """
+    Tenant whose billing data the user may read. Admin and billing users can
+    read every tenant; managers and users with the manage_billing permission
+    only their own.
+    """
+    if _can_view_all_tenants(user):
+        return tenant_id
+    
+    has_permission = user.role == Role.MANAGER or (
+        user.custom_permissions and Permission.MANAGE_BILLING in user.custom_permissions.permissions
+    )
+    if not has_permission or (tenant_id and tenant_id != user.tenant_id):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Not enough permissions"
+        )
+    return user.tenant_id
+
+def _validate_month(month: str):
+    if not MONTH_PATTERN.match(month):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Month must be formatted as YYYY-MM"
+        )
+
+@router.get("/month-to-date", response_model=List[Dict[str, Any]])
+async def get_month_to_date(
+    month: Optional[str] = None,
+    tenant_id: Optional[str] = None,
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Month-to-date message counts and costs per tenant, read from the month
+    rollups. Defaults to the current UTC month.
+    """
+    month = month or datetime.utcnow().strftime("%Y-%m")
+    _validate_month(month)
+    return await month_to_date(month, _billing_tenant_id(current_user, tenant_id))
+
+@router.get("/rollups", response_model=List[BillingRollup])
+async def get_rollups(
+    period_type: BillingPeriod = BillingPeriod.DAY,
+    start: str = Query(..., description="First period, YYYY-MM-DD or YYYY-MM"),
+    end: str = Query(..., description="Last period, inclusive"),
+    tenant_id: Optional[str] = None,
+    current_user: User = Depends(get_current_user)
+):
+    """Per-account rollups of a tenant over a range of days or months"""
+    tenant_id = _billing_tenant_id(current_user, tenant_id) or current_user.tenant_id
+    return await BillingRollup.find({
+        "tenant_id": tenant_id,
+        "period_type": period_type.value,
+        "period": {"$gte": start, "$lte": end}
+    }).sort([("period", 1), ("whatsapp_account_id", 1)]).to_list()
+
+@router.get("/invoices/{month}", response_model=Dict[str, Any])
+async def get_invoice(
+    month: str,
+    tenant_id: Optional[str] = None,
+    current_user: User = Depends(get_current_user)
+):
+    """Invoice of a tenant for a month, built from the month rollups"""
+    _validate_month(month)
+    tenant_id = _billing_tenant_id(current_user, tenant_id) or current_user.tenant_id
+    return await build_invoice(tenant_id, month)
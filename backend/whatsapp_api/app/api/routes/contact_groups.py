@@ -1,14 +1,37 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, status, Query
 from typing import List, Dict, Optional
+from bson import ObjectId
 
 from app.models.contact_group import ContactGroup, ContactVariantField, ContactGroupPermission, RolePermission
 from app.models.contact import Contact
 from app.models.tenant import Tenant
 from app.api.deps import get_current_user
 from app.models.user import User, Role
+from app.models.broadcast import Broadcast
+from app.schemas.broadcast import BroadcastCreate, BroadcastProgress
+from app.services.broadcast import start_broadcast, compute_stats
+from app.services.usage import usage_meter
+from app.services.tenant_routing import tenant_routing
+from app.services.template import CompiledContent
+from app.services.pagination import encode_id_cursor, id_keyset_filter, InvalidCursorError
+from app.services.group_hierarchy import (
+    GroupHierarchyError,
+    compute_ancestor_ids,
+    move_group,
+    subtree_contact_count,
+    subtree_variant_fields
+)
 
 router = APIRouter()
 
+async def _get_tenant_group(group_id: str, tenant_id: str) -> Optional[ContactGroup]:
+    if not ObjectId.is_valid(group_id):
+        return None
+    return await ContactGroup.find_one({
+        "_id": ObjectId(group_id),
+        "tenant_id": tenant_id
+    })
+
 @router.post("/", response_model=ContactGroup, status_code=status.HTTP_201_CREATED)
 async def create_contact_group(
     group_data: ContactGroup,
@@ -20,7 +43,7 @@ async def create_contact_group(
             detail="Not enough permissions"
         )
     
-    tenant = await Tenant.find_one({"_id": current_user.tenant_id})
+    tenant = await Tenant.get(current_user.tenant_id)
     if not tenant:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -35,6 +58,14 @@ async def create_contact_group(
         )
     
     group_data.tenant_id = current_user.tenant_id
+    try:
+        group_data.ancestor_ids = await compute_ancestor_ids(current_user.tenant_id, group_data.parent_group_id)
+    except GroupHierarchyError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+    
     new_group = await ContactGroup(**group_data.dict()).create()
     return new_group
 
@@ -61,10 +92,7 @@ async def get_contact_group(
     group_id: str,
     current_user: User = Depends(get_current_user)
 ):
-    group = await ContactGroup.find_one({
-        "_id": group_id,
-        "tenant_id": current_user.tenant_id
-    })
+    group = await _get_tenant_group(group_id, current_user.tenant_id)
     
     if not group:
         raise HTTPException(
@@ -92,10 +120,7 @@ async def update_contact_group(
     group_data: ContactGroup,
     current_user: User = Depends(get_current_user)
 ):
-    group = await ContactGroup.find_one({
-        "_id": group_id,
-        "tenant_id": current_user.tenant_id
-    })
+    group = await _get_tenant_group(group_id, current_user.tenant_id)
     
     if not group:
         raise HTTPException(
@@ -115,8 +140,17 @@ async def update_contact_group(
             detail="Not enough permissions to edit this group"
         )
     
+    if group_data.parent_group_id != group.parent_group_id:
+        try:
+            await move_group(group, group_data.parent_group_id)
+        except GroupHierarchyError as e:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=str(e)
+            )
+    
     group_data.tenant_id = current_user.tenant_id
-    for field, value in group_data.dict(exclude={"id"}).items():
+    for field, value in group_data.dict(exclude={"id", "parent_group_id", "ancestor_ids"}).items():
         setattr(group, field, value)
     
     await group.save()
@@ -127,10 +161,7 @@ async def delete_contact_group(
     group_id: str,
     current_user: User = Depends(get_current_user)
 ):
-    group = await ContactGroup.find_one({
-        "_id": group_id,
-        "tenant_id": current_user.tenant_id
-    })
+    group = await _get_tenant_group(group_id, current_user.tenant_id)
     
     if not group:
         raise HTTPException(
@@ -150,31 +181,34 @@ async def delete_contact_group(
             detail="Not enough permissions to delete this group"
         )
     
-    child_groups = await ContactGroup.find({"parent_group_id": group_id}).to_list()
-    if child_groups:
+    child_group = await ContactGroup.find_one({
+        "tenant_id": current_user.tenant_id,
+        "parent_group_id": group_id
+    })
+    if child_group:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Cannot delete group with child groups"
         )
     
-    contacts = await Contact.find({"group_ids": group_id}).to_list()
-    for contact in contacts:
-        contact.group_ids.remove(group_id)
-        await contact.save()
+    await Contact.get_motor_collection().update_many(
+        {"tenant_id": current_user.tenant_id, "group_ids": group_id},
+        {"$pull": {"group_ids": group_id}}
+    )
     
     await group.delete()
     return None
 
-@router.post("/{group_id}/contacts", status_code=status.HTTP_204_NO_CONTENT)
+def _contact_object_ids(contact_ids: List[str]) -> List[ObjectId]:
+    return [ObjectId(contact_id) for contact_id in set(contact_ids) if ObjectId.is_valid(contact_id)]
+
+@router.post("/{group_id}/contacts", response_model=Dict[str, int])
 async def add_contacts_to_group(
     group_id: str,
     contact_ids: List[str],
     current_user: User = Depends(get_current_user)
 ):
-    group = await ContactGroup.find_one({
-        "_id": group_id,
-        "tenant_id": current_user.tenant_id
-    })
+    group = await _get_tenant_group(group_id, current_user.tenant_id)
     
     if not group:
         raise HTTPException(
@@ -194,31 +228,20 @@ async def add_contacts_to_group(
             detail="Not enough permissions to edit this group"
         )
     
-    existing_contacts = set(group.contacts)
-    new_contacts = set(contact_ids)
-    updated_contacts = list(existing_contacts.union(new_contacts))
-    group.contacts = updated_contacts
-    await group.save()
-    
-    for contact_id in contact_ids:
-        contact = await Contact.get(contact_id)
-        if contact and contact.tenant_id == current_user.tenant_id:
-            if group_id not in contact.group_ids:
-                contact.group_ids.append(group_id)
-                await contact.save()
+    result = await Contact.get_motor_collection().update_many(
+        {"_id": {"$in": _contact_object_ids(contact_ids)}, "tenant_id": current_user.tenant_id},
+        {"$addToSet": {"group_ids": group_id}}
+    )
     
-    return None
+    return {"matched": result.matched_count, "modified": result.modified_count}
 
-@router.delete("/{group_id}/contacts", status_code=status.HTTP_204_NO_CONTENT)
+@router.delete("/{group_id}/contacts", response_model=Dict[str, int])
 async def remove_contacts_from_group(
     group_id: str,
     contact_ids: List[str],
     current_user: User = Depends(get_current_user)
 ):
-    group = await ContactGroup.find_one({
-        "_id": group_id,
-        "tenant_id": current_user.tenant_id
-    })
+    group = await _get_tenant_group(group_id, current_user.tenant_id)
     
     if not group:
         raise HTTPException(
@@ -238,17 +261,156 @@ async def remove_contacts_from_group(
             detail="Not enough permissions to edit this group"
         )
     
-    group.contacts = [c for c in group.contacts if c not in contact_ids]
-    await group.save()
+    result = await Contact.get_motor_collection().update_many(
+        {"_id": {"$in": _contact_object_ids(contact_ids)}, "tenant_id": current_user.tenant_id},
+        {"$pull": {"group_ids": group_id}}
+    )
+    
+    return {"matched": result.matched_count, "modified": result.modified_count}
+
+@router.get("/{group_id}/contacts", response_model=Dict)
+async def get_group_contacts(
+    group_id: str,
+    cursor: Optional[str] = None,
+    limit: int = Query(100, ge=1, le=1000),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Page through the contacts of a group in _id order. Pass `next_cursor`
+    back as `cursor` to fetch the following page.
+    """
+    group = await _get_tenant_group(group_id, current_user.tenant_id)
     
-    for contact_id in contact_ids:
-        contact = await Contact.get(contact_id)
-        if contact and contact.tenant_id == current_user.tenant_id:
-            if group_id in contact.group_ids:
-                contact.group_ids.remove(group_id)
-                await contact.save()
+    if not group:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Contact group not found"
+        )
     
-    return None
+    has_permission = False
+    for role_perm in group.role_permissions:
+        if role_perm.role == current_user.role and "view" in role_perm.permissions:
+            has_permission = True
+            break
+    
+    if not has_permission and current_user.role not in [Role.ADMIN, Role.MANAGER]:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Not enough permissions to view this group"
+        )
+    
+    query = {"group_ids": group_id, "tenant_id": current_user.tenant_id}
+    try:
+        query.update(id_keyset_filter(cursor))
+    except InvalidCursorError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid cursor"
+        )
+    
+    contacts = await Contact.find(query).sort("_id").limit(limit + 1).to_list()
+    next_cursor = None
+    if len(contacts) > limit:
+        contacts = contacts[:limit]
+        next_cursor = encode_id_cursor(contacts[-1].id)
+    
+    return {"items": contacts, "next_cursor": next_cursor}
+
+@router.get("/{group_id}/contacts/count", response_model=Dict[str, int])
+async def count_group_contacts(
+    group_id: str,
+    current_user: User = Depends(get_current_user)
+):
+    group = await _get_tenant_group(group_id, current_user.tenant_id)
+    
+    if not group:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Contact group not found"
+        )
+    
+    has_permission = False
+    for role_perm in group.role_permissions:
+        if role_perm.role == current_user.role and "view" in role_perm.permissions:
+            has_permission = True
+            break
+    
+    if not has_permission and current_user.role not in [Role.ADMIN, Role.MANAGER]:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Not enough permissions to view this group"
+        )
+    
+    count = await Contact.get_motor_collection().count_documents(
+        {"group_ids": group_id, "tenant_id": current_user.tenant_id}
+    )
+    return {"count": count}
+
+@router.get("/{group_id}/subtree", response_model=List[ContactGroup])
+async def get_contact_group_subtree(
+    group_id: str,
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Return every descendant of a group (all levels) with a single query,
+    limited to the groups the user's role may view
+    """
+    group = await _get_tenant_group(group_id, current_user.tenant_id)
+    
+    if not group:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Contact group not found"
+        )
+    
+    has_permission = False
+    for role_perm in group.role_permissions:
+        if role_perm.role == current_user.role and "view" in role_perm.permissions:
+            has_permission = True
+            break
+    
+    if not has_permission and current_user.role not in [Role.ADMIN, Role.MANAGER]:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Not enough permissions to view this group"
+        )
+    
+    query = {"tenant_id": current_user.tenant_id, "ancestor_ids": group_id}
+    if current_user.role not in [Role.ADMIN, Role.MANAGER]:
+        # Only the descendants this role may view
+        query["role_permissions"] = {"$elemMatch": {"role": current_user.role.value, "permissions": "view"}}
+    return await ContactGroup.find(query).to_list()
+
+@router.get("/{group_id}/subtree/contacts/count", response_model=Dict[str, int])
+async def count_subtree_contacts(
+    group_id: str,
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Count distinct contacts in a group and all of its descendants
+    """
+    group = await _get_tenant_group(group_id, current_user.tenant_id)
+    
+    if not group:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Contact group not found"
+        )
+    
+    has_permission = False
+    for role_perm in group.role_permissions:
+        if role_perm.role == current_user.role and "view" in role_perm.permissions:
+            has_permission = True
+            break
+    
+    if not has_permission and current_user.role not in [Role.ADMIN, Role.MANAGER]:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Not enough permissions to view this group"
+        )
+    
+    count = await subtree_contact_count(current_user.tenant_id, group_id)
+    return {"count": count}
 
 @router.put("/{group_id}/variant-fields", response_model=Dict[str, ContactVariantField])
 async def update_group_variant_fields(
@@ -256,10 +418,7 @@ async def update_group_variant_fields(
     variant_fields: Dict[str, ContactVariantField],
     current_user: User = Depends(get_current_user)
 ):
-    group = await ContactGroup.find_one({
-        "_id": group_id,
-        "tenant_id": current_user.tenant_id
-    })
+    group = await _get_tenant_group(group_id, current_user.tenant_id)
     
     if not group:
         raise HTTPException(
@@ -283,3 +442,86 @@ async def update_group_variant_fields(
     group.variant_fields = variant_fields
     await group.save()
     return group.variant_fields
+
+@router.post("/{group_id}/broadcast", response_model=Broadcast, status_code=status.HTTP_202_ACCEPTED)
+async def broadcast_to_group(
+    group_id: str,
+    broadcast_data: BroadcastCreate,
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Send a message to every contact in the group (and its child groups).
+    The fan-out runs in the background; poll the returned broadcast for progress.
+    """
+    group = await _get_tenant_group(group_id, current_user.tenant_id)
+    
+    if not group:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Contact group not found"
+        )
+    
+    has_permission = False
+    for role_perm in group.role_permissions:
+        if role_perm.role == current_user.role and "message" in role_perm.permissions:
+            has_permission = True
+            break
+    
+    if not has_permission and current_user.role not in [Role.ADMIN, Role.MANAGER]:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Not enough permissions to message this group"
+        )
+    
+    routed = await tenant_routing.resolve(broadcast_data.whatsapp_account_id)
+    if not routed or routed.tenant_id != current_user.tenant_id:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Unknown WhatsApp account"
+        )
+    
+    variant_fields = set(group.variant_fields)
+    if broadcast_data.include_subgroups:
+        # The fan-out also reaches child groups, whose own fields are valid placeholders
+        variant_fields = await subtree_variant_fields(current_user.tenant_id, group_id)
+    unknown_fields = CompiledContent(broadcast_data.content).validate(variant_fields)
+    if unknown_fields:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Unknown template fields: {', '.join(unknown_fields)}"
+        )
+    
+    usage = await usage_meter.usage(current_user.tenant_id)
+    if usage["hard_limited"]:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Daily usage limit reached"
+        )
+    
+    broadcast = await Broadcast(
+        tenant_id=current_user.tenant_id,
+        group_id=group_id,
+        created_by=str(current_user.id),
+        **broadcast_data.dict()
+    ).create()
+    
+    start_broadcast(broadcast)
+    return broadcast
+
+@router.get("/{group_id}/broadcasts/{broadcast_id}", response_model=BroadcastProgress)
+async def get_broadcast_progress(
+    group_id: str,
+    broadcast_id: str,
+    current_user: User = Depends(get_current_user)
+):
+    broadcast = await Broadcast.get(broadcast_id)
+    if not broadcast or broadcast.tenant_id != current_user.tenant_id or broadcast.group_id != group_id:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Broadcast not found"
+        )
+    
+    return BroadcastProgress(
+        broadcast=broadcast,
+        stats=compute_stats(broadcast)
+    )
@@ -0,0 +1,116 @@
+from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File, Form, Query
+from fastapi.responses import StreamingResponse
+from typing import Dict, Any, List, Optional
+from bson import ObjectId
+
+from app.models.contact_group import ContactGroup
+from app.models.tenant import Tenant
+from app.api.deps import get_current_user
+from app.models.user import User, Role
+from app.services.contact_import import ContactImporter, ContactImportError, iter_rows, iter_contacts_csv
+from app.services.tenant_routing import tenant_routing
+
+router = APIRouter()
+
+def _split(value: Optional[str]) -> List[str]:
+    return [item.strip() for item in (value or "").split(",") if item.strip()]
+
+@router.post("/import", response_model=Dict[str, Any])
+async def import_contacts(
+    file: UploadFile = File(...),
+    whatsapp_account_id: str = Form(...),
+    group_ids: Optional[str] = Form(None, description="Comma-separated contact group IDs to add every row to"),
+    default_country_code: Optional[str] = Form(None),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Import contacts from a CSV or XLSX file. Rows are upserted on
+    (WhatsApp account, phone number); columns other than the phone number,
+    name and profile_name are stored as variant fields of the target groups
+    or as custom fields. Returns counts and a per-row error report.
+    """
+    if current_user.role not in [Role.ADMIN, Role.MANAGER]:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Not enough permissions"
+        )
+    
+    routed = await tenant_routing.resolve(whatsapp_account_id)
+    if not routed or routed.tenant_id != current_user.tenant_id:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Unknown WhatsApp account"
+        )
+    
+    tenant = await Tenant.get(current_user.tenant_id)
+    if not tenant:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Tenant not found"
+        )
+    
+    target_group_ids = _split(group_ids)
+    if not all(ObjectId.is_valid(group_id) for group_id in target_group_ids):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Unknown contact group"
+        )
+    groups = await ContactGroup.find({
+        "tenant_id": current_user.tenant_id,
+        "_id": {"$in": [ObjectId(group_id) for group_id in target_group_ids]}
+    }).to_list() if target_group_ids else []
+    if len(groups) != len(set(target_group_ids)):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Unknown contact group"
+        )
+    
+    variant_fields = set()
+    for group in groups:
+        variant_fields.update(group.variant_fields)
+    
+    importer = ContactImporter(
+        tenant_id=current_user.tenant_id,
+        whatsapp_account_id=whatsapp_account_id,
+        max_contacts=tenant.usage_limits.max_contacts,
+        group_ids=[str(group.id) for group in groups],
+        variant_fields=variant_fields,
+        **({"default_country_code": default_country_code} if default_country_code else {})
+    )
+    
+    try:
+        rows = iter_rows(file.file, file.filename or "")
+        return await importer.run(rows)
+    except ContactImportError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+
+@router.get("/export")
+async def export_contacts(
+    group_id: Optional[str] = None,
+    whatsapp_account_id: Optional[str] = None,
+    fields: Optional[str] = Query(None, description="Comma-separated custom/variant fields to add as columns"),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Stream the tenant's contacts as CSV
+    """
+    if current_user.role not in [Role.ADMIN, Role.MANAGER]:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Not enough permissions"
+        )
+    
+    query: Dict[str, Any] = {"tenant_id": current_user.tenant_id}
+    if group_id:
+        query["group_ids"] = group_id
+    if whatsapp_account_id:
+        query["whatsapp_account_id"] = whatsapp_account_id
+    
+    return StreamingResponse(
+        iter_contacts_csv(query, _split(fields)),
+        media_type="text/csv",
+        headers={"Content-Disposition": "attachment; filename=contacts.csv"}
+    )
@@ -0,0 +1,166 @@
+from fastapi import APIRouter, Depends, HTTPException, status, Query
+from typing import Optional, Dict, Any
+from datetime import datetime
+from bson import ObjectId
+
+from app.models.conversation import Conversation
+from app.models.label import Label, ConversationLabel
+from app.models.user import User, Role
+from app.schemas.conversation import ConversationAssign, ConversationPage
+from app.services.pagination import encode_cursor, keyset_filter, InvalidCursorError
+from app.services.labels import add_conversation_label as attach_label, remove_conversation_label as detach_label
+from app.services.realtime import realtime_hub, build_event, EventType
+from app.api.deps import get_current_user
+
+router = APIRouter()
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+async def _get_tenant_conversation(conversation_id: str, tenant_id: str) -> Conversation:
+    conversation = None
+    if ObjectId.is_valid(conversation_id):
+        conversation = await Conversation.find_one({"_id": ObjectId(conversation_id), "tenant_id": tenant_id})
+    if not conversation:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Conversation not found"
+        )
+    return conversation
+
+@router.get("/", response_model=ConversationPage)
+async def get_conversations(
+    cursor: Optional[str] = None,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    whatsapp_account_id: Optional[str] = None,
+    assigned_agent_id: Optional[str] = Query(None, description="Agent ID, or 'me' for the current user"),
+    label_id: Optional[str] = None,
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Inbox listing, most recent activity first, using keyset pagination on
+    (last_message_at, _id)
+    """
+    query: Dict[str, Any] = {"tenant_id": current_user.tenant_id, "last_message_at": {"$ne": None}}
+    if whatsapp_account_id:
+        query["whatsapp_account_id"] = whatsapp_account_id
+    if assigned_agent_id:
+        query["assigned_agent_id"] = str(current_user.id) if assigned_agent_id == "me" else assigned_agent_id
+    if label_id:
+        query["labels.label_id"] = label_id
+
+    try:
+        query.update(keyset_filter("last_message_at", cursor))
+    except InvalidCursorError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid cursor"
+        )
+
+    conversations = await Conversation.find(query).sort(
+        [("last_message_at", -1), ("_id", -1)]
+    ).limit(limit + 1).to_list()
+
+    next_cursor = None
+    if len(conversations) > limit:
+        conversations = conversations[:limit]
+        last = conversations[-1]
+        next_cursor = encode_cursor(last.last_message_at, last.id)
+
+    return ConversationPage(items=conversations, next_cursor=next_cursor)
+
+@router.get("/{conversation_id}", response_model=Conversation)
+async def get_conversation(
+    conversation_id: str,
+    current_user: User = Depends(get_current_user)
+):
+    return await _get_tenant_conversation(conversation_id, current_user.tenant_id)
+
+@router.post("/{conversation_id}/read", response_model=Conversation)
+async def mark_conversation_read(
+    conversation_id: str,
+    current_user: User = Depends(get_current_user)
+):
+    conversation = await _get_tenant_conversation(conversation_id, current_user.tenant_id)
+    await Conversation.get_motor_collection().update_one(
+        {"_id": conversation.id},
+        {"$set": {"unread_count": 0, "updated_at": datetime.utcnow()}}
+    )
+    conversation.unread_count = 0
+    return conversation
+
+@router.put("/{conversation_id}/assign", response_model=Conversation)
+async def assign_conversation(
+    conversation_id: str,
+    assignment: ConversationAssign,
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Assign the conversation to an agent. Agents may only take unassigned
+    conversations for themselves or release their own.
+    """
+    conversation = await _get_tenant_conversation(conversation_id, current_user.tenant_id)
+    
+    user_id = str(current_user.id)
+    if current_user.role not in [Role.ADMIN, Role.MANAGER, Role.SUPERVISOR]:
+        allowed = (
+            (assignment.agent_id == user_id and conversation.assigned_agent_id in (None, user_id))
+            or (assignment.agent_id is None and conversation.assigned_agent_id == user_id)
+        )
+        if not allowed:
+            raise HTTPException(
+                status_code=status.HTTP_403_FORBIDDEN,
+                detail="Not enough permissions"
+            )
+    
+    if assignment.agent_id:
+        agent = await User.get(assignment.agent_id) if ObjectId.is_valid(assignment.agent_id) else None
+        if not agent or agent.tenant_id != current_user.tenant_id:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Agent not found"
+            )
+    
+    await Conversation.get_motor_collection().update_one(
+        {"_id": conversation.id},
+        {"$set": {"assigned_agent_id": assignment.agent_id, "updated_at": datetime.utcnow()}}
+    )
+    # Sent tenant-wide: both the previous and the new assignee need to know
+    await realtime_hub.publish([build_event(
+        EventType.CONVERSATION_ASSIGNED,
+        current_user.tenant_id,
+        {"conversation_id": str(conversation.id), "agent_id": assignment.agent_id, "previous_agent_id": conversation.assigned_agent_id}
+    )])
+    conversation.assigned_agent_id = assignment.agent_id
+    return conversation
+
+@router.post("/{conversation_id}/labels/{label_id}", response_model=Conversation)
+async def add_conversation_label(
+    conversation_id: str,
+    label_id: str,
+    current_user: User = Depends(get_current_user)
+):
+    conversation = await _get_tenant_conversation(conversation_id, current_user.tenant_id)
+    
+    label = await Label.get(label_id) if ObjectId.is_valid(label_id) else None
+    if not label or label.tenant_id != current_user.tenant_id:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Label not found"
+        )
+    
+    conversation_label = ConversationLabel(label_id=label_id, added_by=str(current_user.id))
+    if await attach_label(current_user.tenant_id, {"_id": conversation.id}, conversation_label):
+        conversation.labels.append(conversation_label)
+    return conversation
+
+@router.delete("/{conversation_id}/labels/{label_id}", response_model=Conversation)
+async def remove_conversation_label(
+    conversation_id: str,
+    label_id: str,
+    current_user: User = Depends(get_current_user)
+):
+    conversation = await _get_tenant_conversation(conversation_id, current_user.tenant_id)
+    await detach_label(current_user.tenant_id, {"_id": conversation.id}, label_id)
+    conversation.labels = [l for l in conversation.labels if l.label_id != label_id]
+    return conversation
@@ -5,6 +5,7 @@ from datetime import datetime
 from app.models.flow import ChatFlow
 from app.api.deps import get_current_user
 from app.models.user import User, Role
+from app.services.flow_engine import flow_engine
 
 router = APIRouter()
 
@@ -22,6 +23,7 @@ async def create_flow(
     flow_data.tenant_id = current_user.tenant_id
     
     new_flow = await ChatFlow(**flow_data.dict()).create()
+    flow_engine.invalidate(current_user.tenant_id)
     return new_flow
 
 @router.get("/", response_model=List[ChatFlow])
@@ -70,6 +72,7 @@ async def update_flow(
     
     flow.updated_at = datetime.utcnow()
     await flow.save()
+    flow_engine.invalidate(current_user.tenant_id)
     
     return flow
 
@@ -92,5 +95,6 @@ async def delete_flow(
         )
     
     await flow.delete()
+    flow_engine.invalidate(current_user.tenant_id)
     
     return None
@@ -1,11 +1,13 @@
 from fastapi import APIRouter, Depends, HTTPException, status
-from typing import List, Optional
+from typing import List, Optional, Dict, Any
 
 from app.models.label import Label, LabelColor
 from app.models.message import Message
 from app.api.deps import get_current_user
 from app.models.user import User
 from app.models.label import ConversationLabel
+from app.services.conversations import message_conversation_filter
+from app.services.labels import add_conversation_label as attach_label, remove_conversation_label as detach_label, label_counts, delete_label_references
 
 router = APIRouter()
 
@@ -23,6 +25,21 @@ async def get_labels(
 ):
     return await Label.find({"tenant_id": current_user.tenant_id}).to_list()
 
+@router.get("/counts", response_model=List[Dict[str, Any]])
+async def get_label_counts(
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Labels of the tenant with the number of conversations carrying each,
+    read from the label counters
+    """
+    labels = await Label.find({"tenant_id": current_user.tenant_id}).to_list()
+    counts = await label_counts(current_user.tenant_id)
+    return [
+        {"label_id": str(label.id), "name": label.name, "color": label.color, "conversations": counts.get(str(label.id), 0)}
+        for label in labels
+    ]
+
 @router.put("/{label_id}", response_model=Label)
 async def update_label(
     label_id: str,
@@ -55,6 +72,7 @@ async def delete_label(
         )
     
     await label.delete()
+    await delete_label_references(current_user.tenant_id, label_id)
     return None
 
 @router.post("/conversation/{message_id}/label/{label_id}")
@@ -86,6 +104,7 @@ async def add_label_to_conversation(
     )
     message.labels.append(conversation_label)
     await message.save()
+    await attach_label(current_user.tenant_id, message_conversation_filter(message), conversation_label)
     
     return {"message": "Label added to conversation"}
 
@@ -104,5 +123,6 @@ async def remove_label_from_conversation(
     
     message.labels = [l for l in message.labels if l.label_id != label_id]
     await message.save()
+    await detach_label(current_user.tenant_id, message_conversation_filter(message), label_id)
     
     return {"message": "Label removed from conversation"}
@@ -1,9 +1,15 @@
-from fastapi import APIRouter, Depends, HTTPException, status, BackgroundTasks
-from typing import List
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Response
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import StreamingResponse
+from typing import List, Optional, Dict, Any
+from enum import Enum
+import json
 
-from app.models.message import Message, MessageType
-from app.schemas.message import MessageCreate, MessageResponse
-from app.services.whatsapp import send_whatsapp_message
+from app.models.message import Message, MessageType, MessageStatus
+from app.schemas.message import MessageCreate, MessageResponse, MessagePage
+from app.services.pagination import encode_cursor, keyset_filter, InvalidCursorError
+from app.services.messaging import queue_message
+from app.services.usage import UsageLimitExceeded
 from app.api.deps import get_current_user
 from app.models.user import User
 
@@ -12,23 +18,25 @@ router = APIRouter()
 @router.post("/", response_model=MessageResponse, status_code=status.HTTP_201_CREATED)
 async def send_message(
     message: MessageCreate,
-    background_tasks: BackgroundTasks,
+    response: Response,
     current_user: User = Depends(get_current_user)
 ):
-    db_message = Message(
-        tenant_id=current_user.tenant_id,
-        whatsapp_account_id=message.whatsapp_account_id,
-        from_number=message.from_number,
-        to_number=message.to_number,
-        message_type=message.message_type,
-        content=message.content
-    )
-    await db_message.create()
-    
-    background_tasks.add_task(
-        send_whatsapp_message, 
-        db_message.id
-    )
+    try:
+        db_message, reservation = await queue_message(
+            current_user.tenant_id,
+            message.whatsapp_account_id,
+            message.from_number,
+            message.to_number,
+            message.message_type,
+            message.content
+        )
+    except UsageLimitExceeded as e:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail=str(e)
+        )
+    if reservation["soft_limited"]:
+        response.headers["X-Usage-Warning"] = "Approaching daily usage limit"
     
     return MessageResponse(
         id=str(db_message.id),
@@ -36,14 +44,94 @@ async def send_message(
         message="Message queued for delivery"
     )
 
-@router.get("/", response_model=List[Message])
+class MessageExportFormat(str, Enum):
+    JSON = "json"
+    NDJSON = "ndjson"
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+EXPORT_BATCH_SIZE = 1000
+
+def _serialize_message(document: Dict[str, Any]) -> Dict[str, Any]:
+    document["_id"] = str(document["_id"])
+    return jsonable_encoder(document)
+
+@router.get("/", response_model=MessagePage)
 async def get_messages(
+    cursor: Optional[str] = None,
+    limit: Optional[int] = Query(None, ge=1),
+    whatsapp_account_id: Optional[str] = None,
+    from_number: Optional[str] = None,
+    to_number: Optional[str] = None,
+    message_status: Optional[MessageStatus] = Query(None, alias="status"),
+    label_id: Optional[str] = None,
+    fields: Optional[str] = Query(None, description="Comma-separated list of fields to return"),
+    format: MessageExportFormat = MessageExportFormat.JSON,
     current_user: User = Depends(get_current_user)
 ):
-    messages = await Message.find(
-        {"tenant_id": current_user.tenant_id}
-    ).to_list()
-    return messages
+    """
+    List messages newest first using keyset pagination on (created_at, _id).
+    Pass the returned `next_cursor` to fetch the following page. With
+    `format=ndjson` matching messages are streamed one per line for exports.
+    """
+    query: Dict[str, Any] = {"tenant_id": current_user.tenant_id}
+    if whatsapp_account_id:
+        query["whatsapp_account_id"] = whatsapp_account_id
+    if from_number:
+        query["from_number"] = from_number
+    if to_number:
+        query["to_number"] = to_number
+    if message_status:
+        query["status"] = message_status.value
+    if label_id:
+        query["labels.label_id"] = label_id
+
+    try:
+        query.update(keyset_filter("created_at", cursor))
+    except InvalidCursorError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid cursor"
+        )
+
+    projection = None
+    if fields:
+        requested = {field.strip() for field in fields.split(",") if field.strip()}
+        unknown = requested - set(Message.model_fields) - {"_id"}
+        if unknown:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Unknown fields: {', '.join(sorted(unknown))}"
+            )
+        projection = {field: 1 for field in requested | {"created_at"}}
+
+    sort = [("created_at", -1), ("_id", -1)]
+    collection = Message.get_motor_collection()
+
+    if format == MessageExportFormat.NDJSON:
+        find = collection.find(query, projection, batch_size=EXPORT_BATCH_SIZE).sort(sort)
+        if limit:
+            find = find.limit(limit)
+
+        async def stream():
+            async for document in find:
+                yield json.dumps(_serialize_message(document)) + "\n"
+
+        return StreamingResponse(stream(), media_type="application/x-ndjson")
+
+    page_size = min(limit or DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE)
+    documents = await collection.find(query, projection).sort(sort).limit(page_size + 1).to_list(None)
+
+    next_cursor = None
+    if len(documents) > page_size:
+        documents = documents[:page_size]
+        last = documents[-1]
+        next_cursor = encode_cursor(last["created_at"], last["_id"])
+
+    return MessagePage(
+        items=[_serialize_message(document) for document in documents],
+        next_cursor=next_cursor
+    )
 
 @router.get("/{message_id}", response_model=Message)
 async def get_message(
@@ -0,0 +1,80 @@
+from fastapi import APIRouter, Depends, HTTPException, Request, WebSocket, WebSocketDisconnect, status
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import StreamingResponse
+from typing import Dict, Any
+import asyncio
+import json
+
+from app.api.deps import get_current_user, get_user_from_token
+from app.core.config import app_settings
+from app.models.user import User
+from app.services.realtime import realtime_hub
+
+router = APIRouter()
+
+def _serialize_event(event: Dict[str, Any]) -> Dict[str, Any]:
+    return jsonable_encoder({
+        "type": event["type"],
+        "assigned_agent_id": event.get("assigned_agent_id"),
+        "data": event.get("data", {}),
+        "created_at": event.get("created_at")
+    })
+
+@router.websocket("/ws")
+async def realtime_websocket(websocket: WebSocket, token: str):
+    """
+    Push inbox events over a WebSocket. Browsers cannot set headers on a
+    WebSocket handshake, so the access token is passed as `?token=`.
+    """
+    try:
+        user = await get_user_from_token(token)
+    except HTTPException:
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+        return
+
+    await websocket.accept()
+    subscription = realtime_hub.subscribe(user)
+    try:
+        while not subscription.overflowed:
+            try:
+                event = await asyncio.wait_for(subscription.queue.get(), app_settings.realtime_heartbeat_interval)
+            except asyncio.TimeoutError:
+                await websocket.send_json({"type": "ping"})
+                continue
+            await websocket.send_json(_serialize_event(event))
+        await websocket.close(code=status.WS_1013_TRY_AGAIN_LATER)
+    except WebSocketDisconnect:
+        pass
+    finally:
+        realtime_hub.unsubscribe(subscription)
+
+@router.get("/events")
+async def realtime_events(
+    request: Request,
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Push inbox events as Server-Sent Events, authenticated like every other
+    API route
+    """
+    subscription = realtime_hub.subscribe(current_user)
+
+    async def stream():
+        try:
+            while not subscription.overflowed:
+                if await request.is_disconnected():
+                    break
+                try:
+                    event = await asyncio.wait_for(subscription.queue.get(), app_settings.realtime_heartbeat_interval)
+                except asyncio.TimeoutError:
+                    yield ": ping\n\n"
+                    continue
+                yield f"event: {event['type']}\ndata: {json.dumps(_serialize_event(event))}\n\n"
+        finally:
+            realtime_hub.unsubscribe(subscription)
+
+    return StreamingResponse(
+        stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
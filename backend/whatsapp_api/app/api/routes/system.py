@@ -5,6 +5,14 @@ from app.api.deps import get_current_admin_user
 from app.models.user import User
 from app.core.config import app_settings
 from app.services.app_updater import AppUpdater
+from app.services.dedup import message_deduplicator
+from app.services.message_status import message_status_applier
+from app.services.flow_engine import flow_engine
+from app.services.scheduler import scheduler
+from app.services.ai_clients import ai_clients
+from app.services.ai_cache import ai_reply_cache
+from app.db.database import DOCUMENT_MODELS
+from app.db.indexes import reconcile_indexes
 
 router = APIRouter()
 
@@ -112,3 +120,40 @@ async def restore_from_backup(
         "message": "Restoration started in the background",
         "backup_path": backup_path
     }
+
+@router.get("/ingest/stats", response_model=Dict)
+async def get_ingest_stats(
+    current_user: User = Depends(get_current_admin_user)
+):
+    """
+    Webhook ingest counters for this worker, including dropped duplicates.
+    Only accessible to admin users.
+    """
+    return {
+        "dedup": message_deduplicator.stats(),
+        "statuses": message_status_applier.stats(),
+        "flows": flow_engine.stats(),
+        "scheduler": scheduler.stats(),
+        "ai_providers": ai_clients.stats(),
+        "ai_cache": ai_reply_cache.stats()
+    }
+
+@router.get("/indexes", response_model=Dict)
+async def get_index_report(
+    current_user: User = Depends(get_current_admin_user)
+):
+    """
+    Report missing, undeclared and unused MongoDB indexes without changing anything.
+    Only accessible to admin users.
+    """
+    return await reconcile_indexes(DOCUMENT_MODELS, apply=False)
+
+@router.post("/indexes", response_model=Dict)
+async def reconcile_index_report(
+    current_user: User = Depends(get_current_admin_user)
+):
+    """
+    Build missing declared MongoDB indexes, then report as GET /indexes does.
+    Index builds can load the database; only accessible to admin users.
+    """
+    return await reconcile_indexes(DOCUMENT_MODELS, apply=True)
@@ -6,6 +6,9 @@ import secrets
 from app.models.tenant import Tenant, WhatsAppBusinessAccount, UsageLimits
 from app.api.deps import get_current_admin_user
 from app.services.webhook import generate_webhook_credentials
+from app.services.tenant_routing import tenant_routing
+from app.services.usage import usage_meter
+from app.services.billing import invalidate_cost_settings
 
 router = APIRouter()
 
@@ -22,6 +25,7 @@ async def create_tenant(
     tenant_dict["webhook_secret"] = webhook_creds["webhook_secret"]
     
     new_tenant = await Tenant(**tenant_dict).create()
+    tenant_routing.refresh_tenant(new_tenant)
     return new_tenant
 
 @router.get("/", response_model=List[Tenant])
@@ -61,6 +65,9 @@ async def update_tenant(
         setattr(tenant, field, value)
     
     await tenant.save()
+    tenant_routing.refresh_tenant(tenant)
+    usage_meter.invalidate(tenant_id)
+    invalidate_cost_settings(tenant_id)
     return tenant
 
 @router.post("/{tenant_id}/regenerate-webhook-token", response_model=Dict[str, str])
@@ -84,6 +91,7 @@ async def regenerate_webhook_token(
     
     tenant.webhook_token = new_webhook_token
     await tenant.save()
+    tenant_routing.refresh_tenant(tenant)
     
     return {
         "success": True,
@@ -0,0 +1,29 @@
+from fastapi import APIRouter, Depends, Query
+from typing import List, Dict, Any
+
+from app.models.usage import UsageCounter
+from app.models.user import User
+from app.services.usage import usage_meter
+from app.api.deps import get_current_user
+
+router = APIRouter()
+
+@router.get("/", response_model=Dict[str, Any])
+async def get_usage(
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Today's message and media usage of the current tenant against its daily
+    limits. The day follows the tenant's timezone.
+    """
+    return await usage_meter.usage(current_user.tenant_id)
+
+@router.get("/history", response_model=List[UsageCounter])
+async def get_usage_history(
+    days: int = Query(30, ge=1, le=366),
+    current_user: User = Depends(get_current_user)
+):
+    """Daily usage counters of the current tenant, most recent day first"""
+    return await UsageCounter.find(
+        {"tenant_id": current_user.tenant_id}
+    ).sort([("day", -1)]).limit(days).to_list()
@@ -7,7 +7,7 @@ from passlib.context import CryptContext
 
 from app.models.user import User, Role
 from app.core.config import app_settings
-from app.api.deps import get_current_user, get_current_admin_user
+from app.api.deps import get_current_user, get_current_admin_user, invalidate_user_cache
 
 router = APIRouter()
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
@@ -104,4 +104,5 @@ async def update_user(
         setattr(user, field, value)
     
     await user.save()
+    invalidate_user_cache(user.id)
     return user
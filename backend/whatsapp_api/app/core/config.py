@@ -1,3 +1,4 @@
+from typing import Optional
 from pydantic_settings import BaseSettings
 
 class Settings(BaseSettings):
@@ -9,8 +10,66 @@ class Settings(BaseSettings):
     access_token_expire_minutes: int = 60 * 24  # 1 day
     update_server_url: str = "https://updates.imix.ip.mr"  # URL for update server
     whatsapp_api_base_url: str = "https://graph.facebook.com/v16.0"
+    whatsapp_messages_per_second: float = 80.0  # Send rate per phone number, shared by every process
+    whatsapp_rate_claim_size: int = 10  # Send slots a process claims per round trip to the shared rate window
+    whatsapp_send_max_attempts: int = 5
+    whatsapp_send_backoff: float = 0.5  # Base delay in seconds for exponential backoff
+    whatsapp_http_timeout: float = 15.0
+    whatsapp_http_max_connections: int = 100
+    outbox_embedded_worker: bool = True  # Drain the outbox inside the API process; disable when running app.worker
+    outbox_concurrency: int = 10
+    outbox_visibility_timeout: float = 120.0  # Seconds a leased item stays hidden from other workers
+    outbox_max_attempts: int = 8
+    outbox_retry_backoff: float = 5.0  # Base delay in seconds between delivery attempts
+    outbox_poll_interval: float = 1.0
+    broadcast_chunk_size: int = 1000  # Messages created per insert_many during broadcast fan-out
+    broadcast_lease_ttl: float = 60.0  # Seconds a fan-out stays claimed between checkpoints before another process resumes it
+    auth_user_cache_ttl: float = 30.0  # Seconds a resolved user is reused by get_current_user
+    auth_user_cache_size: int = 10000
+    auth_token_cache_size: int = 10000
+    contacts_default_country_code: Optional[str] = None  # e.g. "222"; applied to imported numbers without a prefix
+    contacts_import_batch_size: int = 1000
     api_url: str = "https://apimix.ip.mr"
     frontend_url: str = "https://imix.ip.mr"
+    webhook_queue_size: int = 10000  # Max pending webhook payloads before ingest runs inline
+    webhook_batch_size: int = 500  # Max payloads drained per insert_many batch
+    webhook_flush_interval: float = 0.05  # Seconds to wait for a batch to fill up
+    webhook_max_attempts: int = 3  # Ingest attempts per batch before its payloads are spilled to failed_webhooks
+    webhook_retry_backoff: float = 1.0  # Base delay in seconds between ingest attempts
+    dedup_cache_size: int = 100000  # whatsapp_message_ids kept in the in-memory dedup window
+    dedup_cache_ttl: float = 60 * 60  # Seconds a seen whatsapp_message_id stays in the window
+    tenant_routing_change_stream: bool = False  # Follow tenant changes via a change stream (replica set only)
+    tenant_routing_ttl: float = 300.0  # Seconds a routed account is trusted before resolve() re-reads its tenant
+    tenant_routing_miss_ttl: float = 30.0  # Seconds an unknown phone_number_id is remembered as a miss
+    tenant_routing_miss_cache_size: int = 10000
+    realtime_collection_size: int = 64 * 1024 * 1024  # Bytes of the capped collection carrying realtime events
+    realtime_queue_size: int = 1000  # Events buffered per connected client before it is dropped
+    realtime_idle_interval: float = 0.5  # Seconds between tailable cursor restarts when no events arrive
+    realtime_heartbeat_interval: float = 20.0
+    usage_flush_interval: float = 2.0  # Seconds between flushes of locally metered usage to MongoDB
+    usage_limits_ttl: float = 60.0  # Seconds a tenant's limits and timezone are cached by the meter
+    billing_settings_ttl: float = 60.0  # Seconds a tenant's CostSettings are cached for cost stamping
+    flow_refresh_interval: float = 30.0  # Seconds between checks for changed chat flows per tenant
+    flow_webhook_timeout: float = 10.0
+    flow_webhook_max_connections: int = 20
+    scheduler_enabled: bool = True  # Take part in scheduler leader election in this process
+    scheduler_lease_ttl: float = 30.0  # Seconds before a silent leader's lease can be taken over
+    scheduler_load_interval: float = 60.0  # Seconds between loads of upcoming jobs into memory
+    scheduler_horizon: float = 300.0  # Seconds ahead covered by each load
+    scheduler_visibility_timeout: float = 120.0  # Seconds a fired job stays claimed before it can fire again
+    scheduler_concurrency: int = 20
+    scheduler_max_attempts: int = 5
+    scheduler_retry_backoff: float = 30.0  # Base delay in seconds between attempts of a failed job
+    ai_http_timeout: float = 30.0
+    ai_http_max_connections: int = 50  # Pooled connections per AI provider endpoint
+    ai_provider_concurrency: int = 20  # In-flight requests per AI provider endpoint in this process
+    ai_tenant_concurrency: int = 5  # In-flight AI requests per tenant in this process
+    ai_breaker_failures: int = 5  # Consecutive failures that open a provider's circuit
+    ai_breaker_reset: float = 30.0  # Seconds an open circuit rejects calls before a trial request
+    ai_hedge_delay: float = 4.0  # Seconds before a slow DeepSeek reply is raced against ChatGPT; 0 disables
+    ai_cache_size: int = 1000  # Cached AI replies per tenant
+    ai_cache_ttl: float = 6 * 60 * 60  # Seconds a cached AI reply is reused for
+    ai_cache_similarity: float = 0.0  # Word overlap (0-1) for a near-duplicate cache hit; 0 means exact matches only
     
     class Config:
         env_file = ".env"
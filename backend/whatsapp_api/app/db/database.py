@@ -10,24 +10,61 @@ from app.models.branding import BrandingSettings
 from app.models.ai_config import AIConfig
 from app.models.task import Task
 from app.models.contact_group import ContactGroup
+from app.models.label import Label
+from app.models.outbox import OutboxItem, DeadLetter
+from app.models.broadcast import Broadcast
+from app.models.conversation import Conversation
+from app.models.label_count import LabelCount
+from app.models.usage import UsageCounter
+from app.models.billing import BillingRollup
+from app.models.schedule import ScheduledJob
+from app.models.rate_limit import SendRateWindow
+from app.models.webhook import FailedWebhook
+from app.db.indexes import reconcile_indexes
+from app.services.tenant_routing import tenant_routing
 
-async def init_db(app_settings):
+DOCUMENT_MODELS = [
+    Tenant,
+    User,
+    Message,
+    Contact,
+    ChatFlow,
+    Form,
+    BrandingSettings,
+    AIConfig,
+    Task,
+    ContactGroup,
+    Label,
+    OutboxItem,
+    DeadLetter,
+    Broadcast,
+    Conversation,
+    LabelCount,
+    UsageCounter,
+    BillingRollup,
+    ScheduledJob,
+    SendRateWindow,
+    FailedWebhook
+]
+
+async def connect_db(app_settings):
     client = motor.motor_asyncio.AsyncIOMotorClient(
         app_settings.mongodb_uri
     )
     
+    # Indexes are reconciled separately so a single failing index build
+    # (e.g. duplicates under a new unique index) does not block startup
     await init_beanie(
         database=client[app_settings.db_name],
-        document_models=[
-            Tenant,
-            User,
-            Message,
-            Contact,
-            ChatFlow,
-            Form,
-            BrandingSettings,
-            AIConfig,
-            Task,
-            ContactGroup
-        ]
+        document_models=DOCUMENT_MODELS,
+        skip_indexes=True
     )
+    return client
+
+async def init_db(app_settings):
+    await connect_db(app_settings)
+    await reconcile_indexes(DOCUMENT_MODELS)
+    
+    await tenant_routing.load()
+    if app_settings.tenant_routing_change_stream:
+        tenant_routing.start_watching()
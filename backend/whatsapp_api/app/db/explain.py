@@ -0,0 +1,78 @@
+"""
+Print MongoDB explain() plans for the queries issued by the API routes.
+
+Usage:
+    python -m app.db.explain <tenant_id>
+"""
+import asyncio
+import sys
+from typing import Any, Dict, List, Optional, Tuple, Type
+from beanie import Document
+
+from app.core.config import app_settings
+from app.db.database import connect_db
+from app.models.tenant import Tenant
+from app.models.user import User
+from app.models.message import Message
+from app.models.contact import Contact
+from app.models.contact_group import ContactGroup
+from app.models.flow import ChatFlow
+from app.models.ai_config import AIConfig
+from app.models.label import Label
+from app.models.conversation import Conversation
+from app.models.label_count import LabelCount
+
+def route_queries(tenant_id: str) -> List[Tuple[str, Type[Document], Dict[str, Any], Optional[List]]]:
+    newest_first = [("created_at", -1), ("_id", -1)]
+    inbox_order = [("last_message_at", -1), ("_id", -1)]
+    return [
+        ("webhook: tenant by phone_number_id", Tenant, {"whatsapp_accounts.phone_number_id": "0"}, None),
+        ("webhook: dedup by whatsapp_message_id", Message, {"whatsapp_message_id": "wamid.0"}, None),
+        ("GET /api/messages", Message, {"tenant_id": tenant_id}, newest_first),
+        ("GET /api/messages?whatsapp_account_id", Message, {"tenant_id": tenant_id, "whatsapp_account_id": "0"}, newest_first),
+        ("GET /api/messages?from_number", Message, {"tenant_id": tenant_id, "from_number": "0"}, newest_first),
+        ("GET /api/conversations", Conversation, {"tenant_id": tenant_id}, inbox_order),
+        ("GET /api/conversations?assigned_agent_id", Conversation, {"tenant_id": tenant_id, "assigned_agent_id": "0"}, inbox_order),
+        ("GET /api/conversations?label_id", Conversation, {"tenant_id": tenant_id, "labels.label_id": "0"}, inbox_order),
+        ("GET /api/labels/counts", LabelCount, {"tenant_id": tenant_id}, None),
+        ("GET /api/contact-groups", ContactGroup, {"tenant_id": tenant_id, "parent_group_id": None}, None),
+        ("contact group members", Contact, {"group_ids": "0"}, None),
+        ("contact by phone number", Contact, {"tenant_id": tenant_id, "phone_number": "0"}, None),
+        ("POST /api/users/token", User, {"email": "user@example.com"}, None),
+        ("GET /api/users", User, {"tenant_id": tenant_id}, None),
+        ("GET /api/flows", ChatFlow, {"tenant_id": tenant_id}, None),
+        ("GET /api/ai/config", AIConfig, {"tenant_id": tenant_id}, None),
+        ("GET /api/labels", Label, {"tenant_id": tenant_id}, None),
+    ]
+
+def summarize_plan(plan: Dict[str, Any]) -> str:
+    stages = []
+    while plan:
+        stage = plan.get("stage", "?")
+        if plan.get("indexName"):
+            stage = f"{stage}({plan['indexName']})"
+        stages.append(stage)
+        plan = plan.get("inputStage") or (plan.get("inputStages") or [None])[0]
+    return " <- ".join(stages)
+
+async def explain_all(tenant_id: str):
+    await connect_db(app_settings)
+    for description, model, query, sort in route_queries(tenant_id):
+        cursor = model.get_motor_collection().find(query)
+        if sort:
+            cursor = cursor.sort(sort)
+        explanation = await cursor.limit(50).explain()
+        winning = explanation.get("queryPlanner", {}).get("winningPlan", {})
+        stats = explanation.get("executionStats", {})
+        print(f"{description}")
+        print(f"  collection: {model.get_motor_collection().name}")
+        print(f"  plan:       {summarize_plan(winning.get('queryPlan', winning))}")
+        if stats:
+            print(f"  examined:   {stats.get('totalKeysExamined')} keys, {stats.get('totalDocsExamined')} docs")
+        print()
+
+if __name__ == "__main__":
+    if len(sys.argv) != 2:
+        print(__doc__)
+        sys.exit(1)
+    asyncio.run(explain_all(sys.argv[1]))
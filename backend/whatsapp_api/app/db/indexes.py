@@ -0,0 +1,74 @@
+import logging
+from typing import List, Dict, Type, Any
+from beanie import Document
+from pymongo.errors import OperationFailure
+
+logger = logging.getLogger(__name__)
+
+def declared_indexes(model: Type[Document]) -> Dict[str, Any]:
+    """Return the IndexModels declared in a document's Settings, keyed by name"""
+    indexes = {}
+    for index in model.get_settings().indexes or []:
+        # Beanie wraps each declared IndexModel in an IndexModelField
+        index_model = getattr(index, "index", index)
+        indexes[index_model.document["name"]] = index_model
+    return indexes
+
+async def reconcile_indexes(
+    document_models: List[Type[Document]],
+    apply: bool = True
+) -> Dict[str, Dict[str, List[str]]]:
+    """
+    Create declared indexes that are missing and report, per collection, the
+    indexes that could not be built, indexes present in the database but not
+    declared, and declared indexes that have not served a query since the
+    server started. With `apply` False nothing is built and every missing
+    declared index is reported as missing.
+    """
+    report = {}
+    for model in document_models:
+        collection = model.get_motor_collection()
+        declared = declared_indexes(model)
+        existing = await collection.index_information()
+
+        created, failed = [], []
+        for name, index in declared.items():
+            if name in existing:
+                continue
+            if not apply:
+                failed.append(name)
+                continue
+            try:
+                await collection.create_indexes([index])
+                created.append(name)
+            except OperationFailure as e:
+                logger.error(f"Could not create index {name} on {collection.name}: {str(e)}")
+                failed.append(name)
+
+        undeclared = [name for name in existing if name != "_id_" and name not in declared]
+
+        unused = []
+        try:
+            async for stats in collection.aggregate([{"$indexStats": {}}]):
+                if stats["name"] in declared and stats.get("accesses", {}).get("ops", 0) == 0:
+                    unused.append(stats["name"])
+        except OperationFailure:
+            pass
+
+        report[collection.name] = {
+            "created": created,
+            "missing": failed,
+            "undeclared": undeclared,
+            "unused": unused
+        }
+
+        if not apply:
+            continue
+        if created:
+            logger.info(f"Created indexes on {collection.name}: {', '.join(created)}")
+        if failed:
+            logger.warning(f"Missing indexes on {collection.name}: {', '.join(failed)}")
+        if undeclared:
+            logger.warning(f"Undeclared indexes on {collection.name}: {', '.join(undeclared)}")
+
+    return report
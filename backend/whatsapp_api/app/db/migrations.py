@@ -0,0 +1,95 @@
+"""
+One-off data migrations.
+
+Usage:
+    python -m app.db.migrations <name>
+
+Every migration is idempotent and can be re-run after an interruption.
+"""
+import asyncio
+import logging
+import sys
+
+from bson import ObjectId
+
+from app.core.config import app_settings
+from app.db.database import connect_db
+from app.models.contact import Contact
+from app.models.contact_group import ContactGroup
+from app.models.tenant import Tenant
+from app.models.conversation import Conversation
+from app.services.group_hierarchy import backfill_ancestor_paths
+from app.services.conversations import backfill_conversations
+from app.services.labels import recount_labels
+from app.services.billing import backfill_costs
+
+logger = logging.getLogger(__name__)
+
+async def migrate_group_membership():
+    """
+    Move the legacy ContactGroup.contacts arrays onto Contact.group_ids and
+    remove them from the group documents
+    """
+    groups = ContactGroup.get_motor_collection()
+    contacts = Contact.get_motor_collection()
+
+    migrated = 0
+    async for group in groups.find({"contacts": {"$exists": True}}, {"tenant_id": 1, "contacts": 1}):
+        group_id = str(group["_id"])
+        contact_ids = [ObjectId(contact_id) for contact_id in group.get("contacts") or [] if ObjectId.is_valid(contact_id)]
+        if contact_ids:
+            result = await contacts.update_many(
+                {"_id": {"$in": contact_ids}, "tenant_id": group["tenant_id"]},
+                {"$addToSet": {"group_ids": group_id}}
+            )
+            logger.info(f"Group {group_id}: {result.modified_count} of {len(contact_ids)} contacts updated")
+        await groups.update_one({"_id": group["_id"]}, {"$unset": {"contacts": ""}})
+        migrated += 1
+
+    logger.info(f"Migrated membership of {migrated} contact groups")
+
+async def migrate_group_ancestors():
+    """Populate ContactGroup.ancestor_ids from the parent_group_id pointers"""
+    tenant_ids = await ContactGroup.get_motor_collection().distinct("tenant_id")
+    for tenant_id in tenant_ids:
+        updated = await backfill_ancestor_paths(tenant_id)
+        logger.info(f"Tenant {tenant_id}: ancestor paths written for {updated} groups")
+
+async def migrate_conversations():
+    """Build the conversations collection from existing messages"""
+    async for tenant in Tenant.get_motor_collection().find({}, {"whatsapp_accounts.display_phone_number": 1}):
+        numbers = [account.get("display_phone_number") for account in tenant.get("whatsapp_accounts") or []]
+        processed = await backfill_conversations(str(tenant["_id"]), [number for number in numbers if number])
+        logger.info(f"Tenant {tenant['_id']}: {processed} messages folded into conversations")
+
+async def migrate_label_counts():
+    """Rebuild the per-tenant label counters from the conversations"""
+    tenant_ids = await Conversation.get_motor_collection().distinct("tenant_id")
+    for tenant_id in tenant_ids:
+        labels = await recount_labels(tenant_id)
+        logger.info(f"Tenant {tenant_id}: {labels} label counters rebuilt")
+
+async def migrate_billing():
+    """Stamp costs on historical messages and build the billing rollups; resumable"""
+    processed = await backfill_costs()
+    logger.info(f"Billing backfill processed {processed} messages")
+
+MIGRATIONS = {
+    "group-membership": migrate_group_membership,
+    "group-ancestors": migrate_group_ancestors,
+    "conversations": migrate_conversations,
+    "label-counts": migrate_label_counts,
+    "billing-backfill": migrate_billing,
+}
+
+async def run(name: str):
+    await connect_db(app_settings)
+    await MIGRATIONS[name]()
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+    if len(sys.argv) != 2 or sys.argv[1] not in MIGRATIONS:
+        print(__doc__)
+        print("Available migrations: " + ", ".join(MIGRATIONS))
+        sys.exit(1)
+    asyncio.run(run(sys.argv[1]))
@@ -11,8 +11,25 @@ from app.api.routes.ai import router as ai_router
 from app.api.routes.contact_groups import router as contact_groups_router
 from app.api.routes.system import router as system_router
 from app.api.routes.labels import router as labels_router
+from app.api.routes.contacts import router as contacts_router
+from app.api.routes.conversations import router as conversations_router
+from app.api.routes.realtime import router as realtime_router
+from app.api.routes.usage import router as usage_router
+from app.api.routes.billing import router as billing_router
 from app.core.config import app_settings
 from app.db.database import init_db
+from app.services.webhook_ingest import webhook_ingest
+from app.services.tenant_routing import tenant_routing
+from app.services.whatsapp import close_http_client
+from app.services.outbound_webhook import close_webhook_client
+from app.services.outbox import OutboxWorker
+from app.services.realtime import realtime_hub
+from app.services.usage import usage_meter
+from app.services.scheduler import scheduler
+from app.services.broadcast import start_broadcast_resumer, stop_broadcast_resumer
+from app.services.ai_clients import ai_clients
+
+outbox_worker = OutboxWorker()
 
 app = FastAPI(title=app_settings.app_name)
 
@@ -33,6 +50,26 @@ logging.basicConfig(
 @app.on_event("startup")
 async def startup_db_client():
     await init_db(app_settings)
+    webhook_ingest.start()
+    await realtime_hub.start()
+    usage_meter.start()
+    scheduler.start()
+    start_broadcast_resumer()
+    if app_settings.outbox_embedded_worker:
+        outbox_worker.start()
+
+@app.on_event("shutdown")
+async def shutdown_background_workers():
+    await webhook_ingest.stop()
+    await outbox_worker.stop()
+    await realtime_hub.stop()
+    await usage_meter.stop()
+    await scheduler.stop()
+    await stop_broadcast_resumer()
+    await tenant_routing.stop_watching()
+    await close_http_client()
+    await close_webhook_client()
+    await ai_clients.close()
 
 @app.get("/healthz")
 async def healthz():
@@ -47,3 +84,8 @@ app.include_router(ai_router, prefix="/api/ai", tags=["ai"])
 app.include_router(contact_groups_router, prefix="/api/contact-groups", tags=["contact-groups"])
 app.include_router(system_router, prefix="/api/system", tags=["system"])
 app.include_router(labels_router, prefix="/api/labels", tags=["labels"])
+app.include_router(contacts_router, prefix="/api/contacts", tags=["contacts"])
+app.include_router(conversations_router, prefix="/api/conversations", tags=["conversations"])
+app.include_router(realtime_router, prefix="/api/realtime", tags=["realtime"])
+app.include_router(usage_router, prefix="/api/usage", tags=["usage"])
+app.include_router(billing_router, prefix="/api/billing", tags=["billing"])
@@ -3,6 +3,7 @@ from typing import Optional
 from enum import Enum
 from beanie import Document
 from pydantic import BaseModel, Field
+from pymongo import IndexModel, ASCENDING
 
 class AIProvider(str, Enum):
     CHATGPT = "chatgpt"
@@ -21,3 +22,6 @@ class AIConfig(Document):
     
     class Settings:
         name = "ai_configs"
+        indexes = [
+            IndexModel([("tenant_id", ASCENDING)], name="tenant_id"),
+        ]
@@ -0,0 +1,45 @@
+from datetime import datetime
+from enum import Enum
+from typing import Optional
+from beanie import Document
+from pydantic import Field
+from pymongo import IndexModel, ASCENDING
+
+from app.models.message import Currency
+
+class BillingPeriod(str, Enum):
+    DAY = "day"
+    MONTH = "month"
+
+class BillingRollup(Document):
+    """Message counts and costs of one WhatsApp account over one UTC day or month"""
+    tenant_id: str
+    whatsapp_account_id: str
+    period_type: BillingPeriod
+    period: str  # YYYY-MM-DD or YYYY-MM
+    currency: Currency = Currency.USD
+    inbound: int = 0
+    outbound: int = 0
+    platform_fee: float = 0.0
+    meta_business_fee: float = 0.0
+    total: float = 0.0
+    backfill_seq: Optional[int] = None  # Last backfill batch applied, makes backfill batches idempotent
+    updated_at: datetime = Field(default_factory=datetime.utcnow)
+
+    class Settings:
+        name = "billing_rollups"
+        indexes = [
+            IndexModel(
+                [("tenant_id", ASCENDING), ("whatsapp_account_id", ASCENDING), ("period_type", ASCENDING), ("period", ASCENDING)],
+                name="tenant_account_period_unique",
+                unique=True
+            ),
+            IndexModel(
+                [("period_type", ASCENDING), ("period", ASCENDING), ("tenant_id", ASCENDING)],
+                name="period_tenant"
+            ),
+            IndexModel(
+                [("tenant_id", ASCENDING), ("period_type", ASCENDING), ("period", ASCENDING)],
+                name="tenant_period"
+            ),
+        ]
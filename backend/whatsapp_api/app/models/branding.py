@@ -2,6 +2,7 @@ from datetime import datetime
 from typing import Optional
 from beanie import Document
 from pydantic import BaseModel, Field, HttpUrl
+from pymongo import IndexModel, ASCENDING
 
 class BrandingColors(BaseModel):
     primary: str = "#1a56db"
@@ -22,3 +23,6 @@ class BrandingSettings(Document):
     
     class Settings:
         name = "branding_settings"
+        indexes = [
+            IndexModel([("tenant_id", ASCENDING)], name="tenant_id"),
+        ]
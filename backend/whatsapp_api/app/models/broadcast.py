@@ -0,0 +1,47 @@
+from datetime import datetime
+from enum import Enum
+from typing import Optional, Dict, Any
+from beanie import Document
+from pydantic import Field
+from pymongo import IndexModel, ASCENDING, DESCENDING
+
+from app.models.message import MessageType
+
+class BroadcastStatus(str, Enum):
+    PENDING = "pending"
+    EXPANDING = "expanding"
+    QUEUED = "queued"
+    COMPLETED = "completed"
+    LIMITED = "limited"  # Fan-out stopped by the daily usage limit; every queued message sent or failed
+    FAILED = "failed"
+
+class Broadcast(Document):
+    tenant_id: str
+    group_id: str
+    created_by: str
+    whatsapp_account_id: str
+    message_type: MessageType
+    content: Dict[str, Any]
+    include_subgroups: bool = True
+    status: BroadcastStatus = BroadcastStatus.PENDING
+    total_recipients: int = 0
+    queued: int = 0  # Messages created and handed to the outbox
+    sent: int = 0
+    failed: int = 0
+    error: Optional[str] = None
+    limit_reached: bool = False  # Recipients were left out because of the daily usage limit
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+    started_at: Optional[datetime] = None
+    queued_at: Optional[datetime] = None  # Fan-out finished
+    completed_at: Optional[datetime] = None  # Every queued message sent or failed
+    expansion_cursor: Optional[str] = None  # _id of the last contact expanded, where a resumed fan-out starts
+    checkpoint_at: Optional[datetime] = None  # When expansion_cursor was last saved
+    lease_owner: Optional[str] = None  # Process running the fan-out
+    lease_until: Optional[datetime] = None
+    
+    class Settings:
+        name = "broadcasts"
+        indexes = [
+            IndexModel([("tenant_id", ASCENDING), ("group_id", ASCENDING), ("created_at", DESCENDING)], name="tenant_group_created_at"),
+            IndexModel([("status", ASCENDING), ("lease_until", ASCENDING)], name="status_lease_until"),
+        ]
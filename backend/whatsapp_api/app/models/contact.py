@@ -2,6 +2,7 @@ from datetime import datetime
 from typing import List, Optional, Dict
 from beanie import Document
 from pydantic import BaseModel, Field
+from pymongo import IndexModel, ASCENDING
 
 class Label(BaseModel):
     name: str
@@ -16,9 +17,18 @@ class Contact(Document):
     labels: List[Label] = []
     custom_fields: Dict[str, str] = {}
     variant_field_values: Dict[str, str] = {}  # Added for storing variant field values
-    group_ids: List[str] = []  # Added for storing group memberships
+    group_ids: List[str] = []  # Group memberships; the only place membership is stored
     created_at: datetime = Field(default_factory=datetime.utcnow)
     updated_at: datetime = Field(default_factory=datetime.utcnow)
     
     class Settings:
         name = "contacts"
+        indexes = [
+            IndexModel([("tenant_id", ASCENDING), ("phone_number", ASCENDING)], name="tenant_phone_number"),
+            IndexModel(
+                [("tenant_id", ASCENDING), ("whatsapp_account_id", ASCENDING), ("phone_number", ASCENDING)],
+                name="tenant_account_phone_number_unique",
+                unique=True
+            ),
+            IndexModel([("group_ids", ASCENDING), ("_id", ASCENDING)], name="group_ids_id"),
+        ]
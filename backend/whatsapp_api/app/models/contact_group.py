@@ -3,6 +3,7 @@ from typing import List, Optional, Dict, Set
 from enum import Enum
 from beanie import Document, Link
 from pydantic import BaseModel, Field
+from pymongo import IndexModel, ASCENDING
 
 from app.models.contact import Contact
 from app.models.user import Role
@@ -28,8 +29,8 @@ class ContactGroup(Document):
     tenant_id: str
     name: str
     description: Optional[str] = None
-    contacts: List[str] = []  # List of contact IDs
     parent_group_id: Optional[str] = None
+    ancestor_ids: List[str] = []  # Materialized path from the root group down to the parent
     role_permissions: List[RolePermission] = []
     variant_fields: Dict[str, ContactVariantField] = {}
     created_at: datetime = Field(default_factory=datetime.utcnow)
@@ -37,3 +38,7 @@ class ContactGroup(Document):
     
     class Settings:
         name = "contact_groups"
+        indexes = [
+            IndexModel([("tenant_id", ASCENDING), ("parent_group_id", ASCENDING)], name="tenant_parent_group"),
+            IndexModel([("tenant_id", ASCENDING), ("ancestor_ids", ASCENDING)], name="tenant_ancestors"),
+        ]
@@ -0,0 +1,62 @@
+from datetime import datetime
+from enum import Enum
+from typing import Optional, List
+from beanie import Document
+from pydantic import BaseModel, Field
+from pymongo import IndexModel, ASCENDING, DESCENDING
+
+from app.models.label import ConversationLabel
+
+class MessageDirection(str, Enum):
+    INBOUND = "inbound"
+    OUTBOUND = "outbound"
+
+class FlowState(BaseModel):
+    """Where a conversation is waiting inside a chat flow"""
+    flow_id: str
+    node_id: str  # Condition node evaluated against the next inbound message, or a delayed action
+    resume_at: Optional[datetime] = None  # Set while a delayed action waits on the scheduler
+    updated_at: datetime = Field(default_factory=datetime.utcnow)
+
+class Conversation(Document):
+    tenant_id: str
+    whatsapp_account_id: str
+    contact_number: str  # Digits only, as WhatsApp reports it in webhooks
+    last_message_id: Optional[str] = None
+    last_message_preview: Optional[str] = None
+    last_message_type: Optional[str] = None
+    last_message_direction: Optional[MessageDirection] = None
+    last_message_at: Optional[datetime] = None
+    unread_count: int = 0  # Inbound messages since an agent last read the conversation
+    assigned_agent_id: Optional[str] = None
+    labels: List[ConversationLabel] = []
+    flow_state: Optional[FlowState] = None
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+    updated_at: datetime = Field(default_factory=datetime.utcnow)
+
+    class Settings:
+        name = "conversations"
+        indexes = [
+            IndexModel(
+                [("tenant_id", ASCENDING), ("whatsapp_account_id", ASCENDING), ("contact_number", ASCENDING)],
+                name="tenant_account_contact_unique",
+                unique=True
+            ),
+            IndexModel(
+                [("tenant_id", ASCENDING), ("last_message_at", DESCENDING), ("_id", DESCENDING)],
+                name="tenant_last_message_at"
+            ),
+            IndexModel(
+                [("tenant_id", ASCENDING), ("whatsapp_account_id", ASCENDING), ("last_message_at", DESCENDING), ("_id", DESCENDING)],
+                name="tenant_account_last_message_at"
+            ),
+            IndexModel(
+                [("tenant_id", ASCENDING), ("assigned_agent_id", ASCENDING), ("last_message_at", DESCENDING), ("_id", DESCENDING)],
+                name="tenant_agent_last_message_at"
+            ),
+            # Multikey index behind label filters and label cascades
+            IndexModel(
+                [("tenant_id", ASCENDING), ("labels.label_id", ASCENDING), ("last_message_at", DESCENDING), ("_id", DESCENDING)],
+                name="tenant_label_last_message_at"
+            ),
+        ]
@@ -3,6 +3,7 @@ from enum import Enum
 from typing import List, Dict, Any, Optional
 from beanie import Document
 from pydantic import BaseModel, Field
+from pymongo import IndexModel, ASCENDING
 
 class TriggerType(str, Enum):
     KEYWORD = "keyword"
@@ -44,3 +45,6 @@ class ChatFlow(Document):
     
     class Settings:
         name = "chat_flows"
+        indexes = [
+            IndexModel([("tenant_id", ASCENDING), ("active", ASCENDING)], name="tenant_active"),
+        ]
@@ -3,6 +3,7 @@ from enum import Enum
 from typing import List, Dict, Any, Optional
 from beanie import Document
 from pydantic import BaseModel, Field
+from pymongo import IndexModel, ASCENDING
 
 class FormFieldType(str, Enum):
     TEXT = "text"
@@ -39,3 +40,6 @@ class Form(Document):
     
     class Settings:
         name = "forms"
+        indexes = [
+            IndexModel([("tenant_id", ASCENDING)], name="tenant_id"),
+        ]
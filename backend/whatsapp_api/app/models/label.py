@@ -3,6 +3,7 @@ from enum import Enum
 from typing import Optional, List
 from pydantic import Field, BaseModel
 from beanie import Document
+from pymongo import IndexModel, ASCENDING
 
 class LabelColor(str, Enum):
     RED = "red"
@@ -24,6 +25,9 @@ class Label(Document):
     
     class Settings:
         name = "labels"
+        indexes = [
+            IndexModel([("tenant_id", ASCENDING)], name="tenant_id"),
+        ]
 
 class ConversationLabel(BaseModel):
     label_id: str
@@ -0,0 +1,14 @@
+from beanie import Document
+from pymongo import IndexModel, ASCENDING
+
+class LabelCount(Document):
+    """Number of conversations carrying a label, maintained incrementally"""
+    tenant_id: str
+    label_id: str
+    conversations: int = 0
+
+    class Settings:
+        name = "label_counts"
+        indexes = [
+            IndexModel([("tenant_id", ASCENDING), ("label_id", ASCENDING)], name="tenant_label_unique", unique=True),
+        ]
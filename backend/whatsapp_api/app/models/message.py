@@ -3,6 +3,7 @@ from enum import Enum
 from typing import Optional, List, Dict, Any
 from beanie import Document
 from pydantic import BaseModel, Field
+from pymongo import IndexModel, ASCENDING, DESCENDING
 
 from app.models.label import ConversationLabel
 
@@ -56,6 +57,36 @@ class Message(Document):
     response_time: Optional[int] = None  # Time in seconds between message receipt and agent response
     voice_note_duration: Optional[int] = None  # Duration in seconds
     voice_note_expiry: Optional[datetime] = None  # When the voice note should be deleted
+    broadcast_id: Optional[str] = None  # Set on messages created by a group broadcast
     
     class Settings:
         name = "messages"
+        indexes = [
+            # Backstop for webhook retries; outbound messages without an ID yet are not indexed
+            IndexModel(
+                [("whatsapp_message_id", ASCENDING)],
+                name="whatsapp_message_id_unique",
+                unique=True,
+                partialFilterExpression={"whatsapp_message_id": {"$type": "string"}}
+            ),
+            IndexModel(
+                [("tenant_id", ASCENDING), ("created_at", DESCENDING), ("_id", DESCENDING)],
+                name="tenant_created_at"
+            ),
+            IndexModel(
+                [("tenant_id", ASCENDING), ("whatsapp_account_id", ASCENDING), ("created_at", DESCENDING), ("_id", DESCENDING)],
+                name="tenant_account_created_at"
+            ),
+            IndexModel(
+                [("tenant_id", ASCENDING), ("from_number", ASCENDING), ("created_at", DESCENDING), ("_id", DESCENDING)],
+                name="tenant_from_number_created_at"
+            ),
+            IndexModel(
+                [("tenant_id", ASCENDING), ("to_number", ASCENDING), ("created_at", DESCENDING), ("_id", DESCENDING)],
+                name="tenant_to_number_created_at"
+            ),
+            IndexModel(
+                [("tenant_id", ASCENDING), ("labels.label_id", ASCENDING), ("created_at", DESCENDING), ("_id", DESCENDING)],
+                name="tenant_label_created_at"
+            ),
+        ]
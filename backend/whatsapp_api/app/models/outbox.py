@@ -0,0 +1,43 @@
+from datetime import datetime
+from enum import IntEnum
+from typing import Optional
+from beanie import Document
+from pydantic import Field
+from pymongo import IndexModel, ASCENDING
+
+class OutboxPriority(IntEnum):
+    TRANSACTIONAL = 0
+    BROADCAST = 10
+
+class OutboxItem(Document):
+    message_id: str
+    tenant_id: str
+    priority: OutboxPriority = OutboxPriority.TRANSACTIONAL
+    broadcast_id: Optional[str] = None
+    available_at: datetime = Field(default_factory=datetime.utcnow)  # Hidden from workers until then
+    lease_owner: Optional[str] = None
+    attempts: int = 0
+    last_error: Optional[str] = None
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+
+    class Settings:
+        name = "outbox"
+        indexes = [
+            IndexModel([("priority", ASCENDING), ("available_at", ASCENDING)], name="priority_available_at"),
+        ]
+
+class DeadLetter(Document):
+    message_id: str
+    tenant_id: str
+    priority: OutboxPriority
+    broadcast_id: Optional[str] = None
+    attempts: int
+    last_error: Optional[str] = None
+    created_at: datetime
+    dead_at: datetime = Field(default_factory=datetime.utcnow)
+
+    class Settings:
+        name = "outbox_dead_letters"
+        indexes = [
+            IndexModel([("tenant_id", ASCENDING), ("dead_at", ASCENDING)], name="tenant_dead_at"),
+        ]
@@ -0,0 +1,15 @@
+from datetime import datetime
+from beanie import Document
+from pymongo import IndexModel, ASCENDING
+
+class SendRateWindow(Document):
+    """Sends claimed for one phone_number_id during one wall-clock second, across all processes"""
+    id: str  # "<phone_number_id>:<unix second>"
+    used: int = 0
+    expires_at: datetime
+
+    class Settings:
+        name = "send_rate_windows"
+        indexes = [
+            IndexModel([("expires_at", ASCENDING)], name="expires_at_ttl", expireAfterSeconds=0),
+        ]
@@ -0,0 +1,28 @@
+from datetime import datetime
+from enum import Enum
+from typing import Any, Dict, Optional
+from beanie import Document
+from pydantic import Field
+from pymongo import IndexModel, ASCENDING
+
+class ScheduledJobKind(str, Enum):
+    FLOW_RESUME = "flow_resume"  # Continue a flow after a delayed action
+    FLOW_TIME_TRIGGER = "flow_time_trigger"  # A TIME trigger armed by a customer's last message
+
+class ScheduledJob(Document):
+    """A timer that fires once at `due_at`; at most one per (tenant_id, key)"""
+    tenant_id: str
+    kind: ScheduledJobKind
+    key: str  # Scheduling the same key again moves the existing timer
+    due_at: datetime
+    payload: Dict[str, Any] = {}
+    attempts: int = 0
+    last_error: Optional[str] = None
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+
+    class Settings:
+        name = "scheduled_jobs"
+        indexes = [
+            IndexModel([("due_at", ASCENDING)], name="due_at"),
+            IndexModel([("tenant_id", ASCENDING), ("key", ASCENDING)], name="tenant_key_unique", unique=True),
+        ]
@@ -3,6 +3,7 @@ from enum import Enum
 from typing import Optional, List
 from beanie import Document
 from pydantic import BaseModel, Field
+from pymongo import IndexModel, ASCENDING, DESCENDING
 
 class TaskPriority(str, Enum):
     LOW = "low"
@@ -39,3 +40,7 @@ class Task(Document):
     
     class Settings:
         name = "tasks"
+        indexes = [
+            IndexModel([("tenant_id", ASCENDING), ("status", ASCENDING), ("due_date", ASCENDING)], name="tenant_status_due_date"),
+            IndexModel([("assigned_to.agent_id", ASCENDING), ("status", ASCENDING)], name="assignee_status"),
+        ]
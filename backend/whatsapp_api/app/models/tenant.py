@@ -3,6 +3,7 @@ from typing import List, Optional
 from enum import Enum
 from beanie import Document, Link
 from pydantic import BaseModel, Field, EmailStr, HttpUrl
+from pymongo import IndexModel, ASCENDING
 
 class Language(str, Enum):
     ENGLISH = "en"
@@ -19,7 +20,7 @@ class WhatsAppBusinessAccount(BaseModel):
     waba_id: Optional[str] = None
     meta_access_token: Optional[str] = None
     quality_rating: Optional[str] = None
-    messaging_limit: Optional[int] = None
+    messaging_limit: Optional[int] = None  # Meta's 24h business-initiated conversation tier, not a send rate
     about: Optional[str] = None
     address: Optional[str] = None
     description: Optional[str] = None
@@ -35,6 +36,7 @@ class UsageLimits(BaseModel):
     max_agents: int = 5
     max_contacts: int = 1000  # New field for contact limits
     max_contact_groups: int = 50  # New field for contact group limits
+    soft_limit_percent: int = 80  # Usage above this share of a daily limit is flagged, but still allowed
 
 class Currency(str, Enum):
     MRU = "mru"
@@ -95,6 +97,10 @@ class Tenant(Document):
     cost_settings: CostSettings = Field(default_factory=CostSettings)
     email_settings: Optional[EmailSettings] = None
     default_language: Language = Language.ENGLISH
+    timezone: str = "UTC"  # IANA name; daily usage limits roll over at midnight in this zone
     
     class Settings:
         name = "tenants"
+        indexes = [
+            IndexModel([("whatsapp_accounts.phone_number_id", ASCENDING)], name="whatsapp_phone_number_id"),
+        ]
@@ -0,0 +1,18 @@
+from datetime import datetime
+from beanie import Document
+from pydantic import Field
+from pymongo import IndexModel, ASCENDING, DESCENDING
+
+class UsageCounter(Document):
+    """Messages sent by a tenant on one day of the tenant's own calendar"""
+    tenant_id: str
+    day: str  # YYYY-MM-DD in the tenant's timezone
+    messages: int = 0
+    media: int = 0
+    updated_at: datetime = Field(default_factory=datetime.utcnow)
+
+    class Settings:
+        name = "usage_counters"
+        indexes = [
+            IndexModel([("tenant_id", ASCENDING), ("day", DESCENDING)], name="tenant_day_unique", unique=True),
+        ]
@@ -3,6 +3,7 @@ from typing import List, Optional
 from enum import Enum
 from beanie import Document, Link
 from pydantic import BaseModel, Field, EmailStr
+from pymongo import IndexModel, ASCENDING
 
 from app.models.tenant import Language
 
@@ -48,3 +49,7 @@ class User(Document):
     
     class Settings:
         name = "users"
+        indexes = [
+            IndexModel([("email", ASCENDING)], name="email_unique", unique=True),
+            IndexModel([("tenant_id", ASCENDING)], name="tenant_id"),
+        ]
@@ -0,0 +1,18 @@
+from datetime import datetime
+from typing import Any, Dict, Optional
+from beanie import Document
+from pydantic import Field
+from pymongo import IndexModel, ASCENDING
+
+class FailedWebhook(Document):
+    """A webhook payload whose ingestion kept failing, kept until it is replayed"""
+    payload: Dict[str, Any]
+    attempts: int
+    last_error: Optional[str] = None
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+
+    class Settings:
+        name = "failed_webhooks"
+        indexes = [
+            IndexModel([("created_at", ASCENDING)], name="created_at"),
+        ]
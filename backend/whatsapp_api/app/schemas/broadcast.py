@@ -0,0 +1,21 @@
+from pydantic import BaseModel
+from typing import Dict, Any, Optional
+from app.models.message import MessageType
+from app.models.broadcast import Broadcast
+
+class BroadcastCreate(BaseModel):
+    whatsapp_account_id: str
+    message_type: MessageType
+    content: Dict[str, Any]
+    include_subgroups: bool = True
+
+class BroadcastStats(BaseModel):
+    fanout_seconds: Optional[float] = None
+    fanout_per_second: Optional[float] = None  # Messages created and queued per second
+    delivery_seconds: Optional[float] = None
+    delivery_per_second: Optional[float] = None  # Messages sent or failed per second since the broadcast started
+    progress: float = 0.0
+
+class BroadcastProgress(BaseModel):
+    broadcast: Broadcast
+    stats: BroadcastStats
@@ -0,0 +1,10 @@
+from pydantic import BaseModel
+from typing import List, Optional
+from app.models.conversation import Conversation
+
+class ConversationAssign(BaseModel):
+    agent_id: Optional[str] = None  # None unassigns the conversation
+
+class ConversationPage(BaseModel):
+    items: List[Conversation]
+    next_cursor: Optional[str] = None
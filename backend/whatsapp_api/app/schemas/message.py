@@ -1,5 +1,5 @@
 from pydantic import BaseModel
-from typing import Dict, Any
+from typing import Dict, Any, List, Optional
 from app.models.message import MessageType
 
 class MessageCreate(BaseModel):
@@ -13,3 +13,7 @@ class MessageResponse(BaseModel):
     id: str
     status: str
     message: str
+
+class MessagePage(BaseModel):
+    items: List[Dict[str, Any]]
+    next_cursor: Optional[str] = None
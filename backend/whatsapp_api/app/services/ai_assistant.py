@@ -1,12 +1,16 @@
+import asyncio
 import logging
-import httpx
-from typing import List, Dict, Any, Optional, Literal
+from typing import List, Dict, Any, Optional, Literal, Tuple
 from datetime import datetime
 from enum import Enum
 from pydantic import BaseModel
 
+from app.core.config import app_settings
 from app.models.message import Message
 from app.models.tenant import Tenant
+from app.services.ai_cache import ai_reply_cache, ConfigKey
+from app.services.ai_clients import ai_clients, OPENAI_CHAT_URL
+from app.services.keyword_index import KeywordAutomaton
 
 logger = logging.getLogger(__name__)
 
@@ -26,6 +30,38 @@ class AIAssistantConfig(BaseModel):
     max_tokens: int = 500
     deepseek_url: str = "https://dayloul.sat.mr/api/v1/chat/completions"
 
+class RuleBasedReply(BaseModel):
+    keywords: List[str]
+    response: str
+
+# Checked in order; keywords match whole words after normalisation, so
+# "bonjour", "BONJOUR" and "Bonjour!" all hit and "hi" does not match "this"
+RULE_BASED_REPLIES = [
+    RuleBasedReply(
+        keywords=["hello", "hi", "bonjour", "salut", "salam", "مرحبا", "السلام عليكم"],
+        response="Hello! How can I assist you today?"
+    ),
+    RuleBasedReply(
+        keywords=["help", "aide", "مساعدة"],
+        response="I'm here to help! What do you need assistance with?"
+    ),
+    RuleBasedReply(
+        keywords=["order status", "statut de commande", "statut commande"],
+        response="To check your order status, please provide your order number."
+    ),
+]
+FALLBACK_RESPONSE = "I'm not sure I understand. Could you please rephrase your question?"
+
+def build_rule_index(rules: List[RuleBasedReply]) -> KeywordAutomaton:
+    automaton = KeywordAutomaton()
+    for priority, rule in enumerate(rules):
+        for keyword in rule.keywords:
+            automaton.add(keyword, (priority, rule))
+    automaton.build()
+    return automaton
+
+RULE_INDEX = build_rule_index(RULE_BASED_REPLIES)
+
 class AIAssistant:
     """
     AI Assistant service for processing messages and generating responses
@@ -47,7 +83,14 @@ class AIAssistant:
             if self._should_use_rule_based(message_text):
                 return self._get_rule_based_response(message_text)
             
-            ai_response = await self._get_ai_response(message_text)
+            ai_response = ai_reply_cache.get(self.tenant_id, message_text, self._cache_key(self.config.provider))
+            if ai_response is None:
+                answer = await self._get_ai_response(message_text)
+                if answer:
+                    # Keyed on the provider that answered: a DeepSeek tenant's
+                    # ChatGPT fallback is not served later as a DeepSeek reply
+                    ai_response, provider = answer
+                    ai_reply_cache.set(self.tenant_id, message_text, self._cache_key(provider), ai_response)
             if ai_response:
                 return {
                     "message_type": "text",
@@ -64,42 +107,31 @@ class AIAssistant:
     
     def _should_use_rule_based(self, message_text: str) -> bool:
         """Determine if we should use rule-based responses"""
-        simple_patterns = ["hello", "hi", "help", "order status"]
-        return any(pattern in message_text for pattern in simple_patterns)
+        return self._match_rule(message_text) is not None
     
     def _get_rule_based_response(self, message_text: str) -> Dict[str, Any]:
         """Get a rule-based response for simple patterns"""
-        if "hello" in message_text or "hi" in message_text:
-            return {
-                "message_type": "text",
-                "content": {
-                    "text": "Hello! How can I assist you today?"
-                }
-            }
-        elif "help" in message_text:
-            return {
-                "message_type": "text",
-                "content": {
-                    "text": "I'm here to help! What do you need assistance with?"
-                }
-            }
-        elif "order" in message_text and "status" in message_text:
-            return {
-                "message_type": "text",
-                "content": {
-                    "text": "To check your order status, please provide your order number."
-                }
-            }
-        
+        rule = self._match_rule(message_text)
         return {
             "message_type": "text",
             "content": {
-                "text": "I'm not sure I understand. Could you please rephrase your question?"
+                "text": rule.response if rule else FALLBACK_RESPONSE
             }
         }
     
-    async def _get_ai_response(self, message_text: str) -> Optional[str]:
-        """Get a response from the configured AI provider"""
+    @staticmethod
+    def _match_rule(message_text: str) -> Optional["RuleBasedReply"]:
+        """The first rule (in RULE_BASED_REPLIES order) with a keyword in the message"""
+        matches = [payload for _, _, payload in RULE_INDEX.search(message_text)]
+        return min(matches, key=lambda payload: payload[0])[1] if matches else None
+    
+    def _cache_key(self, provider: AIProvider) -> ConfigKey:
+        """(provider, model, temperature) of replies from `provider`; DeepSeek serves whatever model is behind its URL"""
+        model = self.config.deepseek_url if provider == AIProvider.DEEPSEEK else self.config.model
+        return (provider.value, model, self.config.temperature)
+
+    async def _get_ai_response(self, message_text: str) -> Optional[Tuple[str, AIProvider]]:
+        """Get a response from the configured AI provider, with the provider that actually answered"""
         try:
             messages = [
                 AIMessage(
@@ -110,9 +142,9 @@ class AIAssistant:
             ]
             
             if self.config.provider == AIProvider.CHATGPT:
-                return await self._get_chatgpt_response(messages)
+                return self._answered(await self._get_chatgpt_response(messages), AIProvider.CHATGPT)
             elif self.config.provider == AIProvider.DEEPSEEK:
-                return await self._get_deepseek_response(messages)
+                return await self._get_deepseek_with_fallback(messages)
             else:
                 logger.error(f"Unknown AI provider: {self.config.provider}")
                 return None
@@ -121,6 +153,47 @@ class AIAssistant:
             logger.error(f"Error getting AI response: {str(e)}")
             return None
     
+    @staticmethod
+    def _answered(reply: Optional[str], provider: AIProvider) -> Optional[Tuple[str, AIProvider]]:
+        return (reply, provider) if reply else None
+
+    async def _get_deepseek_with_fallback(self, messages: List[AIMessage]) -> Optional[Tuple[str, AIProvider]]:
+        """
+        Ask DeepSeek, falling back to ChatGPT when an API key is configured:
+        immediately if DeepSeek fails or its circuit is open, and as a hedge
+        raced against DeepSeek once it has not answered within `ai_hedge_delay`
+        seconds. The first answer wins and the other request is cancelled.
+        """
+        can_fall_back = bool(self.config.api_key)
+        if not can_fall_back:
+            return self._answered(await self._get_deepseek_response(messages), AIProvider.DEEPSEEK)
+        if not ai_clients.is_available(self.config.deepseek_url):
+            return self._answered(await self._get_chatgpt_response(messages), AIProvider.CHATGPT)
+
+        deepseek = asyncio.create_task(self._get_deepseek_response(messages))
+        hedge_delay = app_settings.ai_hedge_delay or None
+        done, _ = await asyncio.wait({deepseek}, timeout=hedge_delay)
+        if done:
+            return (
+                self._answered(deepseek.result(), AIProvider.DEEPSEEK)
+                or self._answered(await self._get_chatgpt_response(messages), AIProvider.CHATGPT)
+            )
+
+        logger.info(f"DeepSeek slower than {hedge_delay}s for tenant {self.tenant_id}, hedging with ChatGPT")
+        chatgpt = asyncio.create_task(self._get_chatgpt_response(messages))
+        providers = {deepseek: AIProvider.DEEPSEEK, chatgpt: AIProvider.CHATGPT}
+        pending = {deepseek, chatgpt}
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.result():
+                        return task.result(), providers[task]
+            return None
+        finally:
+            for task in pending:
+                task.cancel()
+    
     async def _get_chatgpt_response(self, messages: List[AIMessage]) -> Optional[str]:
         """Get a response from ChatGPT"""
         if not self.config.api_key:
@@ -128,27 +201,17 @@ class AIAssistant:
             return None
             
         try:
-            async with httpx.AsyncClient(timeout=30.0) as client:
-                response = await client.post(
-                    "https://api.openai.com/v1/chat/completions",
-                    headers={
-                        "Authorization": f"Bearer {self.config.api_key}",
-                        "Content-Type": "application/json"
-                    },
-                    json={
-                        "model": self.config.model,
-                        "messages": [msg.dict() for msg in messages],
-                        "temperature": self.config.temperature,
-                        "max_tokens": self.config.max_tokens
-                    }
-                )
-                
-                if response.status_code != 200:
-                    logger.error(f"ChatGPT API error: {response.status_code} {response.text}")
-                    return None
-                
-                data = response.json()
-                return data["choices"][0]["message"]["content"]
+            return await ai_clients.chat_completion(
+                self.tenant_id,
+                OPENAI_CHAT_URL,
+                {
+                    "model": self.config.model,
+                    "messages": [msg.dict() for msg in messages],
+                    "temperature": self.config.temperature,
+                    "max_tokens": self.config.max_tokens
+                },
+                headers={"Authorization": f"Bearer {self.config.api_key}"}
+            )
         except Exception as e:
             logger.error(f"Error calling ChatGPT API: {str(e)}")
             return None
@@ -156,22 +219,15 @@ class AIAssistant:
     async def _get_deepseek_response(self, messages: List[AIMessage]) -> Optional[str]:
         """Get a response from self-hosted DeepSeek R1"""
         try:
-            async with httpx.AsyncClient(timeout=30.0) as client:
-                response = await client.post(
-                    self.config.deepseek_url,
-                    json={
-                        "messages": [msg.dict() for msg in messages],
-                        "temperature": self.config.temperature,
-                        "max_tokens": self.config.max_tokens
-                    }
-                )
-                
-                if response.status_code != 200:
-                    logger.error(f"DeepSeek API error: {response.status_code} {response.text}")
-                    return None
-                
-                data = response.json()
-                return data["choices"][0]["message"]["content"]
+            return await ai_clients.chat_completion(
+                self.tenant_id,
+                self.config.deepseek_url,
+                {
+                    "messages": [msg.dict() for msg in messages],
+                    "temperature": self.config.temperature,
+                    "max_tokens": self.config.max_tokens
+                }
+            )
         except Exception as e:
             logger.error(f"Error calling DeepSeek API: {str(e)}")
             return None
@@ -0,0 +1,103 @@
+import logging
+from typing import Any, Dict, Optional, Tuple
+
+from app.core.cache import TTLCache
+from app.core.config import app_settings
+from app.services.keyword_index import normalize_text
+
+logger = logging.getLogger(__name__)
+
+ConfigKey = Tuple[str, str, float]  # (provider, model, temperature)
+
+def cache_text(message_text: str) -> str:
+    """Normalised words of a message; case, accents, punctuation and spacing are ignored"""
+    return " ".join("".join(char if char.isalnum() else " " for char in normalize_text(message_text)).split())
+
+class AIReplyCache:
+    """
+    Per-tenant cache of AI replies keyed on the normalised message text and
+    the (provider, model, temperature) that produced the reply, so "Prix ?",
+    "prix" and "PRIX!" share one provider call. Each tenant gets its own
+    bounded LRU with TTL expiry, so a busy tenant cannot evict another's
+    replies.
+
+    With `similarity` > 0, an exact miss falls back to the cached message
+    with the largest word overlap (Jaccard) for the same config, if it reaches
+    the threshold. That scan is linear in the tenant's cache size.
+    """
+
+    def __init__(
+        self,
+        maxsize: int = app_settings.ai_cache_size,
+        ttl: float = app_settings.ai_cache_ttl,
+        similarity: float = app_settings.ai_cache_similarity
+    ):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.similarity = similarity
+        self._tenants: Dict[str, TTLCache] = {}
+        self._counters: Dict[str, Dict[str, int]] = {}
+
+    def _count(self, tenant_id: str, outcome: str):
+        counters = self._counters.get(tenant_id)
+        if counters is None:
+            counters = self._counters[tenant_id] = {"hits": 0, "near_hits": 0, "misses": 0}
+        counters[outcome] += 1
+
+    def get(self, tenant_id: str, message_text: str, config: ConfigKey) -> Optional[str]:
+        text = cache_text(message_text)
+        cache = self._tenants.get(tenant_id)
+        entry = cache.get((config, text)) if cache is not None and text else None
+        if entry is not None:
+            self._count(tenant_id, "hits")
+            return entry[1]
+
+        if cache is not None and text and self.similarity > 0:
+            reply = self._nearest(cache, text, config)
+            if reply is not None:
+                self._count(tenant_id, "near_hits")
+                return reply
+
+        self._count(tenant_id, "misses")
+        return None
+
+    def _nearest(self, cache: TTLCache, text: str, config: ConfigKey) -> Optional[str]:
+        tokens = frozenset(text.split())
+        best_score, best_reply = 0.0, None
+        for (entry_config, _), (entry_tokens, reply) in cache.items():
+            if entry_config != config:
+                continue
+            score = len(tokens & entry_tokens) / len(tokens | entry_tokens)
+            if score > best_score:
+                best_score, best_reply = score, reply
+        return best_reply if best_score >= self.similarity else None
+
+    def set(self, tenant_id: str, message_text: str, config: ConfigKey, reply: str):
+        text = cache_text(message_text)
+        if not text or not reply:
+            return
+        cache = self._tenants.get(tenant_id)
+        if cache is None:
+            cache = self._tenants[tenant_id] = TTLCache(maxsize=self.maxsize, ttl=self.ttl)
+        cache.set((config, text), (frozenset(text.split()), reply))
+
+    def clear(self, tenant_id: str):
+        cache = self._tenants.get(tenant_id)
+        if cache is not None:
+            cache.clear()
+
+    def stats(self, tenant_id: Optional[str] = None) -> Dict[str, Any]:
+        """Counters for one tenant, or totals across tenants"""
+        tenant_ids = [tenant_id] if tenant_id else list(self._counters)
+        totals = {"hits": 0, "near_hits": 0, "misses": 0}
+        for current in tenant_ids:
+            for name, value in self._counters.get(current, {}).items():
+                totals[name] += value
+        lookups = sum(totals.values())
+        return {
+            **totals,
+            "entries": sum(len(self._tenants[current]) for current in tenant_ids if current in self._tenants),
+            "hit_rate": round((totals["hits"] + totals["near_hits"]) / lookups, 4) if lookups else 0.0
+        }
+
+ai_reply_cache = AIReplyCache()
@@ -0,0 +1,206 @@
+import asyncio
+import hashlib
+import logging
+import time
+from typing import Any, Dict, Optional
+from urllib.parse import urlsplit
+
+import httpx
+
+from app.core.config import app_settings
+
+logger = logging.getLogger(__name__)
+
+OPENAI_CHAT_URL = "https://api.openai.com/v1/chat/completions"
+
+class AIProviderError(Exception):
+    pass
+
+class AIProviderUnavailable(AIProviderError):
+    """Raised without calling the provider while its circuit is open"""
+    pass
+
+class CircuitBreaker:
+    """
+    Opens after `failure_threshold` consecutive failures and rejects calls
+    for `reset_timeout` seconds, then lets a single trial call through:
+    success closes the circuit, failure opens it again.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold: int, reset_timeout: float):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self._opened_at: Optional[float] = None
+        self._trial_running = False
+
+    @property
+    def state(self) -> str:
+        if self._opened_at is None:
+            return self.CLOSED
+        if time.monotonic() - self._opened_at >= self.reset_timeout:
+            return self.HALF_OPEN
+        return self.OPEN
+
+    def allow(self) -> bool:
+        state = self.state
+        if state == self.CLOSED:
+            return True
+        if state == self.HALF_OPEN and not self._trial_running:
+            self._trial_running = True
+            return True
+        return False
+
+    def record_success(self):
+        self.failures = 0
+        self._opened_at = None
+        self._trial_running = False
+
+    def abandon(self):
+        """Release a half-open trial whose outcome is unknown"""
+        self._trial_running = False
+
+    def record_failure(self):
+        self.failures += 1
+        self._trial_running = False
+        if self._opened_at is not None or self.failures >= self.failure_threshold:
+            self._opened_at = time.monotonic()
+
+class AIClientPool:
+    """
+    Long-lived HTTP clients for AI providers, one per endpoint origin, so
+    replies reuse warm keep-alive connections instead of paying TCP and TLS
+    setup on every call. Calls are capped per tenant and per endpoint.
+
+    Circuit breakers are per endpoint and credential: tenants bring their own
+    OpenAI keys, so one tenant's exhausted quota (429) or revoked key must not
+    open the circuit for every other tenant on the same endpoint. Keyless
+    endpoints such as self-hosted DeepSeek share one breaker.
+    """
+
+    def __init__(
+        self,
+        timeout: float = app_settings.ai_http_timeout,
+        max_connections: int = app_settings.ai_http_max_connections,
+        provider_concurrency: int = app_settings.ai_provider_concurrency,
+        tenant_concurrency: int = app_settings.ai_tenant_concurrency,
+        breaker_failures: int = app_settings.ai_breaker_failures,
+        breaker_reset: float = app_settings.ai_breaker_reset
+    ):
+        self.timeout = timeout
+        self.max_connections = max_connections
+        self.provider_concurrency = provider_concurrency
+        self.tenant_concurrency = tenant_concurrency
+        self.breaker_failures = breaker_failures
+        self.breaker_reset = breaker_reset
+
+        self._clients: Dict[str, httpx.AsyncClient] = {}
+        self._provider_slots: Dict[str, asyncio.Semaphore] = {}
+        self._tenant_slots: Dict[str, asyncio.Semaphore] = {}
+        self._breakers: Dict[str, CircuitBreaker] = {}
+        self._in_flight: Dict[str, int] = {}
+
+    @staticmethod
+    def endpoint(url: str) -> str:
+        parts = urlsplit(url)
+        return f"{parts.scheme}://{parts.netloc}"
+
+    def _client(self, endpoint: str) -> httpx.AsyncClient:
+        client = self._clients.get(endpoint)
+        if client is None or client.is_closed:
+            client = self._clients[endpoint] = httpx.AsyncClient(
+                http2=True,
+                timeout=self.timeout,
+                limits=httpx.Limits(
+                    max_connections=self.max_connections,
+                    max_keepalive_connections=self.max_connections
+                )
+            )
+        return client
+
+    @staticmethod
+    def breaker_key(endpoint: str, headers: Optional[Dict[str, str]] = None) -> str:
+        """`endpoint`, plus a fingerprint of the credential when the call carries one"""
+        credential = (headers or {}).get("Authorization")
+        if not credential:
+            return endpoint
+        return f"{endpoint} key:{hashlib.sha256(credential.encode()).hexdigest()[:12]}"
+
+    def breaker(self, key: str) -> CircuitBreaker:
+        breaker = self._breakers.get(key)
+        if breaker is None:
+            breaker = self._breakers[key] = CircuitBreaker(self.breaker_failures, self.breaker_reset)
+        return breaker
+
+    def is_available(self, url: str, headers: Optional[Dict[str, str]] = None) -> bool:
+        return self.breaker(self.breaker_key(self.endpoint(url), headers)).state != CircuitBreaker.OPEN
+
+    async def chat_completion(
+        self,
+        tenant_id: str,
+        url: str,
+        payload: Dict[str, Any],
+        headers: Optional[Dict[str, str]] = None
+    ) -> str:
+        """POST an OpenAI-style chat completion and return the first choice's content"""
+        endpoint = self.endpoint(url)
+        breaker = self.breaker(self.breaker_key(endpoint, headers))
+        if not breaker.allow():
+            raise AIProviderUnavailable(f"{endpoint} is unavailable after repeated failures")
+
+        tenant_slots = self._tenant_slots.get(tenant_id)
+        if tenant_slots is None:
+            tenant_slots = self._tenant_slots[tenant_id] = asyncio.Semaphore(self.tenant_concurrency)
+        provider_slots = self._provider_slots.get(endpoint)
+        if provider_slots is None:
+            provider_slots = self._provider_slots[endpoint] = asyncio.Semaphore(self.provider_concurrency)
+
+        try:
+            async with tenant_slots, provider_slots:
+                self._in_flight[endpoint] = self._in_flight.get(endpoint, 0) + 1
+                try:
+                    response = await self._client(endpoint).post(url, json=payload, headers=headers)
+                finally:
+                    self._in_flight[endpoint] -= 1
+        except asyncio.CancelledError:
+            breaker.abandon()  # Cancelled by a hedge or shutdown: neither success nor failure
+            raise
+        except httpx.HTTPError as e:
+            breaker.record_failure()
+            raise AIProviderError(f"{endpoint} request failed: {str(e)}") from e
+
+        if response.status_code == 429 or response.status_code >= 500:
+            breaker.record_failure()
+            raise AIProviderError(f"{endpoint} returned {response.status_code}: {response.text}")
+        # Other client errors (bad key, bad model) are configuration problems, not an outage
+        breaker.record_success()
+        if response.status_code != 200:
+            raise AIProviderError(f"{endpoint} returned {response.status_code}: {response.text}")
+        return response.json()["choices"][0]["message"]["content"]
+
+    async def close(self):
+        for client in self._clients.values():
+            await client.aclose()
+        self._clients = {}
+
+    def stats(self) -> Dict[str, Any]:
+        breakers: Dict[str, Dict[str, Any]] = {}
+        for key, breaker in self._breakers.items():
+            breakers.setdefault(key.split(" ", 1)[0], {})[key] = {
+                "circuit": breaker.state,
+                "consecutive_failures": breaker.failures
+            }
+        return {
+            endpoint: {
+                "in_flight": self._in_flight.get(endpoint, 0),
+                "open_circuits": sum(1 for breaker in endpoint_breakers.values() if breaker["circuit"] == CircuitBreaker.OPEN),
+                "circuits": endpoint_breakers
+            }
+            for endpoint, endpoint_breakers in breakers.items()
+        }
+
+ai_clients = AIClientPool()
@@ -0,0 +1,260 @@
+import logging
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from bson import ObjectId
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+
+from app.core.cache import TTLCache
+from app.core.config import app_settings
+from app.models.billing import BillingRollup, BillingPeriod
+from app.models.message import Message, MessageCost, Currency
+from app.models.tenant import Tenant, CostSettings
+
+logger = logging.getLogger(__name__)
+
+DUPLICATE_KEY_ERROR = 11000
+
+_cost_settings = TTLCache(maxsize=10000, ttl=app_settings.billing_settings_ttl)
+
+async def get_cost_settings(tenant_id: str) -> CostSettings:
+    """A tenant's CostSettings, cached for `billing_settings_ttl` seconds"""
+    settings = _cost_settings.get(tenant_id)
+    if settings is None:
+        tenant = await Tenant.get_motor_collection().find_one(
+            {"_id": ObjectId(tenant_id)}, {"cost_settings": 1}
+        ) if ObjectId.is_valid(tenant_id) else None
+        settings = CostSettings(**((tenant or {}).get("cost_settings") or {}))
+        _cost_settings.set(tenant_id, settings)
+    return settings
+
+def invalidate_cost_settings(tenant_id: str):
+    _cost_settings.pop(str(tenant_id))
+
+def message_cost(settings: CostSettings, outbound: bool) -> MessageCost:
+    """
+    Cost of one message. The platform fee applies in both directions, the
+    Meta business fee only to messages we send. The monthly hosting fee is
+    billed once on the invoice, not per message.
+    """
+    platform_fee = settings.platform_fee_per_message
+    meta_business_fee = settings.meta_business_fee_per_message if outbound else 0.0
+    return MessageCost(
+        platform_fee=platform_fee,
+        meta_business_fee=meta_business_fee,
+        maintenance_hosting_fee=0.0,
+        currency=Currency(settings.currency.value),
+        total=round(platform_fee + meta_business_fee, 6)
+    )
+
+RollupKey = Tuple[str, str, BillingPeriod, str]
+
+def _rollup_increments(messages: List[Tuple[Message, bool]]) -> Dict[RollupKey, Dict[str, Any]]:
+    increments: Dict[RollupKey, Dict[str, Any]] = {}
+    for message, outbound in messages:
+        cost = message.cost
+        if cost is None:
+            continue
+        created_at = message.created_at
+        for period_type, period in (
+            (BillingPeriod.DAY, created_at.strftime("%Y-%m-%d")),
+            (BillingPeriod.MONTH, created_at.strftime("%Y-%m")),
+        ):
+            key = (message.tenant_id, message.whatsapp_account_id, period_type, period)
+            entry = increments.setdefault(key, {
+                "inbound": 0, "outbound": 0, "platform_fee": 0.0, "meta_business_fee": 0.0, "total": 0.0,
+                "currency": getattr(cost.currency, "value", cost.currency)
+            })
+            entry["outbound" if outbound else "inbound"] += 1
+            entry["platform_fee"] += cost.platform_fee
+            entry["meta_business_fee"] += cost.meta_business_fee
+            entry["total"] += cost.total
+    return increments
+
+def _rollup_operation(key: RollupKey, entry: Dict[str, Any], backfill_seq: Optional[int] = None) -> UpdateOne:
+    tenant_id, whatsapp_account_id, period_type, period = key
+    selector: Dict[str, Any] = {
+        "tenant_id": tenant_id,
+        "whatsapp_account_id": whatsapp_account_id,
+        "period_type": period_type.value,
+        "period": period
+    }
+    update: Dict[str, Any] = {
+        "$inc": {
+            "inbound": entry["inbound"],
+            "outbound": entry["outbound"],
+            "platform_fee": round(entry["platform_fee"], 6),
+            "meta_business_fee": round(entry["meta_business_fee"], 6),
+            "total": round(entry["total"], 6)
+        },
+        "$set": {"currency": entry["currency"], "updated_at": datetime.utcnow()}
+    }
+    if backfill_seq is not None:
+        # A rollup that already saw this batch no longer matches; the upsert
+        # then hits the unique index and the batch is not counted twice
+        selector["backfill_seq"] = {"$not": {"$gte": backfill_seq}}
+        update["$set"]["backfill_seq"] = backfill_seq
+    return UpdateOne(selector, update, upsert=True)
+
+async def record_costs(messages: List[Message], outbound: bool):
+    """
+    Add stamped messages to their day and month rollups with one bulk_write.
+    Messages are aggregated in memory first, so a batch costs one operation
+    per (account, period) whatever its size.
+    """
+    await _record_costs([(message, outbound) for message in messages])
+
+async def _record_costs(messages: List[Tuple[Message, bool]], backfill_seq: Optional[int] = None):
+    increments = _rollup_increments(messages)
+    if not increments:
+        return
+
+    operations = [_rollup_operation(key, entry, backfill_seq) for key, entry in increments.items()]
+    try:
+        await BillingRollup.get_motor_collection().bulk_write(operations, ordered=False)
+    except BulkWriteError as e:
+        errors = [error for error in e.details.get("writeErrors", []) if error.get("code") != DUPLICATE_KEY_ERROR]
+        if errors or backfill_seq is None:
+            logger.error(f"Error updating billing rollups: {e.details.get('writeErrors', [])[:3]}")
+    except Exception as e:
+        logger.error(f"Error updating billing rollups for {len(messages)} messages: {str(e)}")
+
+async def month_to_date(month: str, tenant_id: Optional[str] = None) -> List[Dict[str, Any]]:
+    """Per-tenant totals of a month, summed over the month rollups of each account"""
+    match: Dict[str, Any] = {"period_type": BillingPeriod.MONTH.value, "period": month}
+    if tenant_id:
+        match["tenant_id"] = tenant_id
+    pipeline = [
+        {"$match": match},
+        {"$group": {
+            "_id": "$tenant_id",
+            "currency": {"$last": "$currency"},
+            "inbound": {"$sum": "$inbound"},
+            "outbound": {"$sum": "$outbound"},
+            "platform_fee": {"$sum": "$platform_fee"},
+            "meta_business_fee": {"$sum": "$meta_business_fee"},
+            "total": {"$sum": "$total"}
+        }},
+        {"$sort": {"_id": 1}}
+    ]
+    rows = await BillingRollup.get_motor_collection().aggregate(pipeline).to_list(None)
+    return [
+        {
+            "tenant_id": row.pop("_id"),
+            **{key: round(value, 6) if isinstance(value, float) else value for key, value in row.items()}
+        }
+        for row in rows
+    ]
+
+async def build_invoice(tenant_id: str, month: str) -> Dict[str, Any]:
+    """Invoice of a tenant for a month, read from its month rollups"""
+    rollups = await BillingRollup.find({
+        "tenant_id": tenant_id,
+        "period_type": BillingPeriod.MONTH.value,
+        "period": month
+    }).sort([("whatsapp_account_id", 1)]).to_list()
+    settings = await get_cost_settings(tenant_id)
+
+    lines = [
+        {
+            "whatsapp_account_id": rollup.whatsapp_account_id,
+            "inbound": rollup.inbound,
+            "outbound": rollup.outbound,
+            "platform_fee": round(rollup.platform_fee, 2),
+            "meta_business_fee": round(rollup.meta_business_fee, 2),
+            "total": round(rollup.total, 2)
+        }
+        for rollup in rollups
+    ]
+    messages_total = round(sum(rollup.total for rollup in rollups), 2)
+    hosting_fee = round(settings.maintenance_hosting_fee_per_month, 2)
+    return {
+        "tenant_id": tenant_id,
+        "month": month,
+        "currency": settings.currency.value,
+        "lines": lines,
+        "messages_total": messages_total,
+        "maintenance_hosting_fee": hosting_fee,
+        "total": round(messages_total + hosting_fee, 2),
+        "generated_at": datetime.utcnow()
+    }
+
+BACKFILL_JOB = "billing-backfill"
+
+async def backfill_costs(batch_size: int = 1000) -> int:
+    """
+    Stamp MessageCost on historical messages and add them to the rollups.
+    Progress is checkpointed after every batch. A batch interrupted half-way
+    is replayed exactly: messages stamped by it carry its sequence number and
+    rollups refuse a sequence number they have already applied.
+    """
+    database = Message.get_motor_collection().database
+    checkpoints = database["job_checkpoints"]
+    state = await checkpoints.find_one({"_id": BACKFILL_JOB})
+    if state is None:
+        # Messages created after this point are stamped by the live paths
+        state = {"_id": BACKFILL_JOB, "last_id": None, "seq": 0, "until_id": ObjectId(), "completed_at": None}
+        await checkpoints.insert_one(state)
+    if state.get("completed_at"):
+        logger.info("Billing backfill already completed")
+        return 0
+
+    business_numbers: Dict[str, set] = {}
+    async for tenant in Tenant.get_motor_collection().find({}, {"whatsapp_accounts.display_phone_number": 1}):
+        business_numbers[str(tenant["_id"])] = {
+            "".join(ch for ch in account.get("display_phone_number") or "" if ch.isdigit())
+            for account in tenant.get("whatsapp_accounts") or []
+        }
+
+    collection = Message.get_motor_collection()
+    processed = 0
+    while True:
+        seq = state["seq"]
+        id_range: Dict[str, Any] = {"$lte": state["until_id"]}
+        if state["last_id"]:
+            id_range["$gt"] = state["last_id"]
+        documents = await collection.find(
+            {"_id": id_range, "$or": [{"cost": None}, {"cost_backfill_seq": seq}]},
+            {"tenant_id": 1, "whatsapp_account_id": 1, "from_number": 1, "is_business_initiated": 1, "cost": 1, "created_at": 1}
+        ).sort("_id", 1).limit(batch_size).to_list(None)
+        if not documents:
+            break
+
+        stamped: List[Tuple[Message, bool]] = []
+        stamps = []
+        for document in documents:
+            own_numbers = business_numbers.get(document["tenant_id"], set())
+            from_digits = "".join(ch for ch in document.get("from_number") or "" if ch.isdigit())
+            outbound = bool(document.get("is_business_initiated")) or from_digits in own_numbers
+            if document.get("cost"):
+                cost = MessageCost(**document["cost"])
+            else:
+                cost = message_cost(await get_cost_settings(document["tenant_id"]), outbound)
+                stamps.append(UpdateOne(
+                    {"_id": document["_id"], "cost": None},
+                    {"$set": {"cost": cost.model_dump(mode="json"), "cost_backfill_seq": seq}}
+                ))
+            stamped.append((Message.model_construct(
+                id=document["_id"],
+                tenant_id=document["tenant_id"],
+                whatsapp_account_id=document["whatsapp_account_id"],
+                created_at=document["created_at"],
+                cost=cost
+            ), outbound))
+
+        if stamps:
+            await collection.bulk_write(stamps, ordered=False)
+        await _record_costs(stamped, backfill_seq=seq)
+
+        state["last_id"] = documents[-1]["_id"]
+        state["seq"] = seq + 1
+        await checkpoints.update_one(
+            {"_id": BACKFILL_JOB},
+            {"$set": {"last_id": state["last_id"], "seq": state["seq"]}}
+        )
+        processed += len(documents)
+        logger.info(f"Billing backfill batch {seq}: {len(documents)} messages, {processed} so far")
+
+    await checkpoints.update_one({"_id": BACKFILL_JOB}, {"$set": {"completed_at": datetime.utcnow()}})
+    return processed
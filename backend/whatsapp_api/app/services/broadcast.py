@@ -0,0 +1,397 @@
+import asyncio
+import logging
+import socket
+import uuid
+from datetime import datetime, timedelta
+from typing import List, Set, AsyncIterator, Dict, Any, Optional
+
+from bson import ObjectId
+from pymongo import ReturnDocument
+
+from app.core.config import app_settings
+from app.models.broadcast import Broadcast, BroadcastStatus
+from app.models.contact import Contact
+from app.models.message import Message, MessageStatus
+from app.models.outbox import OutboxItem, OutboxPriority
+from app.models.conversation import MessageDirection
+from app.schemas.broadcast import BroadcastStats
+from app.services.outbox import enqueue_messages
+from app.services.conversations import conversation_number, record_messages
+from app.services.usage import usage_meter, is_media, UsageLimitExceeded
+from app.services.billing import get_cost_settings, message_cost, record_costs
+from app.services.tenant_routing import tenant_routing
+from app.services.template import CompiledContent, contact_projection
+from app.services.group_hierarchy import subtree_group_ids
+
+logger = logging.getLogger(__name__)
+
+INSTANCE_ID = f"{socket.gethostname()}-{uuid.uuid4().hex[:8]}"
+
+_running: Set[asyncio.Task] = set()
+_resumer: Optional[asyncio.Task] = None
+
+class BroadcastLeaseLost(Exception):
+    """Another process took over the fan-out after this one missed a checkpoint"""
+    pass
+
+async def iter_recipient_chunks(
+    tenant_id: str,
+    group_ids: List[str],
+    chunk_size: int,
+    projection: Dict[str, int],
+    after: Optional[str] = None
+) -> AsyncIterator[List[Dict[str, Any]]]:
+    """
+    Stream the contacts in `group_ids`, unique by phone number digits (one
+    customer can be stored as both "+222..." and "222..."), in chunks in _id
+    order, starting after the contact `after`
+    """
+    seen: Set[str] = set()
+    chunk: List[Dict[str, Any]] = []
+    query = {"tenant_id": tenant_id, "group_ids": {"$in": group_ids}}
+    if after:
+        query["_id"] = {"$gt": ObjectId(after)}
+    cursor = Contact.get_motor_collection().find(query, projection).sort("_id", 1)
+    async for contact in cursor:
+        number = conversation_number(contact.get("phone_number"))
+        if not number or number in seen:
+            continue
+        seen.add(number)
+        chunk.append(contact)
+        if len(chunk) >= chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+async def _claim(broadcast_id: ObjectId) -> Optional[Dict[str, Any]]:
+    """Take the fan-out lease; returns the broadcast as it was before the claim"""
+    now = datetime.utcnow()
+    return await Broadcast.get_motor_collection().find_one_and_update(
+        {
+            "_id": broadcast_id,
+            "status": {"$in": [BroadcastStatus.PENDING.value, BroadcastStatus.EXPANDING.value]},
+            "$or": [{"lease_until": None}, {"lease_until": {"$lt": now}}]
+        },
+        {"$set": {
+            "status": BroadcastStatus.EXPANDING.value,
+            "lease_owner": INSTANCE_ID,
+            "lease_until": now + timedelta(seconds=app_settings.broadcast_lease_ttl)
+        }},
+        return_document=ReturnDocument.BEFORE
+    )
+
+async def _checkpoint(broadcast: Broadcast, queued: int, cursor: Optional[str]):
+    """Count a queued chunk, save the cursor after it and renew the lease"""
+    now = datetime.utcnow()
+    update: Dict[str, Any] = {"$set": {
+        "checkpoint_at": now,
+        "lease_until": now + timedelta(seconds=app_settings.broadcast_lease_ttl)
+    }}
+    if cursor:
+        update["$set"]["expansion_cursor"] = cursor
+    if queued:
+        update["$inc"] = {"queued": queued, "total_recipients": queued}
+    result = await Broadcast.get_motor_collection().update_one(
+        {"_id": broadcast.id, "lease_owner": INSTANCE_ID},
+        update
+    )
+    if not result.matched_count:
+        raise BroadcastLeaseLost(f"Broadcast {broadcast.id} was taken over by another process")
+    broadcast.checkpoint_at = now
+
+async def _recover_unqueued(broadcast: Broadcast):
+    """
+    Messages created after the last checkpoint of an interrupted fan-out were
+    not counted, and may not have reached the outbox: enqueue those that are
+    neither in the outbox nor already sent or failed, and count them all.
+    """
+    query: Dict[str, Any] = {"tenant_id": broadcast.tenant_id, "broadcast_id": str(broadcast.id)}
+    if broadcast.checkpoint_at:
+        query["created_at"] = {"$gte": broadcast.checkpoint_at}
+    messages = await Message.get_motor_collection().find(
+        query, {"status": 1, "whatsapp_message_id": 1}
+    ).to_list(None)
+    if not messages:
+        return
+
+    message_ids = [str(message["_id"]) for message in messages]
+    in_outbox = set(await OutboxItem.get_motor_collection().distinct("message_id", {"message_id": {"$in": message_ids}}))
+    unqueued = [
+        str(message["_id"]) for message in messages
+        if str(message["_id"]) not in in_outbox
+        and not message.get("whatsapp_message_id")
+        and message.get("status") == MessageStatus.SENT.value
+    ]
+    await enqueue_messages(
+        unqueued, broadcast.tenant_id, priority=OutboxPriority.BROADCAST, broadcast_id=str(broadcast.id)
+    )
+    await _checkpoint(broadcast, len(messages), None)
+    logger.info(f"Broadcast {broadcast.id} recovered {len(messages)} messages, {len(unqueued)} re-enqueued")
+
+async def _already_messaged(broadcast: Broadcast, phone_numbers: List[str]) -> Set[str]:
+    """Digits of the numbers in `phone_numbers` the broadcast has messaged, in either stored form"""
+    numbers = {conversation_number(phone_number) for phone_number in phone_numbers}
+    to_numbers = await Message.get_motor_collection().distinct("to_number", {
+        "tenant_id": broadcast.tenant_id,
+        "to_number": {"$in": [form for number in numbers for form in (number, f"+{number}")]},
+        "broadcast_id": str(broadcast.id)
+    })
+    return {conversation_number(to_number) for to_number in to_numbers}
+
+async def run_broadcast(broadcast: Broadcast):
+    """
+    Expand the broadcast's group, create its messages in chunked insert_many
+    batches and hand them to the outbox's broadcast lane.
+
+    The fan-out holds a lease on the broadcast and checkpoints the _id of the
+    last contact expanded after every chunk. If the process dies, the lease
+    expires and `resume_stalled_broadcasts` picks the fan-out up from the
+    checkpoint, skipping numbers the broadcast has already messaged.
+    """
+    collection = Broadcast.get_motor_collection()
+    previous = await _claim(broadcast.id)
+    if not previous:
+        return  # Finished, or being expanded by another process
+    resumed = previous["status"] == BroadcastStatus.EXPANDING.value
+    broadcast = Broadcast.model_validate(previous)
+    if not broadcast.started_at:
+        await collection.update_one({"_id": broadcast.id}, {"$set": {"started_at": datetime.utcnow()}})
+
+    try:
+        routed = await tenant_routing.resolve(broadcast.whatsapp_account_id)
+        if not routed or routed.tenant_id != broadcast.tenant_id:
+            raise ValueError(f"Unknown WhatsApp account {broadcast.whatsapp_account_id}")
+
+        if resumed:
+            logger.info(f"Resuming broadcast {broadcast.id} after contact {broadcast.expansion_cursor}")
+            await _recover_unqueued(broadcast)
+
+        if broadcast.include_subgroups:
+            group_ids = await subtree_group_ids(broadcast.tenant_id, broadcast.group_id)
+        else:
+            group_ids = [broadcast.group_id]
+        content = CompiledContent(broadcast.content)
+        projection = {**contact_projection(content), "_id": 1}
+
+        total = 0
+        media = is_media(broadcast.message_type)
+        cost = message_cost(await get_cost_settings(broadcast.tenant_id), outbound=True)
+        async for contacts in iter_recipient_chunks(
+            broadcast.tenant_id, group_ids, app_settings.broadcast_chunk_size, projection,
+            after=broadcast.expansion_cursor
+        ):
+            if broadcast.error:
+                break
+            cursor = str(contacts[-1]["_id"])
+            if resumed:
+                messaged = await _already_messaged(broadcast, [contact["phone_number"] for contact in contacts])
+                contacts = [contact for contact in contacts if conversation_number(contact["phone_number"]) not in messaged]
+            if not contacts:
+                await _checkpoint(broadcast, 0, cursor)
+                continue
+
+            try:
+                reservation = await usage_meter.reserve(
+                    broadcast.tenant_id, len(contacts), len(contacts) if media else 0, partial=True
+                )
+            except UsageLimitExceeded as e:
+                await _stop_for_limit(broadcast, str(e))
+                break
+            if reservation["granted"] < len(contacts):
+                contacts = contacts[:reservation["granted"]]
+                cursor = str(contacts[-1]["_id"]) if contacts else None
+                await _stop_for_limit(broadcast, "Daily message limit reached")
+                if not contacts:
+                    break
+
+            now = datetime.utcnow()
+            messages = [
+                Message(
+                    id=ObjectId(),
+                    tenant_id=broadcast.tenant_id,
+                    whatsapp_account_id=broadcast.whatsapp_account_id,
+                    from_number=routed.account.display_phone_number,
+                    to_number=contact["phone_number"],
+                    message_type=broadcast.message_type,
+                    content=broadcast.content if content.is_static else content.render(contact),
+                    status=MessageStatus.SENT,
+                    is_business_initiated=True,
+                    broadcast_id=str(broadcast.id),
+                    cost=cost,
+                    created_at=now,
+                    updated_at=now
+                )
+                for contact in contacts
+            ]
+            try:
+                await Message.insert_many(messages)
+                await enqueue_messages(
+                    [message.id for message in messages],
+                    broadcast.tenant_id,
+                    priority=OutboxPriority.BROADCAST,
+                    broadcast_id=str(broadcast.id)
+                )
+            except Exception:
+                await usage_meter.release(broadcast.tenant_id, reservation, len(messages))
+                await _abandon_chunk(messages)
+                raise
+            await record_costs(messages, outbound=True)
+            await record_messages(messages, MessageDirection.OUTBOUND)
+
+            total += len(messages)
+            await _checkpoint(broadcast, len(messages), cursor)
+
+        result = await collection.update_one(
+            {"_id": broadcast.id, "lease_owner": INSTANCE_ID},
+            {"$set": {
+                "status": BroadcastStatus.QUEUED.value,
+                "queued_at": datetime.utcnow(),
+                "lease_owner": None,
+                "lease_until": None
+            }}
+        )
+        if not result.matched_count:
+            raise BroadcastLeaseLost(f"Broadcast {broadcast.id} was taken over by another process")
+        # Deliveries may all have finished while the fan-out was still running
+        await _complete_if_done(broadcast.id)
+        logger.info(f"Broadcast {broadcast.id} queued {total} messages")
+    except BroadcastLeaseLost as e:
+        logger.warning(str(e))
+    except Exception as e:
+        logger.error(f"Broadcast {broadcast.id} failed: {str(e)}")
+        await collection.update_one(
+            {"_id": broadcast.id, "lease_owner": INSTANCE_ID},
+            {"$set": {"status": BroadcastStatus.FAILED.value, "error": str(e), "lease_owner": None, "lease_until": None}}
+        )
+
+async def _abandon_chunk(messages: List[Message]):
+    """Mark the messages of a chunk that failed to reach the outbox as failed, and drop any queued ones"""
+    message_ids = [message.id for message in messages]
+    try:
+        await Message.get_motor_collection().update_many(
+            {"_id": {"$in": message_ids}},
+            {"$set": {"status": MessageStatus.FAILED.value}}
+        )
+        await OutboxItem.get_motor_collection().delete_many(
+            {"message_id": {"$in": [str(message_id) for message_id in message_ids]}}
+        )
+    except Exception as e:
+        logger.error(f"Error abandoning {len(messages)} unqueued broadcast messages: {str(e)}")
+
+async def _stop_for_limit(broadcast: Broadcast, reason: str):
+    """
+    Record why the fan-out stopped early; already queued messages are still
+    delivered and the broadcast then ends as LIMITED rather than COMPLETED
+    """
+    broadcast.error = reason
+    broadcast.limit_reached = True
+    await Broadcast.get_motor_collection().update_one(
+        {"_id": broadcast.id},
+        {"$set": {"error": reason, "limit_reached": True}}
+    )
+    logger.warning(f"Broadcast {broadcast.id} stopped early: {reason}")
+
+def start_broadcast(broadcast: Broadcast):
+    task = asyncio.create_task(run_broadcast(broadcast))
+    _running.add(task)
+    task.add_done_callback(_running.discard)
+
+async def resume_stalled_broadcasts() -> int:
+    """
+    Restart fan-outs whose process died: broadcasts still expanding with an
+    expired lease, and pending ones whose fan-out never started
+    """
+    now = datetime.utcnow()
+    expired = {"$or": [{"lease_until": None}, {"lease_until": {"$lt": now}}]}
+    cursor = Broadcast.get_motor_collection().find({"$or": [
+        {"status": BroadcastStatus.EXPANDING.value, **expired},
+        {
+            "status": BroadcastStatus.PENDING.value,
+            "created_at": {"$lt": now - timedelta(seconds=app_settings.broadcast_lease_ttl)}
+        }
+    ]})
+    resumed = 0
+    async for document in cursor:
+        start_broadcast(Broadcast.model_validate(document))
+        resumed += 1
+    return resumed
+
+async def _resume_loop():
+    while True:
+        try:
+            await resume_stalled_broadcasts()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Error resuming stalled broadcasts: {str(e)}")
+        await asyncio.sleep(app_settings.broadcast_lease_ttl)
+
+def start_broadcast_resumer():
+    global _resumer
+    if _resumer is None or _resumer.done():
+        _resumer = asyncio.create_task(_resume_loop())
+
+async def stop_broadcast_resumer():
+    global _resumer
+    if _resumer:
+        _resumer.cancel()
+        await asyncio.gather(_resumer, return_exceptions=True)
+        _resumer = None
+
+_DONE_PROJECTION = {"status": 1, "sent": 1, "failed": 1, "queued": 1, "limit_reached": 1}
+
+async def record_delivery(broadcast_id: str, sent: bool):
+    """Count a delivered or failed broadcast message and close the broadcast when done"""
+    document = await Broadcast.get_motor_collection().find_one_and_update(
+        {"_id": ObjectId(broadcast_id)},
+        {"$inc": {"sent" if sent else "failed": 1}},
+        projection=_DONE_PROJECTION,
+        return_document=ReturnDocument.AFTER
+    )
+    await _close_if_done(document)
+
+async def _complete_if_done(broadcast_id: ObjectId):
+    await _close_if_done(await Broadcast.get_motor_collection().find_one({"_id": broadcast_id}, _DONE_PROJECTION))
+
+async def _close_if_done(document: Optional[Dict[str, Any]]):
+    """
+    Close a queued broadcast once every queued message was sent or failed:
+    LIMITED if the usage limit cut its fan-out short, COMPLETED otherwise
+    """
+    if (
+        not document
+        or document.get("status") != BroadcastStatus.QUEUED.value
+        or document.get("sent", 0) + document.get("failed", 0) < document.get("queued", 0)
+    ):
+        return
+
+    final = BroadcastStatus.LIMITED if document.get("limit_reached") else BroadcastStatus.COMPLETED
+    await Broadcast.get_motor_collection().update_one(
+        {
+            "_id": document["_id"],
+            "status": BroadcastStatus.QUEUED.value,
+            "$expr": {"$gte": [{"$add": ["$sent", "$failed"]}, "$queued"]}
+        },
+        {"$set": {"status": final.value, "completed_at": datetime.utcnow()}}
+    )
+
+def compute_stats(broadcast: Broadcast) -> BroadcastStats:
+    stats = BroadcastStats()
+    if broadcast.total_recipients:
+        stats.progress = round((broadcast.sent + broadcast.failed) / broadcast.total_recipients, 4)
+
+    if broadcast.started_at:
+        fanout_end = broadcast.queued_at or datetime.utcnow()
+        stats.fanout_seconds = (fanout_end - broadcast.started_at).total_seconds()
+        if stats.fanout_seconds > 0:
+            stats.fanout_per_second = round(broadcast.queued / stats.fanout_seconds, 2)
+
+    if broadcast.started_at and broadcast.queued:
+        # Delivery starts as soon as the first chunk is queued
+        delivery_end = broadcast.completed_at or datetime.utcnow()
+        stats.delivery_seconds = (delivery_end - broadcast.started_at).total_seconds()
+        if stats.delivery_seconds > 0:
+            stats.delivery_per_second = round((broadcast.sent + broadcast.failed) / stats.delivery_seconds, 2)
+
+    return stats
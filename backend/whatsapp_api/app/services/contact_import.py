@@ -0,0 +1,265 @@
+import asyncio
+import codecs
+import csv
+import io
+import logging
+from datetime import datetime
+from typing import Any, Dict, Iterator, List, Optional, Set, Tuple, BinaryIO
+
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+
+from app.core.config import app_settings
+from app.models.contact import Contact
+from app.services.phone import normalize_phone_number, InvalidPhoneNumberError
+
+try:
+    from openpyxl import load_workbook
+except ImportError:  # XLSX support is optional
+    load_workbook = None
+
+logger = logging.getLogger(__name__)
+
+PHONE_COLUMNS = ("phone_number", "phone", "mobile", "whatsapp")
+CONTACT_COLUMNS = ("name", "profile_name")
+MAX_REPORTED_ERRORS = 1000
+
+class ContactImportError(ValueError):
+    pass
+
+def is_valid_field_name(name: str) -> bool:
+    """Whether `name` can be used as a key under custom_fields/variant_field_values"""
+    return "." not in name and "$" not in name
+
+def phone_number_forms(phone_number: str) -> List[str]:
+    """
+    A normalised +E.164 number and its bare-digit form: contacts created from
+    webhooks and before imports were normalised store digits only
+    """
+    return [phone_number, phone_number.lstrip("+")]
+
+def iter_csv_rows(file: BinaryIO) -> Iterator[Dict[str, Any]]:
+    reader = csv.DictReader(codecs.iterdecode(file, "utf-8-sig"))
+    for row in reader:
+        # Trailing commas give empty headers and short rows a None key
+        yield {column.strip(): value for column, value in row.items() if column and column.strip()}
+
+def iter_xlsx_rows(file: BinaryIO) -> Iterator[Dict[str, Any]]:
+    if load_workbook is None:
+        raise ContactImportError("XLSX import requires the openpyxl package")
+
+    workbook = load_workbook(file, read_only=True, data_only=True)
+    try:
+        rows = workbook.active.iter_rows(values_only=True)
+        header = next(rows, None)
+        if not header:
+            return
+        columns = [str(cell).strip() if cell is not None else "" for cell in header]
+        for values in rows:
+            yield {column: value for column, value in zip(columns, values) if column}
+    finally:
+        workbook.close()
+
+def iter_rows(file: BinaryIO, filename: str) -> Iterator[Dict[str, Any]]:
+    if filename.lower().endswith(".xlsx"):
+        return iter_xlsx_rows(file)
+    if filename.lower().endswith(".csv"):
+        return iter_csv_rows(file)
+    raise ContactImportError("Only .csv and .xlsx files are supported")
+
+class ContactImporter:
+    """
+    Streams rows into `contacts` with batched upserts keyed on
+    (tenant_id, whatsapp_account_id, phone_number). The contact limit is
+    checked against a single count taken at the start of the import plus the
+    contacts created so far.
+    """
+
+    def __init__(
+        self,
+        tenant_id: str,
+        whatsapp_account_id: str,
+        max_contacts: int,
+        group_ids: Optional[List[str]] = None,
+        variant_fields: Optional[Set[str]] = None,
+        default_country_code: Optional[str] = app_settings.contacts_default_country_code,
+        batch_size: int = app_settings.contacts_import_batch_size
+    ):
+        self.tenant_id = tenant_id
+        self.whatsapp_account_id = whatsapp_account_id
+        self.max_contacts = max_contacts
+        self.group_ids = group_ids or []
+        self.variant_fields = variant_fields or set()
+        self.default_country_code = default_country_code
+        self.batch_size = batch_size
+
+        self.processed = 0
+        self.created = 0
+        self.updated = 0
+        self.error_count = 0
+        self.errors: List[Dict[str, Any]] = []
+        self._remaining = 0
+        self._rejected_columns: Set[str] = set()
+
+    def _error(self, row_number: int, message: str):
+        self.error_count += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append({"row": row_number, "error": message})
+
+    def _parse_row(self, row_number: int, row: Dict[str, Any]) -> Tuple[str, Dict[str, Any]]:
+        raw_phone = next((row[column] for column in PHONE_COLUMNS if row.get(column)), None)
+        if raw_phone is None:
+            raise ContactImportError("Missing phone number")
+        if isinstance(raw_phone, float):
+            raw_phone = str(int(raw_phone))
+        phone_number = normalize_phone_number(raw_phone, self.default_country_code)
+
+        fields: Dict[str, Any] = {}
+        for column, value in row.items():
+            column = str(column).strip() if column is not None else ""
+            if not column or value is None or value == "" or column in PHONE_COLUMNS:
+                continue
+            if not is_valid_field_name(column):
+                # Reported once, on the first row that has a value for it
+                if column not in self._rejected_columns:
+                    self._rejected_columns.add(column)
+                    self._error(row_number, f"Column '{column}' ignored: names cannot contain '.' or '$'")
+                continue
+            value = str(value).strip()
+            if column in CONTACT_COLUMNS:
+                fields[column] = value
+            elif column in self.variant_fields:
+                fields[f"variant_field_values.{column}"] = value
+            else:
+                fields[f"custom_fields.{column}"] = value
+        return phone_number, fields
+
+    async def run(self, rows: Iterator[Dict[str, Any]]) -> Dict[str, Any]:
+        collection = Contact.get_motor_collection()
+        existing = await collection.count_documents({"tenant_id": self.tenant_id})
+        self._remaining = max(self.max_contacts - existing, 0)
+
+        numbered_rows = enumerate(rows, start=2)  # Row 1 is the header
+        while True:
+            # Reading and parsing CSV/XLSX is CPU-bound: keep it off the event loop
+            batch, exhausted = await asyncio.to_thread(self._read_batch, numbered_rows)
+            if batch:
+                await self._flush(batch)
+            if exhausted:
+                break
+
+        return self.report()
+
+    def _read_batch(self, numbered_rows: Iterator[Tuple[int, Dict[str, Any]]]) -> Tuple[Dict[str, Tuple[int, Dict[str, Any]]], bool]:
+        """Parse rows until a batch is full; returns the batch and whether the rows ran out"""
+        batch: Dict[str, Tuple[int, Dict[str, Any]]] = {}
+        for row_number, row in numbered_rows:
+            self.processed += 1
+            try:
+                phone_number, fields = self._parse_row(row_number, row)
+            except (ContactImportError, InvalidPhoneNumberError) as e:
+                self._error(row_number, str(e))
+                continue
+
+            if phone_number in batch:
+                # Later rows for the same number win
+                batch[phone_number][1].update(fields)
+            else:
+                batch[phone_number] = (row_number, fields)
+
+            if len(batch) >= self.batch_size:
+                return batch, False
+        return batch, True
+
+    async def _flush(self, batch: Dict[str, Tuple[int, Dict[str, Any]]]):
+        collection = Contact.get_motor_collection()
+        key = {"tenant_id": self.tenant_id, "whatsapp_account_id": self.whatsapp_account_id}
+
+        stored_numbers = set(await collection.distinct(
+            "phone_number",
+            {**key, "phone_number": {"$in": [form for number in batch for form in phone_number_forms(number)]}}
+        ))
+
+        now = datetime.utcnow()
+        operations = []
+        row_numbers = []
+        for phone_number, (row_number, fields) in batch.items():
+            forms = phone_number_forms(phone_number)
+            if not stored_numbers.intersection(forms):
+                if self._remaining <= 0:
+                    self._error(row_number, "Contact limit reached")
+                    continue
+                self._remaining -= 1
+
+            update: Dict[str, Any] = {
+                "$set": {**fields, "updated_at": now},
+                "$setOnInsert": {
+                    **key,
+                    "phone_number": phone_number,
+                    "labels": [],
+                    "created_at": now
+                }
+            }
+            if self.group_ids:
+                update["$addToSet"] = {"group_ids": {"$each": self.group_ids}}
+            else:
+                update["$setOnInsert"]["group_ids"] = []
+            # Existing contacts keep whichever form they were stored with
+            operations.append(UpdateOne({**key, "phone_number": {"$in": forms}}, update, upsert=True))
+            row_numbers.append(row_number)
+
+        if not operations:
+            return
+
+        try:
+            result = await collection.bulk_write(operations, ordered=False)
+            self.created += result.upserted_count
+            self.updated += result.matched_count
+        except BulkWriteError as e:
+            details = e.details
+            self.created += details.get("nUpserted", 0)
+            self.updated += details.get("nMatched", 0)
+            for error in details.get("writeErrors", []):
+                self._error(row_numbers[error["index"]], error.get("errmsg", "Write failed"))
+
+    def report(self) -> Dict[str, Any]:
+        return {
+            "processed": self.processed,
+            "created": self.created,
+            "updated": self.updated,
+            "error_count": self.error_count,
+            "errors": self.errors
+        }
+
+EXPORT_COLUMNS = ["phone_number", "name", "profile_name", "whatsapp_account_id", "group_ids"]
+
+async def iter_contacts_csv(query: Dict[str, Any], extra_fields: List[str]):
+    """
+    Stream contacts matching `query` as CSV. Custom and variant fields listed
+    in `extra_fields` become extra columns (variant values win).
+    """
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(EXPORT_COLUMNS + extra_fields)
+
+    projection = {column: 1 for column in EXPORT_COLUMNS}
+    if extra_fields:
+        projection.update({"custom_fields": 1, "variant_field_values": 1})
+
+    cursor = Contact.get_motor_collection().find(query, projection, batch_size=1000).sort("_id")
+    rows = 0
+    async for contact in cursor:
+        custom_fields = contact.get("custom_fields") or {}
+        variant_values = contact.get("variant_field_values") or {}
+        writer.writerow(
+            [contact.get(column) or "" for column in EXPORT_COLUMNS[:-1]]
+            + [";".join(contact.get("group_ids") or [])]
+            + [variant_values.get(field, custom_fields.get(field, "")) for field in extra_fields]
+        )
+        rows += 1
+        if rows % 500 == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+
+    yield buffer.getvalue()
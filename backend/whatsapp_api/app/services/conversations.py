@@ -0,0 +1,209 @@
+import logging
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Tuple
+
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+
+from app.models.conversation import Conversation, MessageDirection
+from app.models.message import Message
+
+logger = logging.getLogger(__name__)
+
+PREVIEW_LENGTH = 120
+DUPLICATE_KEY_ERROR = 11000
+
+def conversation_number(number: str) -> str:
+    """Contact number as used in conversation keys (digits only, no '+')"""
+    return "".join(ch for ch in number or "" if ch.isdigit())
+
+def message_preview(message_type: str, content: Dict[str, Any]) -> str:
+    """Short text shown in the inbox for the last message of a conversation"""
+    content = content or {}
+    text = content.get("body") or content.get("text") or content.get("caption")
+    if isinstance(text, dict):  # Interactive messages nest their text
+        text = text.get("text") or text.get("body")
+    if not text:
+        return f"[{message_type}]"
+    text = str(text)
+    return text if len(text) <= PREVIEW_LENGTH else text[:PREVIEW_LENGTH - 1] + "…"
+
+def message_type_value(message: Message) -> str:
+    return getattr(message.message_type, "value", message.message_type)
+
+ConversationKey = Tuple[str, str, str]
+
+def message_conversation_key(message: Message, direction: MessageDirection) -> ConversationKey:
+    number = message.from_number if direction == MessageDirection.INBOUND else message.to_number
+    return (message.tenant_id, message.whatsapp_account_id, conversation_number(number))
+
+async def record_messages(
+    messages: List[Message],
+    direction: MessageDirection
+) -> Dict[ConversationKey, Dict[str, Any]]:
+    """
+    Fold newly stored messages into their conversations with two unordered
+    bulk_writes. Messages are coalesced per conversation first, so a batch
+    touches each conversation with at most two operations: an upsert that
+    bumps the unread count, and, once every conversation exists, a
+    conditional update that replaces the last-message summary only if this
+    batch is newer than what is stored.
+
+    Returns the `_id`, `assigned_agent_id` and `flow_state` of every touched
+    conversation.
+    """
+    latest: Dict[ConversationKey, Message] = {}
+    unread: Dict[ConversationKey, int] = {}
+    for message in messages:
+        key = message_conversation_key(message, direction)
+        if not key[2]:
+            continue
+        current = latest.get(key)
+        if current is None or message.created_at >= current.created_at:
+            latest[key] = message
+        if direction == MessageDirection.INBOUND:
+            unread[key] = unread.get(key, 0) + 1
+
+    if not latest:
+        return {}
+
+    now = datetime.utcnow()
+    upserts = []
+    summaries = []
+    for key, message in latest.items():
+        selector = {"tenant_id": key[0], "whatsapp_account_id": key[1], "contact_number": key[2]}
+        upserts.append((selector, {
+            "$inc": {"unread_count": unread.get(key, 0)},
+            "$set": {"updated_at": now}
+        }))
+        summaries.append(UpdateOne(
+            {**selector, "$or": [
+                {"last_message_at": None},
+                {"last_message_at": {"$lte": message.created_at}}
+            ]},
+            {"$set": {
+                "last_message_id": str(message.id),
+                "last_message_preview": message_preview(message_type_value(message), message.content),
+                "last_message_type": message_type_value(message),
+                "last_message_direction": direction.value,
+                "last_message_at": message.created_at
+            }}
+        ))
+
+    collection = Conversation.get_motor_collection()
+    try:
+        retries = []
+        try:
+            await collection.bulk_write([
+                UpdateOne(
+                    selector,
+                    {**update, "$setOnInsert": {"assigned_agent_id": None, "labels": [], "created_at": now}},
+                    upsert=True
+                )
+                for selector, update in upserts
+            ], ordered=False)
+        except BulkWriteError as e:
+            # Concurrent upserts of the same new conversation: all but one
+            # insert lose on the unique key, and the conversation now exists
+            for error in e.details.get("writeErrors", []):
+                if error.get("code") != DUPLICATE_KEY_ERROR:
+                    raise
+                selector, update = upserts[error["index"]]
+                retries.append(UpdateOne(selector, update))
+
+        await collection.bulk_write(retries + summaries, ordered=False)
+        return await find_conversations(latest)
+    except Exception as e:
+        # Conversations are a read model; never fail the message write because of them
+        logger.error(f"Error updating {len(latest)} conversations: {str(e)}")
+        return {}
+
+async def find_conversations(keys: Iterable[ConversationKey]) -> Dict[ConversationKey, Dict[str, Any]]:
+    """`_id`, `assigned_agent_id` and `flow_state` of the conversations with the given keys, in one query"""
+    selectors = [
+        {"tenant_id": key[0], "whatsapp_account_id": key[1], "contact_number": key[2]}
+        for key in set(keys)
+    ]
+    if not selectors:
+        return {}
+    documents = await Conversation.get_motor_collection().find(
+        {"$or": selectors},
+        {"tenant_id": 1, "whatsapp_account_id": 1, "contact_number": 1, "assigned_agent_id": 1, "flow_state": 1}
+    ).to_list(None)
+    return {
+        (document["tenant_id"], document["whatsapp_account_id"], document["contact_number"]): document
+        for document in documents
+    }
+
+def message_conversation_filter(message: Message) -> Dict[str, Any]:
+    """Selector of the conversation a message belongs to, whichever its direction"""
+    return {
+        "tenant_id": message.tenant_id,
+        "whatsapp_account_id": message.whatsapp_account_id,
+        "contact_number": {"$in": [conversation_number(message.from_number), conversation_number(message.to_number)]}
+    }
+
+async def _carry_over_labels(messages: List[Tuple[Message, MessageDirection]]):
+    """Add the labels of backfilled messages to their conversations, skipping label_ids already there"""
+    labels: Dict[Tuple[ConversationKey, str], Dict[str, Any]] = {}
+    for message, direction in messages:
+        key = message_conversation_key(message, direction)
+        if not key[2]:
+            continue
+        for label in getattr(message, "labels", None) or []:
+            if label.get("label_id"):
+                labels.setdefault((key, label["label_id"]), label)
+    if not labels:
+        return
+
+    await Conversation.get_motor_collection().bulk_write([
+        UpdateOne(
+            {
+                "tenant_id": key[0],
+                "whatsapp_account_id": key[1],
+                "contact_number": key[2],
+                "labels.label_id": {"$ne": label_id}
+            },
+            {"$push": {"labels": label}}
+        )
+        for (key, label_id), label in labels.items()
+    ], ordered=False)
+
+async def backfill_conversations(tenant_id: str, business_numbers: List[str], batch_size: int = 1000) -> int:
+    """
+    Rebuild the conversations of a tenant from its stored messages. Messages
+    sent from one of `business_numbers` are outbound, all others inbound.
+    Labels put on messages are carried over to their conversation, once per
+    label_id. History is treated as read, so unread counts are reset afterwards.
+    """
+    own_numbers = {conversation_number(number) for number in business_numbers}
+    processed = 0
+    batch: List[Message] = []
+
+    async def flush():
+        inbound = [m for m in batch if conversation_number(m.from_number) not in own_numbers]
+        outbound = [m for m in batch if conversation_number(m.from_number) in own_numbers]
+        if inbound:
+            await record_messages(inbound, MessageDirection.INBOUND)
+        if outbound:
+            await record_messages(outbound, MessageDirection.OUTBOUND)
+        await _carry_over_labels(
+            [(m, MessageDirection.INBOUND) for m in inbound] + [(m, MessageDirection.OUTBOUND) for m in outbound]
+        )
+
+    projection = {
+        "tenant_id": 1, "whatsapp_account_id": 1, "from_number": 1, "to_number": 1,
+        "message_type": 1, "content": 1, "created_at": 1, "labels": 1
+    }
+    async for document in Message.get_motor_collection().find({"tenant_id": tenant_id}, projection, batch_size=batch_size):
+        batch.append(Message.model_construct(id=document.pop("_id"), **document))
+        if len(batch) >= batch_size:
+            await flush()
+            processed += len(batch)
+            batch = []
+    if batch:
+        await flush()
+        processed += len(batch)
+
+    await Conversation.get_motor_collection().update_many({"tenant_id": tenant_id}, {"$set": {"unread_count": 0}})
+    return processed
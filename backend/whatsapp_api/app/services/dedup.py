@@ -0,0 +1,98 @@
+import logging
+from typing import List, Dict
+from bson import ObjectId
+from pymongo.errors import BulkWriteError
+
+from app.core.cache import TTLCache
+from app.core.config import app_settings
+from app.models.message import Message
+
+logger = logging.getLogger(__name__)
+
+DUPLICATE_KEY_ERROR = 11000
+
+class MessageDeduplicator:
+    """
+    Idempotent insert of webhook messages keyed on `whatsapp_message_id`.
+    Recently seen IDs are kept in a bounded LRU/TTL set so Meta retries are
+    dropped without a round-trip; the unique index on `messages` is the
+    backstop for anything that falls out of the hot window or was stored by
+    another worker.
+    """
+
+    def __init__(
+        self,
+        maxsize: int = app_settings.dedup_cache_size,
+        ttl: float = app_settings.dedup_cache_ttl
+    ):
+        self._seen = TTLCache(maxsize=maxsize, ttl=ttl)
+        self.inserted = 0
+        self.dropped_in_memory = 0
+        self.dropped_by_index = 0
+
+    def filter_new(self, documents: List[Message]) -> List[Message]:
+        """Drop documents whose whatsapp_message_id was already seen"""
+        fresh = []
+        batch_ids = set()
+        for document in documents:
+            whatsapp_message_id = document.whatsapp_message_id
+            if whatsapp_message_id:
+                if whatsapp_message_id in batch_ids or whatsapp_message_id in self._seen:
+                    self.dropped_in_memory += 1
+                    continue
+                batch_ids.add(whatsapp_message_id)
+            fresh.append(document)
+        return fresh
+
+    def remember(self, whatsapp_message_id: str):
+        self._seen.set(whatsapp_message_id, True)
+
+    async def insert_many(self, documents: List[Message]) -> List[Message]:
+        """
+        Insert documents, skipping duplicates, and return the documents that
+        were actually stored. IDs are assigned up front so callers can refer
+        to the stored messages.
+        """
+        documents = self.filter_new(documents)
+        if not documents:
+            return []
+
+        for document in documents:
+            if document.id is None:
+                document.id = ObjectId()
+
+        duplicates = set()
+        failed = set()
+        try:
+            await Message.insert_many(documents, ordered=False)
+        except BulkWriteError as e:
+            for error in e.details.get("writeErrors", []):
+                if error.get("code") == DUPLICATE_KEY_ERROR:
+                    duplicates.add(error["index"])
+                else:
+                    failed.add(error["index"])
+                    logger.error(f"Error inserting webhook message: {error.get('errmsg')}")
+            self.dropped_by_index += len(duplicates)
+
+        stored = []
+        for index, document in enumerate(documents):
+            if index in failed:
+                continue
+            # Duplicates are remembered too so the next retry is dropped in memory
+            if document.whatsapp_message_id:
+                self.remember(document.whatsapp_message_id)
+            if index not in duplicates:
+                stored.append(document)
+
+        self.inserted += len(stored)
+        return stored
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "inserted": self.inserted,
+            "dropped_in_memory": self.dropped_in_memory,
+            "dropped_by_index": self.dropped_by_index,
+            "cached_ids": len(self._seen)
+        }
+
+message_deduplicator = MessageDeduplicator()
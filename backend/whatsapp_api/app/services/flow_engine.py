@@ -0,0 +1,661 @@
+import asyncio
+import logging
+import re
+import time
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+
+from bson import ObjectId
+
+from app.core.config import app_settings
+from app.models.contact import Contact
+from app.models.conversation import Conversation, FlowState, MessageDirection
+from app.models.flow import ChatFlow, NodeType, TriggerType, ActionType
+from app.models.message import Message, MessageType
+from app.models.schedule import ScheduledJob, ScheduledJobKind
+from app.services.keyword_index import KeywordAutomaton, normalize_text
+from app.services.conversations import message_conversation_key, message_type_value, conversation_number
+from app.services.messaging import queue_message
+from app.services.realtime import realtime_hub, build_event, EventType
+from app.services.scheduler import scheduler
+from app.services.template import CompiledTemplate
+from app.services.tenant_routing import tenant_routing
+from app.services.usage import UsageLimitExceeded
+from app.services.contact_import import is_valid_field_name
+from app.services.outbound_webhook import check_webhook_url, post_webhook, UnsafeWebhookURL
+
+logger = logging.getLogger(__name__)
+
+MAX_STEPS = 200  # Guards against cycles in a flow graph
+TRUE_LABELS = {"yes", "true", "match", "matched"}
+FALSE_LABELS = {"no", "false", "else", "otherwise"}
+CONTACT_ATTRIBUTES = {"name", "profile_name", "phone_number"}
+
+class FlowCompileError(ValueError):
+    pass
+
+def inbound_text(message_type: str, content: Dict[str, Any]) -> str:
+    """The text a customer typed or picked, whatever the message type"""
+    content = content or {}
+    text = content.get("body") or content.get("text") or content.get("caption")
+    if isinstance(text, dict):
+        text = text.get("text") or text.get("body")
+    if not text and message_type == MessageType.INTERACTIVE.value:
+        reply = content.get("button_reply") or content.get("list_reply") or {}
+        text = reply.get("title")
+    return str(text) if text else ""
+
+class EvaluationContext:
+    __slots__ = ("text", "normalized", "message_type", "contact")
+
+    def __init__(self, text: str, message_type: str, contact: Optional[Dict[str, Any]] = None):
+        self.text = text
+        self.normalized = normalize_text(text)
+        self.message_type = message_type
+        self.contact = contact
+
+Predicate = Callable[[EvaluationContext], bool]
+
+def _compile_getter(field: str) -> Tuple[Callable[[EvaluationContext], Any], bool]:
+    """Value lookup for a condition field and whether it needs the contact document"""
+    if field in ("message", "text"):
+        return (lambda ctx: ctx.text), False
+    if field == "message_type":
+        return (lambda ctx: ctx.message_type), False
+    if field.startswith("variant_"):
+        name = field[len("variant_"):]
+        return (lambda ctx: ((ctx.contact or {}).get("variant_field_values") or {}).get(name)), True
+    if field.startswith("custom_"):
+        name = field[len("custom_"):]
+        return (lambda ctx: ((ctx.contact or {}).get("custom_fields") or {}).get(name)), True
+    if field in CONTACT_ATTRIBUTES:
+        return (lambda ctx: (ctx.contact or {}).get(field)), True
+    raise FlowCompileError(f"Unknown condition field {field}")
+
+def _as_number(value: Any) -> Optional[float]:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+def compile_condition(config: Dict[str, Any]) -> Tuple[Predicate, bool]:
+    """Turn a condition node config into a predicate; returns (predicate, needs_contact)"""
+    getter, needs_contact = _compile_getter(config.get("field") or "message")
+    operator = config.get("operator") or "contains"
+    value = config.get("value")
+    folded = normalize_text(str(value)) if value is not None else ""
+
+    def text_of(ctx: EvaluationContext) -> Optional[str]:
+        found = getter(ctx)
+        return None if found is None else normalize_text(str(found))
+
+    if operator == "equals":
+        test = lambda ctx: text_of(ctx) == folded
+    elif operator == "not_equals":
+        test = lambda ctx: text_of(ctx) != folded
+    elif operator == "contains":
+        test = lambda ctx: folded in (text_of(ctx) or "")
+    elif operator == "not_contains":
+        test = lambda ctx: folded not in (text_of(ctx) or "")
+    elif operator == "starts_with":
+        test = lambda ctx: (text_of(ctx) or "").startswith(folded)
+    elif operator == "ends_with":
+        test = lambda ctx: (text_of(ctx) or "").endswith(folded)
+    elif operator == "in":
+        options = {normalize_text(str(option)) for option in (value if isinstance(value, list) else [value])}
+        test = lambda ctx: text_of(ctx) in options
+    elif operator == "regex":
+        try:
+            pattern = re.compile(str(value), re.IGNORECASE)
+        except re.error as e:
+            raise FlowCompileError(f"Invalid regex {value}: {e}")
+        test = lambda ctx: bool(pattern.search(str(getter(ctx) or "")))
+    elif operator in ("exists", "not_exists"):
+        expected = operator == "exists"
+        test = lambda ctx: (getter(ctx) not in (None, "")) == expected
+    elif operator in ("gt", "gte", "lt", "lte"):
+        threshold = _as_number(value)
+        if threshold is None:
+            raise FlowCompileError(f"Operator {operator} needs a numeric value")
+        compare = {
+            "gt": lambda found: found > threshold,
+            "gte": lambda found: found >= threshold,
+            "lt": lambda found: found < threshold,
+            "lte": lambda found: found <= threshold,
+        }[operator]
+
+        def test(ctx: EvaluationContext) -> bool:
+            found = _as_number(getter(ctx))
+            return found is not None and compare(found)
+    else:
+        raise FlowCompileError(f"Unknown condition operator {operator}")
+    return test, needs_contact
+
+def _delay_seconds(config: Dict[str, Any]) -> float:
+    delay = _as_number(config.get("delay_minutes") or 0)
+    if delay is None or delay < 0:
+        raise FlowCompileError(f"Invalid delay_minutes {config.get('delay_minutes')}")
+    return delay * 60
+
+class CompiledTrigger:
+    __slots__ = ("node_id", "type", "keywords", "exact", "delay_seconds", "config")
+
+    def __init__(self, node_id: str, config: Dict[str, Any]):
+        self.node_id = node_id
+        try:
+            self.type = TriggerType(config.get("type") or TriggerType.KEYWORD.value)
+        except ValueError:
+            raise FlowCompileError(f"Unknown trigger type {config.get('type')}")
+        self.config = config
+        self.exact = config.get("match") == "exact"
+        # Intents have no classifier yet and match on their example phrases
+        self.keywords: List[str] = []
+        if self.type in (TriggerType.KEYWORD, TriggerType.INTENT):
+            self.keywords = [str(keyword) for keyword in config.get("keywords") or config.get("examples") or []]
+        # Time triggers fire this long after the customer's last message
+        self.delay_seconds = _delay_seconds(config) if self.type == TriggerType.TIME else 0.0
+        if self.type == TriggerType.TIME and not self.delay_seconds:
+            raise FlowCompileError("Time triggers need a positive delay_minutes")
+
+class CompiledAction:
+    __slots__ = ("node_id", "type", "config", "template", "delay_seconds")
+
+    def __init__(self, node_id: str, config: Dict[str, Any]):
+        self.node_id = node_id
+        try:
+            self.type = ActionType(config.get("type") or ActionType.SEND_MESSAGE.value)
+        except ValueError:
+            raise FlowCompileError(f"Unknown action type {config.get('type')}")
+        self.config = config
+        self.template = CompiledTemplate(str(config.get("message") or "")) if self.type == ActionType.SEND_MESSAGE else None
+        self.delay_seconds = _delay_seconds(config)  # e.g. a follow-up sent a day later
+
+        if self.type == ActionType.UPDATE_CRM:
+            fields = config.get("fields") or {}
+            if not isinstance(fields, dict):
+                raise FlowCompileError("update_crm fields must be an object")
+            for name in fields:
+                # Names become custom_fields.<name> keys of a $set
+                if not name or not is_valid_field_name(str(name)):
+                    raise FlowCompileError(f"Invalid contact field name {name!r}")
+        elif self.type == ActionType.WEBHOOK and config.get("url"):
+            try:
+                check_webhook_url(str(config["url"]))
+            except UnsafeWebhookURL as e:
+                raise FlowCompileError(str(e))
+
+class FlowRun:
+    """Outcome of evaluating one inbound message: actions to run and the next state"""
+    __slots__ = ("flow_id", "actions", "state")
+
+    def __init__(self, flow_id: Optional[str], actions: List[CompiledAction], state: Optional[FlowState]):
+        self.flow_id = flow_id
+        self.actions = actions
+        self.state = state
+
+class CompiledFlow:
+    """
+    A ChatFlow turned into an in-memory state machine: triggers, condition
+    predicates and adjacency lists. Compiled once per
+    (flow id, updated_at).
+    """
+
+    def __init__(self, flow: ChatFlow):
+        self.id = str(flow.id)
+        self.version = flow.updated_at
+        self.name = flow.name
+        self.needs_contact = False
+        self.triggers: List[CompiledTrigger] = []
+        self.conditions: Dict[str, Predicate] = {}
+        self.actions: Dict[str, CompiledAction] = {}
+        self.node_types: Dict[str, NodeType] = {}
+        self.edges: Dict[str, List[Tuple[Optional[bool], str]]] = {}
+
+        for node in flow.nodes:
+            self.node_types[node.id] = node.type
+            config = node.config or {}
+            if node.type == NodeType.TRIGGER:
+                self.triggers.append(CompiledTrigger(node.id, config))
+            elif node.type == NodeType.CONDITION:
+                predicate, needs_contact = compile_condition(config)
+                self.conditions[node.id] = predicate
+                self.needs_contact = self.needs_contact or needs_contact
+            elif node.type == NodeType.ACTION:
+                action = self.actions[node.id] = CompiledAction(node.id, config)
+                if action.template and not action.template.is_static:
+                    self.needs_contact = True
+
+        for edge in flow.edges:
+            if edge.source not in self.node_types or edge.target not in self.node_types:
+                continue
+            label = (edge.label or "").strip().lower()
+            branch = True if label in TRUE_LABELS else False if label in FALSE_LABELS else None
+            self.edges.setdefault(edge.source, []).append((branch, edge.target))
+
+    def run(self, start: str, ctx: EvaluationContext, resumed: bool = False) -> FlowRun:
+        """
+        Walk the graph from `start`. A condition reached after a message was
+        sent in this run waits for the customer's reply: the run stops and
+        returns that node as the conversation's next state. A delayed action
+        stops the run the same way, with the time it should resume at;
+        `resumed` runs start at that action once the delay is over.
+        """
+        actions: List[CompiledAction] = []
+        sent = False
+        visited: Set[str] = set()
+        stack = [start]
+        while stack and len(visited) < MAX_STEPS:
+            node_id = stack.pop()
+            if node_id in visited:
+                continue
+            visited.add(node_id)
+
+            targets = self.edges.get(node_id, [])
+            node_type = self.node_types.get(node_id)
+            if node_type == NodeType.CONDITION:
+                if sent:
+                    return FlowRun(self.id, actions, FlowState(flow_id=self.id, node_id=node_id))
+                result = self.conditions[node_id](ctx)
+                targets = [(branch, target) for branch, target in targets if branch is None or branch == result]
+            elif node_type == NodeType.ACTION:
+                action = self.actions[node_id]
+                if action.delay_seconds and not (resumed and node_id == start):
+                    resume_at = datetime.utcnow() + timedelta(seconds=action.delay_seconds)
+                    return FlowRun(self.id, actions, FlowState(flow_id=self.id, node_id=node_id, resume_at=resume_at))
+                actions.append(action)
+                if action.type == ActionType.SEND_MESSAGE:
+                    sent = True
+                elif action.type == ActionType.HANDOFF:
+                    break  # A human takes over the conversation
+
+            stack.extend(target for _, target in reversed(targets))
+        return FlowRun(self.id, actions, None)
+
+class TriggerIndex:
+    """
+    Every keyword (and intent example) of a tenant's active flows in one
+    automaton, so an inbound message is matched against all of them in a
+    single pass. Earlier flows, then earlier triggers within a flow, win.
+    Time triggers are listed separately; each inbound message re-arms them.
+    """
+
+    def __init__(self, flows: List[CompiledFlow]):
+        self.flows = flows
+        self.automaton = KeywordAutomaton()
+        self.time_triggers: List[Tuple[CompiledFlow, CompiledTrigger]] = []
+        for rank, flow in enumerate(flows):
+            for order, trigger in enumerate(flow.triggers):
+                if trigger.type == TriggerType.TIME:
+                    self.time_triggers.append((flow, trigger))
+                for keyword in trigger.keywords:
+                    self.automaton.add(keyword, (rank, order, trigger))
+        self.automaton.build()
+
+    def match(self, ctx: EvaluationContext) -> Optional[Tuple[CompiledFlow, CompiledTrigger]]:
+        text = ctx.normalized
+        best = None
+        for start, end, (rank, order, trigger) in self.automaton.iter_matches(text):
+            if trigger.exact and (start != 0 or end != len(text)):
+                continue
+            if best is None or (rank, order) < best[:2]:
+                best = (rank, order, trigger)
+        return (self.flows[best[0]], best[2]) if best else None
+
+class TenantFlows:
+    __slots__ = ("flows", "ordered", "index", "checked_at")
+
+    def __init__(self):
+        self.flows: Dict[str, CompiledFlow] = {}
+        self.ordered: List[CompiledFlow] = []
+        self.index = TriggerIndex([])
+        self.checked_at = 0.0
+
+class FlowTarget:
+    """The conversation a flow run acts on"""
+    __slots__ = ("tenant_id", "whatsapp_account_id", "business_number", "customer_number", "conversation", "message_id")
+
+    def __init__(
+        self,
+        tenant_id: str,
+        whatsapp_account_id: str,
+        business_number: str,
+        customer_number: str,
+        conversation: Dict[str, Any],
+        message_id: Optional[str] = None
+    ):
+        self.tenant_id = tenant_id
+        self.whatsapp_account_id = whatsapp_account_id
+        self.business_number = business_number
+        self.customer_number = customer_number
+        self.conversation = conversation
+        self.message_id = message_id
+
+def _state_key(state: Optional[FlowState]) -> Optional[Tuple[str, str, Optional[datetime]]]:
+    return (state.flow_id, state.node_id, state.resume_at) if state else None
+
+class FlowEngine:
+    """
+    Runs active chat flows against inbound messages. Compiled flows are
+    cached per tenant and only recompiled when a flow's updated_at changes;
+    freshness is checked at most every `refresh_interval` seconds with a
+    query on (tenant_id, active) that returns IDs and timestamps only.
+    Evaluating a message is pure in-memory work; the conversation's flow
+    state arrives with the conversation lookup the ingest path already does.
+    """
+
+    def __init__(self, refresh_interval: float = app_settings.flow_refresh_interval):
+        self.refresh_interval = refresh_interval
+        self._tenants: Dict[str, TenantFlows] = {}
+        self._background: Set[asyncio.Task] = set()
+        self.evaluations = 0
+        self.matched = 0
+        self.evaluation_seconds = 0.0
+        self.max_evaluation_seconds = 0.0
+
+    def invalidate(self, tenant_id: str):
+        """Force a freshness check on the next message, after a flow was saved"""
+        tenant = self._tenants.get(str(tenant_id))
+        if tenant:
+            tenant.checked_at = 0.0
+
+    async def flows(self, tenant_id: str) -> TenantFlows:
+        tenant = self._tenants.get(tenant_id)
+        if tenant is None:
+            tenant = self._tenants[tenant_id] = TenantFlows()
+        if time.monotonic() - tenant.checked_at > self.refresh_interval:
+            await self._refresh(tenant_id, tenant)
+        return tenant
+
+    async def _refresh(self, tenant_id: str, tenant: TenantFlows):
+        collection = ChatFlow.get_motor_collection()
+        versions = {
+            str(flow["_id"]): flow.get("updated_at")
+            for flow in await collection.find(
+                {"tenant_id": tenant_id, "active": True}, {"updated_at": 1}
+            ).sort([("created_at", 1)]).to_list(None)
+        }
+
+        stale = [flow_id for flow_id, version in versions.items()
+                 if flow_id not in tenant.flows or tenant.flows[flow_id].version != version]
+        compiled = {flow_id: flow for flow_id, flow in tenant.flows.items() if flow_id in versions and flow_id not in stale}
+        if stale:
+            async for document in collection.find({"_id": {"$in": [ObjectId(flow_id) for flow_id in stale]}}):
+                flow = ChatFlow.model_validate(document)
+                try:
+                    compiled[str(flow.id)] = CompiledFlow(flow)
+                except FlowCompileError as e:
+                    logger.error(f"Skipping flow {flow.id} of tenant {tenant_id}: {str(e)}")
+
+        ordered = [compiled[flow_id] for flow_id in versions if flow_id in compiled]
+        if stale or [flow.id for flow in ordered] != [flow.id for flow in tenant.ordered]:
+            tenant.index = TriggerIndex(ordered)
+        tenant.flows = compiled
+        tenant.ordered = ordered
+        tenant.checked_at = time.monotonic()
+
+    def evaluate(
+        self,
+        tenant: TenantFlows,
+        ctx: EvaluationContext,
+        state: Optional[FlowState]
+    ) -> Optional[FlowRun]:
+        """
+        Continue the conversation's waiting flow, or start the first flow whose
+        trigger matches. A reply to a conversation waiting on a delayed action
+        cancels the delay and is matched against triggers. Returns None when
+        nothing applies and there is no state to clear.
+        """
+        if state and not state.resume_at:
+            flow = tenant.flows.get(state.flow_id)
+            if flow and state.node_id in flow.node_types:
+                return flow.run(state.node_id, ctx)
+        matched = tenant.index.match(ctx)
+        if matched:
+            flow, trigger = matched
+            return flow.run(trigger.node_id, ctx)
+        return FlowRun(None, [], None) if state else None
+
+    async def handle_inbound(self, messages: List[Message], conversations: Dict[Tuple[str, str, str], Dict[str, Any]]):
+        """Evaluate newly stored inbound messages and run the resulting actions"""
+        timers = []
+        for message in sorted(messages, key=lambda m: m.created_at):
+            conversation = conversations.get(message_conversation_key(message, MessageDirection.INBOUND))
+            if not conversation or conversation.get("assigned_agent_id"):
+                continue  # Flows only handle conversations no agent has taken
+            try:
+                timers.extend(await self._handle(message, conversation))
+            except Exception as e:
+                logger.error(f"Error running flows for message {message.id}: {str(e)}")
+
+        if timers:
+            # Re-arming moves each conversation's existing timer, so only the last message counts
+            await scheduler.schedule_many(timers)
+
+    async def _handle(self, message: Message, conversation: Dict[str, Any]) -> List[Tuple[str, ScheduledJobKind, str, datetime, Dict[str, Any]]]:
+        tenant = await self.flows(message.tenant_id)
+        state = FlowState(**conversation["flow_state"]) if conversation.get("flow_state") else None
+        if not tenant.ordered and not state:
+            return []
+
+        target = FlowTarget(
+            message.tenant_id,
+            message.whatsapp_account_id,
+            message.to_number,  # The business number the customer wrote to
+            message.from_number,
+            conversation,
+            str(message.id)
+        )
+        message_type = message_type_value(message)
+        ctx = EvaluationContext(inbound_text(message_type, message.content), message_type)
+        await self._load_contact(tenant, target, ctx)
+
+        started = time.perf_counter()
+        run = self.evaluate(tenant, ctx, state)
+        elapsed = time.perf_counter() - started
+        self.evaluations += 1
+        self.evaluation_seconds += elapsed
+        self.max_evaluation_seconds = max(self.max_evaluation_seconds, elapsed)
+        if run is not None:
+            if run.flow_id:
+                self.matched += 1
+            await self._apply(run, state, target, ctx)
+
+        conversation_id = str(conversation["_id"])
+        armed_at = datetime.utcnow()
+        return [
+            (
+                message.tenant_id,
+                ScheduledJobKind.FLOW_TIME_TRIGGER,
+                f"flow_time:{flow.id}:{trigger.node_id}:{conversation_id}",
+                armed_at + timedelta(seconds=trigger.delay_seconds),
+                {"conversation_id": conversation_id, "flow_id": flow.id, "node_id": trigger.node_id}
+            )
+            for flow, trigger in tenant.index.time_triggers
+        ]
+
+    async def _load_contact(self, tenant: TenantFlows, target: FlowTarget, ctx: EvaluationContext):
+        if not any(flow.needs_contact for flow in tenant.ordered):
+            return
+        ctx.contact = await Contact.get_motor_collection().find_one(
+            {
+                "tenant_id": target.tenant_id,
+                "whatsapp_account_id": target.whatsapp_account_id,
+                "phone_number": {"$in": [target.customer_number, f"+{conversation_number(target.customer_number)}"]}
+            },
+            {"name": 1, "profile_name": 1, "phone_number": 1, "custom_fields": 1, "variant_field_values": 1}
+        )
+
+    async def _apply(self, run: FlowRun, state: Optional[FlowState], target: FlowTarget, ctx: EvaluationContext):
+        """Persist the conversation's next state, arm or cancel its resume timer and run the actions"""
+        conversation = target.conversation
+        if _state_key(run.state) != _state_key(state):
+            conversation["flow_state"] = run.state.model_dump() if run.state else None
+            await Conversation.get_motor_collection().update_one(
+                {"_id": conversation["_id"]},
+                {"$set": {"flow_state": conversation["flow_state"]}}
+            )
+            resume_key = f"flow_resume:{conversation['_id']}"
+            if run.state and run.state.resume_at:
+                await scheduler.schedule(
+                    target.tenant_id,
+                    ScheduledJobKind.FLOW_RESUME,
+                    resume_key,
+                    run.state.resume_at,
+                    {"conversation_id": str(conversation["_id"])}
+                )
+            elif state and state.resume_at:
+                await scheduler.cancel(target.tenant_id, resume_key)
+
+        for action in run.actions:
+            await self._execute(action, target, ctx)
+
+    async def _conversation_target(self, job: ScheduledJob) -> Optional[FlowTarget]:
+        """The conversation a timer belongs to, unless an agent took it over meanwhile"""
+        conversation = await Conversation.get_motor_collection().find_one(
+            {"_id": ObjectId(job.payload["conversation_id"]), "tenant_id": job.tenant_id},
+            {"whatsapp_account_id": 1, "contact_number": 1, "assigned_agent_id": 1, "flow_state": 1}
+        )
+        if not conversation or conversation.get("assigned_agent_id"):
+            return None
+        routed = await tenant_routing.resolve(conversation["whatsapp_account_id"])
+        if not routed:
+            return None
+        return FlowTarget(
+            job.tenant_id,
+            conversation["whatsapp_account_id"],
+            routed.account.display_phone_number,
+            conversation["contact_number"],
+            conversation
+        )
+
+    async def resume(self, job: ScheduledJob):
+        """Scheduler handler: continue a flow once a delayed action is due"""
+        target = await self._conversation_target(job)
+        state = FlowState(**target.conversation["flow_state"]) if target and target.conversation.get("flow_state") else None
+        if not state or not state.resume_at:
+            return  # Replied to, handed off or moved on since the timer was set
+
+        tenant = await self.flows(job.tenant_id)
+        flow = tenant.flows.get(state.flow_id)
+        ctx = EvaluationContext("", "")
+        if flow and state.node_id in flow.node_types:
+            await self._load_contact(tenant, target, ctx)
+            run = flow.run(state.node_id, ctx, resumed=True)
+        else:
+            run = FlowRun(None, [], None)  # The flow was changed or deactivated
+        await self._apply(run, state, target, ctx)
+
+    async def fire_time_trigger(self, job: ScheduledJob):
+        """
+        Scheduler handler: start a flow from a time trigger after the customer
+        went quiet. A conversation waiting on a reply in another flow is left
+        there; the customer's next message arms the trigger again.
+        """
+        target = await self._conversation_target(job)
+        if not target:
+            return
+        tenant = await self.flows(job.tenant_id)
+        flow = tenant.flows.get(job.payload["flow_id"])
+        if not flow or not any(trigger.node_id == job.payload["node_id"] for trigger in flow.triggers):
+            return
+
+        state = FlowState(**target.conversation["flow_state"]) if target.conversation.get("flow_state") else None
+        if state and not state.resume_at and state.flow_id != flow.id:
+            waiting = tenant.flows.get(state.flow_id)
+            if waiting and state.node_id in waiting.node_types:
+                return
+        ctx = EvaluationContext("", "")
+        await self._load_contact(tenant, target, ctx)
+        self.matched += 1
+        await self._apply(flow.run(job.payload["node_id"], ctx), state, target, ctx)
+
+    async def _execute(self, action: CompiledAction, target: FlowTarget, ctx: EvaluationContext):
+        try:
+            if action.type == ActionType.SEND_MESSAGE:
+                await self._send(action, target, ctx)
+            elif action.type == ActionType.HANDOFF:
+                await self._handoff(action, target)
+            elif action.type == ActionType.UPDATE_CRM:
+                await self._update_contact(action, target)
+            elif action.type == ActionType.WEBHOOK:
+                task = asyncio.create_task(self._call_webhook(action, target, ctx))
+                self._background.add(task)
+                task.add_done_callback(self._background.discard)
+        except UsageLimitExceeded as e:
+            logger.warning(f"Flow reply to {target.customer_number} not sent: {str(e)}")
+        except Exception as e:
+            logger.error(f"Flow action {action.node_id} ({action.type.value}) failed: {str(e)}")
+
+    async def _send(self, action: CompiledAction, target: FlowTarget, ctx: EvaluationContext):
+        text = action.template.render(ctx.contact or {"phone_number": target.customer_number})
+        if not text:
+            return
+        await queue_message(
+            target.tenant_id,
+            target.whatsapp_account_id,
+            target.business_number,
+            target.customer_number,
+            MessageType.TEXT,
+            {"body": text}
+        )
+
+    async def _handoff(self, action: CompiledAction, target: FlowTarget):
+        conversation = target.conversation
+        agent_id = action.config.get("agent_id")
+        if agent_id:
+            await Conversation.get_motor_collection().update_one(
+                {"_id": conversation["_id"]},
+                {"$set": {"assigned_agent_id": agent_id, "updated_at": datetime.utcnow()}}
+            )
+            conversation["assigned_agent_id"] = agent_id
+        await realtime_hub.publish([build_event(
+            EventType.CONVERSATION_ASSIGNED,
+            target.tenant_id,
+            {"conversation_id": str(conversation["_id"]), "agent_id": agent_id, "previous_agent_id": None, "handoff": True}
+        )])
+
+    async def _update_contact(self, action: CompiledAction, target: FlowTarget):
+        fields = action.config.get("fields") or {}
+        if not fields:
+            return
+        await Contact.get_motor_collection().update_many(
+            {
+                "tenant_id": target.tenant_id,
+                "whatsapp_account_id": target.whatsapp_account_id,
+                "phone_number": {"$in": [target.customer_number, f"+{conversation_number(target.customer_number)}"]}
+            },
+            {"$set": {
+                **{f"custom_fields.{name}": str(value) for name, value in fields.items()},
+                "updated_at": datetime.utcnow()
+            }}
+        )
+
+    async def _call_webhook(self, action: CompiledAction, target: FlowTarget, ctx: EvaluationContext):
+        url = action.config.get("url")
+        if not url:
+            return
+        try:
+            await post_webhook(url, {
+                "tenant_id": target.tenant_id,
+                "whatsapp_account_id": target.whatsapp_account_id,
+                "message_id": target.message_id,
+                "from_number": target.customer_number,
+                "text": ctx.text,
+                "node_id": action.node_id
+            })
+        except Exception as e:
+            logger.error(f"Flow webhook {url} failed: {str(e)}")
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "tenants": len(self._tenants),
+            "compiled_flows": sum(len(tenant.flows) for tenant in self._tenants.values()),
+            "evaluations": self.evaluations,
+            "matched": self.matched,
+            "avg_evaluation_ms": round(self.evaluation_seconds / self.evaluations * 1000, 4) if self.evaluations else 0.0,
+            "max_evaluation_ms": round(self.max_evaluation_seconds * 1000, 4)
+        }
+
+flow_engine = FlowEngine()
+scheduler.register(ScheduledJobKind.FLOW_RESUME, flow_engine.resume)
+scheduler.register(ScheduledJobKind.FLOW_TIME_TRIGGER, flow_engine.fire_time_trigger)
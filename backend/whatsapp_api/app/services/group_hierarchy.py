@@ -0,0 +1,115 @@
+from typing import List, Optional, Dict, Any, Set
+
+from bson import ObjectId
+from pymongo import UpdateOne
+
+from app.models.contact import Contact
+from app.models.contact_group import ContactGroup
+
+class GroupHierarchyError(ValueError):
+    pass
+
+async def compute_ancestor_ids(tenant_id: str, parent_group_id: Optional[str]) -> List[str]:
+    """Materialized path (root first) for a group placed under `parent_group_id`"""
+    if not parent_group_id:
+        return []
+    if not ObjectId.is_valid(parent_group_id):
+        raise GroupHierarchyError("Parent group not found")
+
+    parent = await ContactGroup.get_motor_collection().find_one(
+        {"_id": ObjectId(parent_group_id), "tenant_id": tenant_id},
+        {"ancestor_ids": 1}
+    )
+    if not parent:
+        raise GroupHierarchyError("Parent group not found")
+    return (parent.get("ancestor_ids") or []) + [parent_group_id]
+
+async def move_group(group: ContactGroup, parent_group_id: Optional[str]):
+    """
+    Re-parent a group and rewrite the materialized path of its whole subtree
+    with one pipeline update. Moving a group under itself or one of its
+    descendants is rejected.
+    """
+    group_id = str(group.id)
+    if parent_group_id == group_id:
+        raise GroupHierarchyError("A group cannot be its own parent")
+
+    ancestor_ids = await compute_ancestor_ids(group.tenant_id, parent_group_id)
+    if group_id in ancestor_ids:
+        raise GroupHierarchyError("Cannot move a group under one of its descendants")
+
+    collection = ContactGroup.get_motor_collection()
+    await collection.update_many(
+        {"tenant_id": group.tenant_id, "ancestor_ids": group_id},
+        [{"$set": {"ancestor_ids": {"$concatArrays": [
+            ancestor_ids,
+            {"$slice": [
+                "$ancestor_ids",
+                {"$indexOfArray": ["$ancestor_ids", group_id]},
+                {"$size": "$ancestor_ids"}
+            ]}
+        ]}}}]
+    )
+
+    group.parent_group_id = parent_group_id
+    group.ancestor_ids = ancestor_ids
+
+async def subtree_group_ids(tenant_id: str, group_id: str) -> List[str]:
+    """The group and all of its descendants, fetched with a single query"""
+    groups = await ContactGroup.get_motor_collection().find(
+        {"tenant_id": tenant_id, "$or": [{"_id": ObjectId(group_id)}, {"ancestor_ids": group_id}]},
+        {"_id": 1}
+    ).to_list(None)
+    return [str(group["_id"]) for group in groups]
+
+async def subtree_variant_fields(tenant_id: str, group_id: str) -> Set[str]:
+    """Names of the variant fields defined on the group or any of its descendants"""
+    groups = await ContactGroup.get_motor_collection().find(
+        {"tenant_id": tenant_id, "$or": [{"_id": ObjectId(group_id)}, {"ancestor_ids": group_id}]},
+        {"variant_fields": 1}
+    ).to_list(None)
+    return {name for group in groups for name in (group.get("variant_fields") or {})}
+
+async def subtree_contact_count(tenant_id: str, group_id: str) -> int:
+    """Number of distinct contacts in the group and its descendants"""
+    group_ids = await subtree_group_ids(tenant_id, group_id)
+    return await Contact.get_motor_collection().count_documents(
+        {"tenant_id": tenant_id, "group_ids": {"$in": group_ids}}
+    )
+
+def build_ancestor_paths(parents: Dict[str, Optional[str]]) -> Dict[str, List[str]]:
+    """
+    Compute materialized paths from parent pointers. Groups whose parent
+    chain is broken or cyclic are attached at the last valid ancestor.
+    """
+    paths: Dict[str, List[str]] = {}
+
+    def resolve(group_id: str, visiting: set) -> List[str]:
+        if group_id in paths:
+            return paths[group_id]
+        parent_id = parents.get(group_id)
+        if not parent_id or parent_id not in parents or parent_id in visiting:
+            paths[group_id] = []
+        else:
+            visiting.add(group_id)
+            paths[group_id] = resolve(parent_id, visiting) + [parent_id]
+        return paths[group_id]
+
+    for group_id in parents:
+        resolve(group_id, {group_id})
+    return paths
+
+async def backfill_ancestor_paths(tenant_id: str) -> int:
+    """Recompute ancestor_ids of every group of a tenant from parent_group_id"""
+    collection = ContactGroup.get_motor_collection()
+    parents: Dict[str, Optional[str]] = {}
+    async for group in collection.find({"tenant_id": tenant_id}, {"parent_group_id": 1}):
+        parents[str(group["_id"])] = group.get("parent_group_id")
+
+    operations: List[Any] = [
+        UpdateOne({"_id": ObjectId(group_id)}, {"$set": {"ancestor_ids": path}})
+        for group_id, path in build_ancestor_paths(parents).items()
+    ]
+    if operations:
+        await collection.bulk_write(operations, ordered=False)
+    return len(operations)
@@ -0,0 +1,108 @@
+import unicodedata
+from collections import deque
+from typing import Any, Dict, Iterator, List, Tuple
+
+# Letter variants folded together so keywords match however customers type them
+ARABIC_FOLDING = str.maketrans({
+    "ٱ": "ا",  # Alef wasla -> alef
+    "ى": "ي",  # Alef maksura -> yeh
+    "ة": "ه",  # Teh marbuta -> heh
+    "ـ": None,  # Tatweel
+    **{chr(0x0660 + digit): str(digit) for digit in range(10)},  # Arabic-Indic digits
+    **{chr(0x06F0 + digit): str(digit) for digit in range(10)},  # Extended Arabic-Indic digits
+})
+
+def normalize_text(text: str) -> str:
+    """
+    Case-fold, strip accents and Arabic diacritics (harakat, hamza carriers
+    decompose to their base letter), fold Arabic letter variants and collapse
+    whitespace. "Épicerie", "epicerie" and "ÉPICERIE" normalise the same way,
+    as do "أهلا" and "اهلا".
+    """
+    decomposed = unicodedata.normalize("NFKD", text.casefold())
+    stripped = "".join(char for char in decomposed if not unicodedata.combining(char))
+    return " ".join(stripped.translate(ARABIC_FOLDING).split())
+
+def _is_word_char(char: str) -> bool:
+    return char.isalnum() or char == "_"
+
+class KeywordAutomaton:
+    """
+    Aho-Corasick automaton over normalised keywords. Matching walks the text
+    once whatever the number of keywords, and only reports whole-word hits:
+    "hi" matches "hi there" but not "this".
+    """
+
+    def __init__(self):
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._keywords: List[List[Tuple[int, Any]]] = [[]]  # Keywords ending at each state
+        self._outputs: List[List[Tuple[int, Any]]] = [[]]  # Plus those reachable by failure links
+        self._built = True
+        self.size = 0
+
+    def add(self, keyword: str, payload: Any) -> bool:
+        """Register `keyword`; returns False when it normalises to nothing"""
+        keyword = normalize_text(keyword)
+        if not keyword:
+            return False
+
+        state = 0
+        for char in keyword:
+            target = self._goto[state].get(char)
+            if target is None:
+                target = len(self._goto)
+                self._goto.append({})
+                self._fail.append(0)
+                self._keywords.append([])
+                self._goto[state][char] = target
+            state = target
+        self._keywords[state].append((len(keyword), payload))
+        self.size += 1
+        self._built = False
+        return True
+
+    def build(self):
+        """Compute failure links and outputs breadth-first"""
+        self._outputs = [list(keywords) for keywords in self._keywords]
+        queue = deque(self._goto[0].values())
+        for state in queue:
+            self._fail[state] = 0
+        while queue:
+            state = queue.popleft()
+            for char, target in self._goto[state].items():
+                queue.append(target)
+                fallback = self._fail[state]
+                while fallback and char not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                self._fail[target] = self._goto[fallback].get(char, 0)
+                self._outputs[target] = self._outputs[target] + self._outputs[self._fail[target]]
+        self._built = True
+
+    def iter_matches(self, text: str) -> Iterator[Tuple[int, int, Any]]:
+        """
+        Yield (start, end, payload) for every whole-word keyword occurrence in
+        `text`, which must already be normalised with `normalize_text`
+        """
+        if not self._built:
+            self.build()
+
+        goto, fail, outputs = self._goto, self._fail, self._outputs
+        length = len(text)
+        state = 0
+        for index, char in enumerate(text):
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            if not outputs[state]:
+                continue
+            end = index + 1
+            if end < length and _is_word_char(text[end]):
+                continue
+            for size, payload in outputs[state]:
+                start = end - size
+                if start == 0 or not _is_word_char(text[start - 1]):
+                    yield start, end, payload
+
+    def search(self, text: str) -> List[Tuple[int, int, Any]]:
+        return list(self.iter_matches(normalize_text(text)))
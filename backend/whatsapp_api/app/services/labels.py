@@ -0,0 +1,89 @@
+import logging
+from typing import Any, Dict, List
+
+from pymongo import UpdateOne
+
+from app.models.conversation import Conversation
+from app.models.label import ConversationLabel
+from app.models.label_count import LabelCount
+from app.models.message import Message
+from app.services.realtime import realtime_hub, build_event, EventType
+
+logger = logging.getLogger(__name__)
+
+async def _bump(tenant_id: str, label_id: str, delta: int):
+    await LabelCount.get_motor_collection().update_one(
+        {"tenant_id": tenant_id, "label_id": label_id},
+        {"$inc": {"conversations": delta}},
+        upsert=True
+    )
+
+async def _label_changed(tenant_id: str, conversation: Dict[str, Any], label_id: str, added: bool):
+    await _bump(tenant_id, label_id, 1 if added else -1)
+    await realtime_hub.publish([build_event(
+        EventType.CONVERSATION_LABELS,
+        tenant_id,
+        {"conversation_id": str(conversation["_id"]), "label_id": label_id, "added": added},
+        conversation.get("assigned_agent_id")
+    )])
+
+async def add_conversation_label(tenant_id: str, selector: Dict[str, Any], label: ConversationLabel) -> bool:
+    """
+    Attach a label to the conversation matching `selector`. The counter is
+    only bumped when the label was actually added, so retries are harmless.
+    """
+    conversation = await Conversation.get_motor_collection().find_one_and_update(
+        {**selector, "tenant_id": tenant_id, "labels.label_id": {"$ne": label.label_id}},
+        {"$push": {"labels": label.model_dump()}},
+        projection={"assigned_agent_id": 1}
+    )
+    if conversation:
+        await _label_changed(tenant_id, conversation, label.label_id, True)
+    return conversation is not None
+
+async def remove_conversation_label(tenant_id: str, selector: Dict[str, Any], label_id: str) -> bool:
+    conversation = await Conversation.get_motor_collection().find_one_and_update(
+        {**selector, "tenant_id": tenant_id, "labels.label_id": label_id},
+        {"$pull": {"labels": {"label_id": label_id}}},
+        projection={"assigned_agent_id": 1}
+    )
+    if conversation:
+        await _label_changed(tenant_id, conversation, label_id, False)
+    return conversation is not None
+
+async def label_counts(tenant_id: str) -> Dict[str, int]:
+    """Conversations per label, read from the counter collection"""
+    counts = await LabelCount.get_motor_collection().find(
+        {"tenant_id": tenant_id}, {"label_id": 1, "conversations": 1}
+    ).to_list(None)
+    return {count["label_id"]: max(count.get("conversations", 0), 0) for count in counts}
+
+async def delete_label_references(tenant_id: str, label_id: str):
+    """Pull a deleted label from every conversation and message and drop its counter"""
+    selector = {"tenant_id": tenant_id, "labels.label_id": label_id}
+    update = {"$pull": {"labels": {"label_id": label_id}}}
+    await Conversation.get_motor_collection().update_many(selector, update)
+    await Message.get_motor_collection().update_many(selector, update)
+    await LabelCount.get_motor_collection().delete_one({"tenant_id": tenant_id, "label_id": label_id})
+
+async def recount_labels(tenant_id: str) -> int:
+    """Rebuild the label counters of a tenant from the conversations"""
+    pipeline = [
+        {"$match": {"tenant_id": tenant_id, "labels.0": {"$exists": True}}},
+        {"$unwind": "$labels"},
+        {"$group": {"_id": "$labels.label_id", "conversations": {"$sum": 1}}}
+    ]
+    operations: List[Any] = []
+    seen = set()
+    async for row in Conversation.get_motor_collection().aggregate(pipeline):
+        seen.add(row["_id"])
+        operations.append(UpdateOne(
+            {"tenant_id": tenant_id, "label_id": row["_id"]},
+            {"$set": {"conversations": row["conversations"]}},
+            upsert=True
+        ))
+    collection = LabelCount.get_motor_collection()
+    if operations:
+        await collection.bulk_write(operations, ordered=False)
+    await collection.delete_many({"tenant_id": tenant_id, "label_id": {"$nin": list(seen)}})
+    return len(operations)
@@ -0,0 +1,199 @@
+import logging
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from pymongo import UpdateOne
+
+from app.core.cache import TTLCache
+from app.core.config import app_settings
+from app.models.message import Message, MessageStatus
+
+logger = logging.getLogger(__name__)
+
+# Statuses only ever move up this ladder. A message can fail after being
+# sent, but not after it was delivered or read.
+STATUS_RANK = {
+    MessageStatus.SENT: 0,
+    MessageStatus.FAILED: 1,
+    MessageStatus.DELIVERED: 2,
+    MessageStatus.READ: 3,
+}
+
+def lower_statuses(status: MessageStatus) -> List[str]:
+    """Statuses a message may be in for `status` to be an advance"""
+    rank = STATUS_RANK[status]
+    return [candidate.value for candidate, candidate_rank in STATUS_RANK.items() if candidate_rank < rank]
+
+def higher_statuses(status: MessageStatus) -> List[str]:
+    """Statuses a message must not be in for `status` to be written over them"""
+    rank = STATUS_RANK[status]
+    return [candidate.value for candidate, candidate_rank in STATUS_RANK.items() if candidate_rank > rank]
+
+class StatusUpdate:
+    __slots__ = ("whatsapp_message_id", "status", "timestamp", "recipient_id", "tenant_id", "whatsapp_account_id")
+
+    def __init__(
+        self,
+        whatsapp_message_id: str,
+        status: MessageStatus,
+        timestamp: datetime,
+        recipient_id: Optional[str],
+        tenant_id: str,
+        whatsapp_account_id: str
+    ):
+        self.whatsapp_message_id = whatsapp_message_id
+        self.status = status
+        self.timestamp = timestamp
+        self.recipient_id = recipient_id
+        self.tenant_id = tenant_id
+        self.whatsapp_account_id = whatsapp_account_id
+
+def parse_status(
+    status: Dict[str, Any],
+    tenant_id: str,
+    whatsapp_account_id: str,
+    now: datetime
+) -> Optional[StatusUpdate]:
+    """Build a StatusUpdate from one entry of `value.statuses`, or None if it is unusable"""
+    whatsapp_message_id = status.get("id")
+    try:
+        message_status = MessageStatus(status.get("status"))
+    except ValueError:
+        return None
+    if not whatsapp_message_id:
+        return None
+    timestamp = status.get("timestamp")
+    return StatusUpdate(
+        whatsapp_message_id,
+        message_status,
+        datetime.utcfromtimestamp(int(timestamp)) if timestamp else now,
+        status.get("recipient_id"),
+        tenant_id,
+        whatsapp_account_id
+    )
+
+class MessageStatusApplier:
+    """
+    Applies delivery receipts in batches. Receipts for the same message are
+    coalesced to the highest status first; SENT receipts, which can never
+    advance a status, and receipts that cannot advance a status already
+    applied by this worker are dropped in memory, and the rest go out as one
+    unordered bulk_write whose filters refuse to move a status backwards.
+    Messages are matched within the receipt's tenant only.
+    """
+
+    def __init__(
+        self,
+        maxsize: int = app_settings.dedup_cache_size,
+        ttl: float = app_settings.dedup_cache_ttl
+    ):
+        self._applied = TTLCache(maxsize=maxsize, ttl=ttl)  # (tenant_id, whatsapp_message_id) -> rank
+        self.received = 0
+        self.coalesced = 0
+        self.dropped_in_memory = 0
+        self.written = 0
+        self.modified = 0
+
+    def coalesce(self, updates: Iterable[StatusUpdate]) -> List[StatusUpdate]:
+        best: Dict[Tuple[str, str], StatusUpdate] = {}
+        for update in updates:
+            self.received += 1
+            key = (update.tenant_id, update.whatsapp_message_id)
+            current = best.get(key)
+            if current is None:
+                best[key] = update
+                continue
+            self.coalesced += 1
+            if STATUS_RANK[update.status] > STATUS_RANK[current.status]:
+                best[key] = update
+
+        fresh = []
+        for key, update in best.items():
+            rank = STATUS_RANK[update.status]
+            applied_rank = self._applied.get(key)
+            if rank == 0 or (applied_rank is not None and applied_rank >= rank):
+                self.dropped_in_memory += 1
+                continue
+            fresh.append(update)
+        return fresh
+
+    async def apply(self, updates: Iterable[StatusUpdate]) -> List[StatusUpdate]:
+        """Coalesce and write a batch of receipts; returns the updates now stored"""
+        updates = self.coalesce(updates)
+        if not updates:
+            return []
+
+        now = datetime.utcnow()
+        operations = [
+            UpdateOne(
+                {
+                    "tenant_id": update.tenant_id,
+                    "whatsapp_message_id": update.whatsapp_message_id,
+                    "status": {"$in": lower_statuses(update.status)}
+                },
+                {"$set": {"status": update.status.value, "updated_at": now}}
+            )
+            for update in updates
+        ]
+        try:
+            result = await Message.get_motor_collection().bulk_write(operations, ordered=False)
+        except Exception as e:
+            logger.error(f"Error applying {len(operations)} message status updates: {str(e)}")
+            return []
+
+        self.written += len(operations)
+        self.modified += result.modified_count
+        if result.modified_count == len(operations):
+            for update in updates:
+                self._applied.set((update.tenant_id, update.whatsapp_message_id), STATUS_RANK[update.status])
+            return updates
+
+        # bulk_write does not say which filters matched: re-read the messages
+        # so only stored statuses are cached, and receipts for messages whose
+        # whatsapp_message_id is not recorded yet are not dropped next time
+        try:
+            stored = await self._stored_ranks(updates)
+        except Exception as e:
+            logger.error(f"Error reading back {len(operations)} message statuses: {str(e)}")
+            return []
+
+        applied = []
+        for update in updates:
+            key = (update.tenant_id, update.whatsapp_message_id)
+            rank = stored.get(key)
+            if rank is None:
+                continue
+            self._applied.set(key, rank)
+            if rank == STATUS_RANK[update.status]:
+                applied.append(update)
+        return applied
+
+    @staticmethod
+    async def _stored_ranks(updates: List[StatusUpdate]) -> Dict[Tuple[str, str], int]:
+        """Stored status ranks keyed by (tenant_id, whatsapp_message_id)"""
+        ranks = {}
+        cursor = Message.get_motor_collection().find(
+            {
+                "tenant_id": {"$in": list({update.tenant_id for update in updates})},
+                "whatsapp_message_id": {"$in": [update.whatsapp_message_id for update in updates]}
+            },
+            {"tenant_id": 1, "whatsapp_message_id": 1, "status": 1}
+        )
+        async for document in cursor:
+            try:
+                key = (document["tenant_id"], document["whatsapp_message_id"])
+                ranks[key] = STATUS_RANK[MessageStatus(document.get("status"))]
+            except ValueError:
+                continue
+        return ranks
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "received": self.received,
+            "coalesced": self.coalesced,
+            "dropped_in_memory": self.dropped_in_memory,
+            "written": self.written,
+            "modified": self.modified
+        }
+
+message_status_applier = MessageStatusApplier()
@@ -0,0 +1,64 @@
+import logging
+from typing import Any, Dict, Tuple
+
+from app.models.conversation import MessageDirection
+from app.models.message import Message, MessageStatus, MessageType
+from app.models.outbox import OutboxPriority
+from app.services.billing import get_cost_settings, message_cost, record_costs
+from app.services.conversations import record_messages
+from app.services.outbox import enqueue_messages
+from app.services.usage import usage_meter, is_media
+
+logger = logging.getLogger(__name__)
+
+async def queue_message(
+    tenant_id: str,
+    whatsapp_account_id: str,
+    from_number: str,
+    to_number: str,
+    message_type: MessageType,
+    content: Dict[str, Any]
+) -> Tuple[Message, Dict[str, Any]]:
+    """
+    Store a single outbound message and hand it to the outbox's transactional
+    lane. The message is counted against the tenant's daily usage (raising
+    UsageLimitExceeded when over the hard limit), stamped with its cost and
+    folded into the billing rollups and its conversation. Returns the message
+    and the usage reservation, which is released again if the message cannot
+    be stored or queued.
+    """
+    reservation = await usage_meter.reserve(tenant_id, 1, 1 if is_media(message_type) else 0)
+
+    message = None
+    try:
+        message = Message(
+            tenant_id=tenant_id,
+            whatsapp_account_id=whatsapp_account_id,
+            from_number=from_number,
+            to_number=to_number,
+            message_type=message_type,
+            content=content,
+            cost=message_cost(await get_cost_settings(tenant_id), outbound=True)
+        )
+        await message.create()
+        await enqueue_messages([message.id], tenant_id, priority=OutboxPriority.TRANSACTIONAL)
+    except Exception:
+        await usage_meter.release(tenant_id, reservation)
+        if message is not None and message.id is not None:
+            await _abandon(message)
+        raise
+
+    # Only once queued, so a message that is never sent is neither billed nor shown as sent
+    await record_costs([message], outbound=True)
+    await record_messages([message], MessageDirection.OUTBOUND)
+    return message, reservation
+
+async def _abandon(message: Message):
+    """Mark a stored message that never reached the outbox as failed"""
+    try:
+        await Message.get_motor_collection().update_one(
+            {"_id": message.id},
+            {"$set": {"status": MessageStatus.FAILED.value}}
+        )
+    except Exception as e:
+        logger.error(f"Error marking unqueued message {message.id} as failed: {str(e)}")
@@ -0,0 +1,82 @@
+import asyncio
+import ipaddress
+import logging
+import socket
+from typing import Any, Dict, Optional
+from urllib.parse import urlsplit
+
+import httpx
+
+from app.core.config import app_settings
+
+logger = logging.getLogger(__name__)
+
+ALLOWED_SCHEMES = ("http", "https")
+
+class UnsafeWebhookURL(ValueError):
+    pass
+
+_client: Optional[httpx.AsyncClient] = None
+
+def check_webhook_url(url: str) -> str:
+    """Validate the shape of a tenant-supplied webhook URL; returns its hostname"""
+    parts = urlsplit(url)
+    if parts.scheme not in ALLOWED_SCHEMES:
+        raise UnsafeWebhookURL(f"Webhook URL must use http or https: {url}")
+    if not parts.hostname:
+        raise UnsafeWebhookURL(f"Webhook URL has no host: {url}")
+    return parts.hostname
+
+async def resolve_public_address(host: str, port: int) -> str:
+    """
+    Resolve `host` and return one of its addresses, refusing hosts that
+    resolve to anything but public unicast addresses (private, loopback,
+    link-local, multicast, reserved...), so tenants cannot reach internal
+    services through their flows.
+    """
+    try:
+        infos = await asyncio.get_running_loop().getaddrinfo(host, port, type=socket.SOCK_STREAM)
+    except socket.gaierror as e:
+        raise UnsafeWebhookURL(f"Cannot resolve webhook host {host}: {str(e)}")
+
+    addresses = [ipaddress.ip_address(info[4][0].split("%")[0]) for info in infos]
+    if not addresses:
+        raise UnsafeWebhookURL(f"Cannot resolve webhook host {host}")
+    for address in addresses:
+        if not address.is_global or address.is_multicast:
+            raise UnsafeWebhookURL(f"Webhook host {host} resolves to non-public address {address}")
+    return str(addresses[0])
+
+def get_webhook_client() -> httpx.AsyncClient:
+    """Client for tenant webhooks, kept apart from the Graph API pool and never following redirects"""
+    global _client
+    if _client is None or _client.is_closed:
+        _client = httpx.AsyncClient(
+            timeout=app_settings.flow_webhook_timeout,
+            follow_redirects=False,
+            limits=httpx.Limits(max_connections=app_settings.flow_webhook_max_connections)
+        )
+    return _client
+
+async def close_webhook_client():
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+
+async def post_webhook(url: str, payload: Dict[str, Any]) -> httpx.Response:
+    """
+    POST `payload` to a tenant webhook. The request goes to the address that
+    was checked, with the original Host header and TLS server name, so the
+    host cannot be re-resolved to an internal address between check and
+    connect.
+    """
+    host = check_webhook_url(url)
+    parts = urlsplit(url)
+    port = parts.port or (443 if parts.scheme == "https" else 80)
+    address = await resolve_public_address(host, port)
+
+    pinned = httpx.URL(url).copy_with(host=address)
+    headers = {"Host": parts.netloc.rsplit("@", 1)[-1]}
+    extensions = {"sni_hostname": host} if parts.scheme == "https" else {}
+    return await get_webhook_client().post(pinned, json=payload, headers=headers, extensions=extensions)
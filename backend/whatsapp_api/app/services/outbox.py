@@ -0,0 +1,188 @@
+import asyncio
+import logging
+import socket
+import time
+import uuid
+from datetime import datetime, timedelta
+from typing import List, Optional, Iterable
+
+from pymongo import ReturnDocument
+
+from app.core.config import app_settings
+from app.models.outbox import OutboxItem, OutboxPriority, DeadLetter
+from app.services.whatsapp import deliver_message, mark_failed, WhatsAppSendError
+
+logger = logging.getLogger(__name__)
+
+async def enqueue_messages(
+    message_ids: Iterable[str],
+    tenant_id: str,
+    priority: OutboxPriority = OutboxPriority.TRANSACTIONAL,
+    broadcast_id: Optional[str] = None
+) -> int:
+    """
+    Persist outbound messages to the outbox so they survive worker restarts
+    """
+    items = [
+        OutboxItem(
+            message_id=str(message_id),
+            tenant_id=tenant_id,
+            priority=priority,
+            broadcast_id=broadcast_id
+        )
+        for message_id in message_ids
+    ]
+    if not items:
+        return 0
+    await OutboxItem.insert_many(items)
+    return len(items)
+
+class OutboxWorker:
+    """
+    Drains the outbox with a fixed number of concurrent senders.
+
+    An item is leased by pushing its `available_at` forward by the visibility
+    timeout; if the worker dies the item simply becomes visible again. Items
+    are acked by deleting them, retried with backoff on transient failures and
+    moved to the dead-letter collection after `max_attempts`.
+
+    A send, with its in-process retries, must end well before the lease does,
+    or another worker would lease the item and send the message twice. It is
+    given a deadline one HTTP timeout short of the visibility timeout, which
+    leaves that much time to record the status and ack.
+    """
+
+    def __init__(
+        self,
+        concurrency: int = app_settings.outbox_concurrency,
+        priorities: Optional[List[OutboxPriority]] = None,
+        visibility_timeout: float = app_settings.outbox_visibility_timeout,
+        max_attempts: int = app_settings.outbox_max_attempts,
+        poll_interval: float = app_settings.outbox_poll_interval
+    ):
+        self.concurrency = concurrency
+        self.priorities = priorities
+        self.visibility_timeout = visibility_timeout
+        self.max_attempts = max_attempts
+        self.poll_interval = poll_interval
+        self.worker_id = f"{socket.gethostname()}-{uuid.uuid4().hex[:8]}"
+        self._tasks: List[asyncio.Task] = []
+
+    def start(self):
+        if self._tasks:
+            return
+        self._tasks = [asyncio.create_task(self._run()) for _ in range(self.concurrency)]
+        logger.info(f"Outbox worker {self.worker_id} started with concurrency {self.concurrency}")
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def run_forever(self):
+        self.start()
+        await asyncio.gather(*self._tasks)
+
+    async def lease(self) -> Optional[OutboxItem]:
+        now = datetime.utcnow()
+        query = {"available_at": {"$lte": now}}
+        if self.priorities:
+            query["priority"] = {"$in": [int(priority) for priority in self.priorities]}
+
+        document = await OutboxItem.get_motor_collection().find_one_and_update(
+            query,
+            {
+                "$set": {
+                    "available_at": now + timedelta(seconds=self.visibility_timeout),
+                    "lease_owner": self.worker_id
+                },
+                "$inc": {"attempts": 1}
+            },
+            sort=[("priority", 1), ("available_at", 1)],
+            return_document=ReturnDocument.AFTER
+        )
+        return OutboxItem.model_validate(document) if document else None
+
+    async def ack(self, item: OutboxItem):
+        await OutboxItem.get_motor_collection().delete_one(
+            {"_id": item.id, "lease_owner": self.worker_id}
+        )
+
+    async def retry(self, item: OutboxItem, error: str, retry_after: Optional[float] = None):
+        delay = max(app_settings.outbox_retry_backoff * (2 ** (item.attempts - 1)), retry_after or 0)
+        await OutboxItem.get_motor_collection().update_one(
+            {"_id": item.id, "lease_owner": self.worker_id},
+            {"$set": {
+                "available_at": datetime.utcnow() + timedelta(seconds=delay),
+                "lease_owner": None,
+                "last_error": error
+            }}
+        )
+
+    async def dead_letter(self, item: OutboxItem, error: str):
+        await DeadLetter(
+            message_id=item.message_id,
+            tenant_id=item.tenant_id,
+            priority=item.priority,
+            broadcast_id=item.broadcast_id,
+            attempts=item.attempts,
+            last_error=error,
+            created_at=item.created_at
+        ).create()
+        await self.ack(item)
+        await mark_failed(item.message_id)
+        await self._record_broadcast_delivery(item, sent=False)
+
+    async def _record_broadcast_delivery(self, item: OutboxItem, sent: bool):
+        if not item.broadcast_id:
+            return
+        # Imported here: the broadcast service enqueues through this module
+        from app.services.broadcast import record_delivery
+        await record_delivery(item.broadcast_id, sent)
+
+    async def process(self, item: OutboxItem):
+        send_budget = max(self.visibility_timeout - app_settings.whatsapp_http_timeout, self.visibility_timeout / 2)
+        try:
+            await deliver_message(item.message_id, deadline=time.monotonic() + send_budget)
+        except Exception as e:
+            error = str(e)
+            # deliver_message only raises before the Graph API accepted the message
+            # or with a non-retryable WhatsAppSendError, so retrying cannot duplicate it
+            retryable = not isinstance(e, WhatsAppSendError) or e.retryable
+            if retryable and item.attempts < self.max_attempts:
+                logger.warning(f"Outbox item {item.id} failed (attempt {item.attempts}), retrying: {error}")
+                await self.retry(item, error, getattr(e, "retry_after", None))
+            else:
+                logger.error(f"Outbox item {item.id} dead-lettered after {item.attempts} attempts: {error}")
+                await self.dead_letter(item, error)
+            return
+
+        try:
+            await self.ack(item)
+            await self._record_broadcast_delivery(item, sent=True)
+        except Exception as e:
+            logger.error(f"Outbox item {item.id} was sent but its bookkeeping failed: {str(e)}")
+
+    async def _run(self):
+        while True:
+            try:
+                item = await self.lease()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Error leasing outbox item: {str(e)}")
+                await asyncio.sleep(self.poll_interval)
+                continue
+
+            if item is None:
+                await asyncio.sleep(self.poll_interval)
+                continue
+
+            try:
+                await self.process(item)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                # The lease expires on its own, so the item is picked up again later
+                logger.error(f"Error processing outbox item {item.id}: {str(e)}")
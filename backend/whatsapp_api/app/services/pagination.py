@@ -0,0 +1,54 @@
+import base64
+import json
+from datetime import datetime
+from typing import Any, Dict, Optional, Tuple
+from bson import ObjectId
+from bson.errors import InvalidId
+
+class InvalidCursorError(ValueError):
+    pass
+
+def encode_cursor(sort_value: datetime, document_id: ObjectId) -> str:
+    """
+    Encode the position after a document as an opaque, URL-safe cursor
+    """
+    raw = json.dumps([sort_value.isoformat(), str(document_id)]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+def decode_cursor(cursor: str) -> Tuple[datetime, ObjectId]:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        sort_value, document_id = json.loads(base64.urlsafe_b64decode(padded))
+        return datetime.fromisoformat(sort_value), ObjectId(document_id)
+    except (ValueError, TypeError, InvalidId) as e:
+        raise InvalidCursorError("Invalid cursor") from e
+
+def keyset_filter(field: str, cursor: Optional[str], descending: bool = True) -> Dict[str, Any]:
+    """
+    Build the query fragment selecting documents after `cursor` for a sort
+    on (field, _id). Returns an empty filter when there is no cursor.
+    """
+    if not cursor:
+        return {}
+
+    sort_value, document_id = decode_cursor(cursor)
+    op = "$lt" if descending else "$gt"
+    return {
+        "$or": [
+            {field: {op: sort_value}},
+            {field: sort_value, "_id": {op: document_id}}
+        ]
+    }
+
+def encode_id_cursor(document_id: ObjectId) -> str:
+    return base64.urlsafe_b64encode(bytes(document_id.binary)).decode().rstrip("=")
+
+def id_keyset_filter(cursor: Optional[str]) -> Dict[str, Any]:
+    """Query fragment selecting documents after `cursor` for an ascending _id sort"""
+    if not cursor:
+        return {}
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        return {"_id": {"$gt": ObjectId(base64.urlsafe_b64decode(padded))}}
+    except (ValueError, TypeError, InvalidId) as e:
+        raise InvalidCursorError("Invalid cursor") from e
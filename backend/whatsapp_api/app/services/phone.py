@@ -0,0 +1,31 @@
+import re
+from typing import Optional
+
+_SEPARATORS = re.compile(r"[\s\-().]")
+
+class InvalidPhoneNumberError(ValueError):
+    pass
+
+def normalize_phone_number(raw: str, default_country_code: Optional[str] = None) -> str:
+    """
+    Normalize a phone number to E.164 (+<country code><number>).
+    Numbers without an international prefix get `default_country_code`,
+    dropping a leading trunk zero. Without a default country code, a
+    trunk-prefixed national number is rejected: country codes never start
+    with 0.
+    """
+    number = _SEPARATORS.sub("", str(raw or "").strip())
+    if number.startswith("+"):
+        digits = number[1:]
+    elif number.startswith("00"):
+        digits = number[2:]
+    elif default_country_code:
+        digits = default_country_code.lstrip("+") + number.lstrip("0")
+    else:
+        digits = number
+
+    if not digits.isdigit() or not 8 <= len(digits) <= 15:
+        raise InvalidPhoneNumberError(f"Invalid phone number: {raw}")
+    if digits.startswith("0"):
+        raise InvalidPhoneNumberError(f"Invalid phone number: {raw} (missing country code)")
+    return f"+{digits}"
@@ -0,0 +1,166 @@
+import asyncio
+import logging
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Set
+
+from pymongo import CursorType
+from pymongo.errors import CollectionInvalid
+
+from app.core.config import app_settings
+from app.models.message import Message
+from app.models.user import User, Role
+
+logger = logging.getLogger(__name__)
+
+# Roles that see every conversation of their tenant, not only their own
+SUPERVISING_ROLES = {Role.ADMIN, Role.MANAGER, Role.SUPERVISOR}
+
+class EventType:
+    MESSAGE_NEW = "message.new"
+    MESSAGE_STATUS = "message.status"
+    CONVERSATION_LABELS = "conversation.labels"
+    CONVERSATION_ASSIGNED = "conversation.assigned"
+
+def build_event(
+    event_type: str,
+    tenant_id: str,
+    data: Dict[str, Any],
+    assigned_agent_id: Optional[str] = None
+) -> Dict[str, Any]:
+    return {
+        "type": event_type,
+        "tenant_id": tenant_id,
+        "assigned_agent_id": assigned_agent_id,
+        "data": data,
+        "created_at": datetime.utcnow()
+    }
+
+class Subscription:
+    """Events queued for one connected client"""
+
+    def __init__(self, user: User, maxsize: int):
+        self.tenant_id = user.tenant_id
+        self.user_id = str(user.id)
+        self.sees_all = user.role in SUPERVISING_ROLES
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=maxsize)
+        self.overflowed = False
+
+    def accepts(self, event: Dict[str, Any]) -> bool:
+        if event.get("tenant_id") != self.tenant_id:
+            return False
+        assigned_agent_id = event.get("assigned_agent_id")
+        return self.sees_all or assigned_agent_id is None or assigned_agent_id == self.user_id
+
+    def offer(self, event: Dict[str, Any]):
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            # A client that cannot keep up is disconnected and resyncs over REST
+            self.overflowed = True
+
+class RealtimeHub:
+    """
+    Cross-worker pub/sub backed by a capped MongoDB collection. Publishing is
+    an insert; every API worker follows the collection with one tailable
+    cursor and fans events out to its own connected clients, so no broker is
+    needed and no per-client query is issued.
+    """
+
+    def __init__(
+        self,
+        collection_name: str = "realtime_events",
+        collection_size: int = app_settings.realtime_collection_size,
+        queue_size: int = app_settings.realtime_queue_size,
+        idle_interval: float = app_settings.realtime_idle_interval
+    ):
+        self.collection_name = collection_name
+        self.collection_size = collection_size
+        self.queue_size = queue_size
+        self.idle_interval = idle_interval
+        self._subscriptions: Set[Subscription] = set()
+        self._tailer: Optional[asyncio.Task] = None
+        self._collection_ready = False
+
+    def _collection(self):
+        return Message.get_motor_collection().database[self.collection_name]
+
+    async def _ensure_collection(self):
+        if self._collection_ready:
+            return
+        database = Message.get_motor_collection().database
+        try:
+            await database.create_collection(self.collection_name, capped=True, size=self.collection_size)
+        except CollectionInvalid:
+            pass  # Already created by another worker
+        self._collection_ready = True
+
+    async def publish(self, events: List[Dict[str, Any]]):
+        """Publish events to every worker. Failures are logged, never raised."""
+        if not events:
+            return
+        try:
+            await self._ensure_collection()
+            await self._collection().insert_many(events, ordered=False)
+        except Exception as e:
+            logger.error(f"Error publishing {len(events)} realtime events: {str(e)}")
+
+    def subscribe(self, user: User) -> Subscription:
+        subscription = Subscription(user, self.queue_size)
+        self._subscriptions.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        self._subscriptions.discard(subscription)
+
+    def dispatch(self, event: Dict[str, Any]):
+        for subscription in list(self._subscriptions):
+            if subscription.accepts(event):
+                subscription.offer(event)
+
+    async def start(self):
+        if self._tailer and not self._tailer.done():
+            return
+        await self._ensure_collection()
+        self._tailer = asyncio.create_task(self._tail())
+
+    async def stop(self):
+        if not self._tailer:
+            return
+        self._tailer.cancel()
+        try:
+            await self._tailer
+        except asyncio.CancelledError:
+            pass
+        self._tailer = None
+
+    async def _tail(self):
+        collection = self._collection()
+        # Only events published after this worker started are delivered
+        latest = await collection.find_one({}, {"_id": 1}, sort=[("$natural", -1)])
+        last_id = latest["_id"] if latest else None
+
+        while True:
+            try:
+                query = {"_id": {"$gt": last_id}} if last_id else {}
+                cursor = collection.find(query, cursor_type=CursorType.TAILABLE_AWAIT)
+                while cursor.alive:
+                    async for event in cursor:
+                        last_id = event["_id"]
+                        if self._subscriptions:
+                            self.dispatch(event)
+                    await asyncio.sleep(self.idle_interval)
+                # A tailable cursor dies right away on an empty collection
+                await asyncio.sleep(self.idle_interval)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Realtime event tail interrupted: {str(e)}")
+                await asyncio.sleep(5)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "subscriptions": len(self._subscriptions),
+            "tailing": bool(self._tailer and not self._tailer.done())
+        }
+
+realtime_hub = RealtimeHub()
@@ -0,0 +1,290 @@
+import asyncio
+import heapq
+import logging
+import socket
+import uuid
+from datetime import datetime, timedelta
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+from bson import ObjectId
+from pymongo import ReturnDocument, UpdateOne
+from pymongo.errors import DuplicateKeyError
+
+from app.core.config import app_settings
+from app.models.schedule import ScheduledJob, ScheduledJobKind
+
+logger = logging.getLogger(__name__)
+
+LEASE_ID = "scheduler"
+
+JobHandler = Callable[[ScheduledJob], Awaitable[None]]
+
+class Scheduler:
+    """
+    Fires ScheduledJobs at their due time.
+
+    Only the instance holding the `scheduler_leases` lease fires jobs. The
+    leader does not poll: every `load_interval` seconds it loads the
+    (_id, due_at) of jobs due within the next `horizon` seconds into a heap
+    with one range query on due_at, then sleeps until the earliest one.
+    Overdue jobs (after downtime or a leader change) match the same query and
+    fire right away. Jobs scheduled on the leader go straight onto the heap;
+    jobs scheduled by other instances are picked up by the next load.
+
+    A job is claimed by pushing its due_at forward by `visibility_timeout`, so
+    it fires again if the leader dies mid-handler, and deleted once its
+    handler succeeds. Failed jobs are retried with backoff up to
+    `max_attempts`.
+    """
+
+    def __init__(
+        self,
+        lease_ttl: float = app_settings.scheduler_lease_ttl,
+        load_interval: float = app_settings.scheduler_load_interval,
+        horizon: float = app_settings.scheduler_horizon,
+        visibility_timeout: float = app_settings.scheduler_visibility_timeout,
+        concurrency: int = app_settings.scheduler_concurrency,
+        max_attempts: int = app_settings.scheduler_max_attempts,
+        retry_backoff: float = app_settings.scheduler_retry_backoff
+    ):
+        self.lease_ttl = lease_ttl
+        self.load_interval = load_interval
+        self.horizon = max(horizon, load_interval)
+        self.visibility_timeout = visibility_timeout
+        self.max_attempts = max_attempts
+        self.retry_backoff = retry_backoff
+        self.instance_id = f"{socket.gethostname()}-{uuid.uuid4().hex[:8]}"
+        self.is_leader = False
+
+        self._handlers: Dict[ScheduledJobKind, JobHandler] = {}
+        self._heap: List[Tuple[datetime, str]] = []
+        self._queued: Dict[str, datetime] = {}  # Job id -> due_at of its live heap entry
+        self._loaded_until = datetime.min
+        self._next_load_at = datetime.min
+        self._lease_renewed_at = datetime.min
+        self._semaphore = asyncio.Semaphore(concurrency)
+        self._wakeup = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self._running: Set[asyncio.Task] = set()
+
+        self.fired = 0
+        self.failed = 0
+
+    def register(self, kind: ScheduledJobKind, handler: JobHandler):
+        self._handlers[kind] = handler
+
+    def _collection(self):
+        return ScheduledJob.get_motor_collection()
+
+    def _leases(self):
+        return ScheduledJob.get_motor_collection().database["scheduler_leases"]
+
+    async def schedule(
+        self,
+        tenant_id: str,
+        kind: ScheduledJobKind,
+        key: str,
+        due_at: datetime,
+        payload: Optional[Dict[str, Any]] = None
+    ):
+        """Create the job for (tenant_id, key), or move it to `due_at`"""
+        document = await self._collection().find_one_and_update(
+            {"tenant_id": tenant_id, "key": key},
+            self._upsert(kind, due_at, payload),
+            upsert=True,
+            projection={"due_at": 1},
+            return_document=ReturnDocument.AFTER
+        )
+        self._track(str(document["_id"]), document["due_at"])
+
+    async def schedule_many(self, jobs: Iterable[Tuple[str, ScheduledJobKind, str, datetime, Dict[str, Any]]]):
+        """Bulk version of `schedule` for (tenant_id, kind, key, due_at, payload) tuples"""
+        operations = []
+        earliest = None
+        for tenant_id, kind, key, due_at, payload in jobs:
+            operations.append(UpdateOne(
+                {"tenant_id": tenant_id, "key": key},
+                self._upsert(kind, due_at, payload),
+                upsert=True
+            ))
+            earliest = due_at if earliest is None else min(earliest, due_at)
+        if not operations:
+            return
+        await self._collection().bulk_write(operations, ordered=False)
+        if self.is_leader and earliest <= self._loaded_until:
+            self._next_load_at = datetime.min  # Reload so the new jobs join the heap
+            self._wakeup.set()
+
+    @staticmethod
+    def _upsert(kind: ScheduledJobKind, due_at: datetime, payload: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+        return {
+            "$set": {"kind": kind.value, "due_at": due_at, "payload": payload or {}, "attempts": 0, "last_error": None},
+            "$setOnInsert": {"created_at": datetime.utcnow()}
+        }
+
+    async def cancel(self, tenant_id: str, key: str):
+        # A stale heap entry is skipped when its claim finds nothing
+        await self._collection().delete_one({"tenant_id": tenant_id, "key": key})
+
+    def _track(self, job_id: str, due_at: datetime):
+        if not self.is_leader or due_at > self._loaded_until or self._queued.get(job_id) == due_at:
+            return
+        self._queued[job_id] = due_at
+        heapq.heappush(self._heap, (due_at, job_id))
+        if self._heap[0][1] == job_id:
+            self._wakeup.set()
+
+    def start(self):
+        if self._task is None and app_settings.scheduler_enabled:
+            self._task = asyncio.create_task(self._run())
+            logger.info(f"Scheduler {self.instance_id} started")
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        await asyncio.gather(*self._running, return_exceptions=True)
+        if self.is_leader:
+            await self._leases().update_one(
+                {"_id": LEASE_ID, "owner": self.instance_id},
+                {"$set": {"expires_at": datetime.utcnow()}}
+            )
+            self._become_follower()
+
+    async def _acquire_lease(self, now: datetime) -> bool:
+        try:
+            await self._leases().find_one_and_update(
+                {"_id": LEASE_ID, "$or": [{"owner": self.instance_id}, {"expires_at": {"$lt": now}}]},
+                {"$set": {"owner": self.instance_id, "expires_at": now + timedelta(seconds=self.lease_ttl)}},
+                upsert=True
+            )
+            return True
+        except DuplicateKeyError:
+            return False  # Another instance holds a live lease
+
+    def _become_follower(self):
+        if self.is_leader:
+            logger.info(f"Scheduler {self.instance_id} is no longer the leader")
+        self.is_leader = False
+        self._heap = []
+        self._queued = {}
+        self._loaded_until = datetime.min
+        self._next_load_at = datetime.min
+
+    async def _load(self, now: datetime):
+        until = now + timedelta(seconds=self.horizon)
+        loaded = 0
+        cursor = self._collection().find({"due_at": {"$lte": until}}, {"due_at": 1}).sort("due_at", 1)
+        async for document in cursor:
+            job_id = str(document["_id"])
+            if self._queued.get(job_id) != document["due_at"]:
+                self._queued[job_id] = document["due_at"]
+                heapq.heappush(self._heap, (document["due_at"], job_id))
+                loaded += 1
+        self._loaded_until = until
+        self._next_load_at = now + timedelta(seconds=self.load_interval)
+        if loaded:
+            logger.info(f"Scheduler loaded {loaded} jobs due before {until.isoformat()}")
+
+    async def _run(self):
+        while True:
+            try:
+                now = datetime.utcnow()
+                if (now - self._lease_renewed_at).total_seconds() >= self.lease_ttl / 3:
+                    leader = await self._acquire_lease(now)
+                    self._lease_renewed_at = now
+                    if leader and not self.is_leader:
+                        logger.info(f"Scheduler {self.instance_id} became the leader")
+                    elif not leader:
+                        self._become_follower()
+                    self.is_leader = leader
+
+                if self.is_leader:
+                    if now >= self._next_load_at:
+                        await self._load(now)
+                    while self._heap and self._heap[0][0] <= now:
+                        due_at, job_id = heapq.heappop(self._heap)
+                        if self._queued.get(job_id) != due_at:
+                            continue  # Superseded by a newer entry for the same job
+                        del self._queued[job_id]
+                        task = asyncio.create_task(self._fire(job_id, due_at))
+                        self._running.add(task)
+                        task.add_done_callback(self._running.discard)
+
+                wait = self.lease_ttl / 3
+                if self.is_leader:
+                    wait = min(wait, (self._next_load_at - now).total_seconds())
+                    if self._heap:
+                        wait = min(wait, (self._heap[0][0] - now).total_seconds())
+                self._wakeup.clear()
+                # asyncio.wait rather than wait_for, which can swallow a cancellation
+                # that races with its timeout and keep stop() waiting forever
+                waiter = asyncio.ensure_future(self._wakeup.wait())
+                try:
+                    await asyncio.wait({waiter}, timeout=max(wait, 0.01))
+                finally:
+                    waiter.cancel()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Error in scheduler loop: {str(e)}")
+                await asyncio.sleep(1.0)
+
+    async def _fire(self, job_id: str, due_at: datetime):
+        async with self._semaphore:
+            collection = self._collection()
+            now = datetime.utcnow()
+            claimed_until = now + timedelta(seconds=self.visibility_timeout)
+            document = await collection.find_one_and_update(
+                {"_id": ObjectId(job_id), "due_at": due_at},
+                {"$set": {"due_at": claimed_until}, "$inc": {"attempts": 1}},
+                return_document=ReturnDocument.AFTER
+            )
+            if not document:
+                return  # Cancelled, rescheduled or claimed by a previous leader
+
+            job = ScheduledJob.model_validate(document)
+            handler = self._handlers.get(job.kind)
+            try:
+                if handler is None:
+                    raise RuntimeError(f"No handler registered for {job.kind.value} jobs")
+                await handler(job)
+            except Exception as e:
+                self.failed += 1
+                await self._retry(job, document["due_at"], str(e))
+                return
+
+            self.fired += 1
+            # Rescheduling the key while the handler ran moved due_at; keep that job
+            await collection.delete_one({"_id": job.id, "due_at": document["due_at"]})
+
+    async def _retry(self, job: ScheduledJob, claimed_until: datetime, error: str):
+        collection = self._collection()
+        if job.attempts >= self.max_attempts:
+            logger.error(f"Scheduled job {job.id} ({job.key}) dropped after {job.attempts} attempts: {error}")
+            await collection.delete_one({"_id": job.id, "due_at": claimed_until})
+            return
+
+        logger.warning(f"Scheduled job {job.id} ({job.key}) failed (attempt {job.attempts}), retrying: {error}")
+        retry_at = datetime.utcnow() + timedelta(seconds=self.retry_backoff * (2 ** (job.attempts - 1)))
+        document = await collection.find_one_and_update(
+            {"_id": job.id, "due_at": claimed_until},
+            {"$set": {"due_at": retry_at, "last_error": error}},
+            projection={"due_at": 1},
+            return_document=ReturnDocument.AFTER
+        )
+        if document:
+            self._track(str(job.id), document["due_at"])
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "instance_id": self.instance_id,
+            "leader": self.is_leader,
+            "pending_in_memory": len(self._queued),
+            "running": len(self._running),
+            "fired": self.fired,
+            "failed": self.failed
+        }
+
+scheduler = Scheduler()
@@ -0,0 +1,117 @@
+import re
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+PLACEHOLDER_PATTERN = re.compile(r"\{\{\s*([A-Za-z0-9_.-]+)\s*(?:\|\s*([^}]*?)\s*)?\}\}")
+
+# Contact attributes that can always be used as placeholders
+BUILTIN_FIELDS = {"name", "profile_name", "phone_number"}
+
+def _make_getter(field: str, default: str) -> Callable[[Dict[str, Any]], str]:
+    """
+    Build a lookup for one placeholder against a raw contact document.
+    Variant field values win over custom fields, which win over built-ins.
+    """
+    is_builtin = field in BUILTIN_FIELDS
+
+    def getter(contact: Dict[str, Any]) -> str:
+        value = (contact.get("variant_field_values") or {}).get(field)
+        if value is None:
+            value = (contact.get("custom_fields") or {}).get(field)
+        if value is None and is_builtin:
+            value = contact.get(field)
+        return default if value is None else str(value)
+
+    return getter
+
+class CompiledTemplate:
+    """
+    A string template parsed once into literal parts and placeholder slots.
+    Rendering only fills the slots, so it can run in a tight loop over
+    hundreds of thousands of contacts.
+    """
+
+    def __init__(self, source: str):
+        self.source = source
+        self.fields: Set[str] = set()
+        self._parts: List[str] = []
+        self._slots: List[Tuple[int, Callable[[Dict[str, Any]], str]]] = []
+
+        position = 0
+        for match in PLACEHOLDER_PATTERN.finditer(source):
+            if match.start() > position:
+                self._parts.append(source[position:match.start()])
+            field, default = match.group(1), match.group(2) or ""
+            self.fields.add(field)
+            self._slots.append((len(self._parts), _make_getter(field, default)))
+            self._parts.append("")
+            position = match.end()
+        if position < len(source):
+            self._parts.append(source[position:])
+
+    @property
+    def is_static(self) -> bool:
+        return not self._slots
+
+    def render(self, contact: Dict[str, Any]) -> str:
+        if not self._slots:
+            return self.source
+        parts = self._parts.copy()
+        for index, getter in self._slots:
+            parts[index] = getter(contact)
+        return "".join(parts)
+
+class CompiledContent:
+    """
+    Message content (any JSON structure) compiled into a tree of render
+    functions. Static branches are returned as-is and shared between renders.
+    """
+
+    def __init__(self, content: Any):
+        self.fields: Set[str] = set()
+        self._render, self._static = self._compile(content)
+
+    def _compile(self, value: Any) -> Tuple[Callable[[Dict[str, Any]], Any], bool]:
+        if isinstance(value, str):
+            template = CompiledTemplate(value)
+            if template.is_static:
+                return (lambda contact: value), True
+            self.fields |= template.fields
+            return template.render, False
+
+        if isinstance(value, dict):
+            compiled = [(key, self._compile(item)) for key, item in value.items()]
+            if all(static for _, (_, static) in compiled):
+                return (lambda contact: value), True
+            renderers = [(key, render) for key, (render, _) in compiled]
+            return (lambda contact: {key: render(contact) for key, render in renderers}), False
+
+        if isinstance(value, list):
+            compiled = [self._compile(item) for item in value]
+            if all(static for _, static in compiled):
+                return (lambda contact: value), True
+            renderers = [render for render, _ in compiled]
+            return (lambda contact: [render(contact) for render in renderers]), False
+
+        return (lambda contact: value), True
+
+    @property
+    def is_static(self) -> bool:
+        return self._static
+
+    def validate(self, variant_fields: Iterable[str]) -> List[str]:
+        """
+        Return the placeholders that are neither variant fields nor built-ins.
+        `variant_fields` is any iterable of field names, such as a group's
+        `variant_fields` dict.
+        """
+        return sorted(self.fields - set(variant_fields) - BUILTIN_FIELDS)
+
+    def render(self, contact: Dict[str, Any]) -> Any:
+        return self._render(contact)
+
+def contact_projection(content: Optional[CompiledContent]) -> Dict[str, int]:
+    """Fields to load from each contact to render `content`"""
+    projection = {"phone_number": 1}
+    if content and not content.is_static:
+        projection.update({"name": 1, "profile_name": 1, "variant_field_values": 1, "custom_fields": 1})
+    return projection
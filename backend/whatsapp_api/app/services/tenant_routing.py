@@ -0,0 +1,185 @@
+import asyncio
+import logging
+import time
+from typing import Dict, List, Optional, Set, Any
+from pydantic import BaseModel
+
+from app.core.cache import TTLCache
+from app.core.config import app_settings
+from app.models.tenant import Tenant, WhatsAppBusinessAccount
+
+logger = logging.getLogger(__name__)
+
+class RoutedAccount(BaseModel):
+    tenant_id: str
+    account: WhatsAppBusinessAccount
+
+class TenantRoutingIndex:
+    """
+    Process-local index from WhatsApp phone_number_id to the owning tenant and
+    its account metadata. Loaded once at startup and refreshed by the tenant
+    routes (and optionally a MongoDB change stream), so routing an inbound
+    webhook is a dict lookup instead of a query on an unindexed array field.
+
+    Without the change stream, updates made by other workers are only seen by
+    `resolve`, which re-reads an account's tenant once its entry is older than
+    `ttl` seconds.
+    """
+
+    def __init__(
+        self,
+        ttl: float = app_settings.tenant_routing_ttl,
+        miss_ttl: float = app_settings.tenant_routing_miss_ttl,
+        miss_cache_size: int = app_settings.tenant_routing_miss_cache_size
+    ):
+        self.ttl = ttl
+        self._accounts: Dict[str, RoutedAccount] = {}
+        self._loaded_at: Dict[str, float] = {}
+        self._numbers_by_tenant: Dict[str, Set[str]] = {}
+        self._misses = TTLCache(miss_cache_size, miss_ttl)
+        self._watcher: Optional[asyncio.Task] = None
+
+    async def load(self):
+        """(Re)build the whole index from the tenants collection"""
+        accounts: Dict[str, RoutedAccount] = {}
+        numbers_by_tenant: Dict[str, Set[str]] = {}
+        now = time.monotonic()
+
+        cursor = Tenant.get_motor_collection().find({}, {"whatsapp_accounts": 1})
+        async for doc in cursor:
+            tenant_id = str(doc["_id"])
+            for routed in self._build_entries(tenant_id, doc.get("whatsapp_accounts", [])):
+                accounts[routed.account.phone_number_id] = routed
+                numbers_by_tenant.setdefault(tenant_id, set()).add(routed.account.phone_number_id)
+
+        self._accounts = accounts
+        self._loaded_at = {phone_number_id: now for phone_number_id in accounts}
+        self._numbers_by_tenant = numbers_by_tenant
+        self._misses.clear()
+        logger.info(f"Tenant routing index loaded with {len(accounts)} WhatsApp accounts")
+
+    def get(self, phone_number_id: str) -> Optional[RoutedAccount]:
+        return self._accounts.get(phone_number_id)
+
+    async def resolve(self, phone_number_id: str) -> Optional[RoutedAccount]:
+        """
+        Resolve a phone_number_id, falling back to the database on a miss so
+        tenants created by another worker are picked up, and when the entry is
+        older than `ttl` so tokens rotated or numbers removed elsewhere are.
+        Misses are remembered for `miss_ttl` seconds to keep unknown numbers
+        from hitting the database.
+        """
+        if not phone_number_id:
+            return None
+        routed = self._accounts.get(phone_number_id)
+        if routed and time.monotonic() - self._loaded_at.get(phone_number_id, 0) < self.ttl:
+            return routed
+        if not routed and phone_number_id in self._misses:
+            return None
+
+        try:
+            tenant = await Tenant.find_one({"whatsapp_accounts.phone_number_id": phone_number_id})
+        except Exception as e:
+            if not routed:
+                raise
+            logger.warning(f"Error refreshing routing for {phone_number_id}, using cached entry: {str(e)}")
+            return routed
+
+        if not tenant:
+            if routed:
+                self._remove_number(phone_number_id)
+            self._misses.set(phone_number_id, True)
+            return None
+
+        self.refresh_tenant(tenant)
+        return self._accounts.get(phone_number_id)
+
+    def refresh_tenant(self, tenant: Tenant):
+        """Replace the index entries of a tenant after it was created or updated"""
+        self._replace_tenant(
+            str(tenant.id),
+            [account.dict() for account in tenant.whatsapp_accounts]
+        )
+
+    def remove_tenant(self, tenant_id: str):
+        for phone_number_id in self._numbers_by_tenant.pop(tenant_id, set()):
+            routed = self._accounts.get(phone_number_id)
+            if routed and routed.tenant_id == tenant_id:
+                del self._accounts[phone_number_id]
+                self._loaded_at.pop(phone_number_id, None)
+
+    def _remove_number(self, phone_number_id: str):
+        routed = self._accounts.pop(phone_number_id, None)
+        self._loaded_at.pop(phone_number_id, None)
+        if routed:
+            self._numbers_by_tenant.get(routed.tenant_id, set()).discard(phone_number_id)
+
+    def _replace_tenant(self, tenant_id: str, accounts: List[Dict[str, Any]]):
+        self.remove_tenant(tenant_id)
+        numbers = set()
+        now = time.monotonic()
+        for routed in self._build_entries(tenant_id, accounts):
+            phone_number_id = routed.account.phone_number_id
+            self._accounts[phone_number_id] = routed
+            self._loaded_at[phone_number_id] = now
+            self._misses.pop(phone_number_id)
+            numbers.add(phone_number_id)
+        if numbers:
+            self._numbers_by_tenant[tenant_id] = numbers
+
+    @staticmethod
+    def _build_entries(tenant_id: str, accounts: List[Dict[str, Any]]) -> List[RoutedAccount]:
+        entries = []
+        for account in accounts or []:
+            try:
+                entries.append(
+                    RoutedAccount(tenant_id=tenant_id, account=WhatsAppBusinessAccount(**account))
+                )
+            except Exception as e:
+                logger.error(f"Skipping invalid WhatsApp account on tenant {tenant_id}: {str(e)}")
+        return entries
+
+    def start_watching(self):
+        """Follow the tenants collection change stream (requires a replica set)"""
+        if self._watcher and not self._watcher.done():
+            return
+        self._watcher = asyncio.create_task(self._watch())
+
+    async def stop_watching(self):
+        if not self._watcher:
+            return
+        self._watcher.cancel()
+        try:
+            await self._watcher
+        except asyncio.CancelledError:
+            pass
+        self._watcher = None
+
+    async def _watch(self):
+        collection = Tenant.get_motor_collection()
+        while True:
+            try:
+                async with collection.watch(full_document="updateLookup") as stream:
+                    async for change in stream:
+                        self._apply_change(change)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Tenant change stream interrupted, reloading index: {str(e)}")
+                await asyncio.sleep(5)
+                try:
+                    await self.load()
+                except Exception as load_error:
+                    logger.error(f"Error reloading tenant routing index: {str(load_error)}")
+
+    def _apply_change(self, change: Dict[str, Any]):
+        tenant_id = str(change.get("documentKey", {}).get("_id"))
+        if change.get("operationType") == "delete":
+            self.remove_tenant(tenant_id)
+            return
+
+        document = change.get("fullDocument")
+        if document is not None:
+            self._replace_tenant(tenant_id, document.get("whatsapp_accounts", []))
+
+tenant_routing = TenantRoutingIndex()
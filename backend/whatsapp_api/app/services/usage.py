@@ -0,0 +1,272 @@
+import asyncio
+import logging
+import time
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+from bson import ObjectId
+from pymongo import ReturnDocument
+
+from app.core.config import app_settings
+from app.models.message import MessageType
+from app.models.tenant import Tenant, UsageLimits
+from app.models.usage import UsageCounter
+
+logger = logging.getLogger(__name__)
+
+MEDIA_MESSAGE_TYPES = {
+    MessageType.IMAGE,
+    MessageType.VIDEO,
+    MessageType.DOCUMENT,
+    MessageType.AUDIO,
+    MessageType.STICKER,
+}
+
+def is_media(message_type: MessageType) -> bool:
+    return message_type in MEDIA_MESSAGE_TYPES
+
+class UsageLimitExceeded(Exception):
+    def __init__(self, kind: str, limit: int, day: str):
+        self.kind = kind
+        self.limit = limit
+        self.day = day
+        super().__init__(f"Daily {kind} limit of {limit} reached for {day}")
+
+class TenantMeter:
+    """Usage of one tenant for its current day, as seen by this worker"""
+
+    def __init__(self, tenant_id: str):
+        self.tenant_id = tenant_id
+        self.limits = UsageLimits()
+        self.zone = ZoneInfo("UTC")
+        self.loaded_at = 0.0
+        self.day: Optional[str] = None
+        self.committed_messages = 0  # Totals stored in MongoDB at the last sync
+        self.committed_media = 0
+        self.pending: Dict[str, List[int]] = {}  # day -> [messages, media] not flushed yet
+        self.in_flight: Dict[str, List[int]] = {}  # day -> [messages, media] being flushed
+
+    def today(self) -> str:
+        return datetime.now(self.zone).date().isoformat()
+
+    def resets_at(self) -> datetime:
+        tomorrow = datetime.now(self.zone).date() + timedelta(days=1)
+        midnight = datetime(tomorrow.year, tomorrow.month, tomorrow.day, tzinfo=self.zone)
+        return midnight.astimezone(ZoneInfo("UTC")).replace(tzinfo=None)
+
+    def used(self) -> List[int]:
+        pending = self.pending.get(self.day, [0, 0])
+        in_flight = self.in_flight.get(self.day, [0, 0])
+        return [
+            self.committed_messages + pending[0] + in_flight[0],
+            self.committed_media + pending[1] + in_flight[1]
+        ]
+
+    def _count_in_flight(self, day: str, messages: int, media: int):
+        in_flight = self.in_flight.setdefault(day, [0, 0])
+        in_flight[0] += messages
+        in_flight[1] += media
+        if in_flight == [0, 0]:
+            del self.in_flight[day]
+
+    def soft_limited(self, used_messages: int, used_media: int) -> bool:
+        percent = self.limits.soft_limit_percent
+        return (
+            used_messages * 100 >= self.limits.max_messages_per_day * percent
+            or used_media * 100 >= self.limits.max_media_per_day * percent
+        )
+
+class UsageMeter:
+    """
+    Daily message and media quotas per tenant. Reservations are checked and
+    counted against in-process counters, so the send path does no I/O in the
+    steady state. Local increments are flushed with `$inc` upserts every
+    `flush_interval` seconds and each flush returns the global total, which
+    bounds how far workers can overshoot a limit together. Limits and the
+    tenant's timezone are reloaded every `limits_ttl` seconds.
+    """
+
+    def __init__(
+        self,
+        flush_interval: float = app_settings.usage_flush_interval,
+        limits_ttl: float = app_settings.usage_limits_ttl
+    ):
+        self.flush_interval = flush_interval
+        self.limits_ttl = limits_ttl
+        self._meters: Dict[str, TenantMeter] = {}
+        self._flusher: Optional[asyncio.Task] = None
+
+    async def _meter(self, tenant_id: str) -> TenantMeter:
+        meter = self._meters.get(tenant_id)
+        if meter is None:
+            meter = self._meters[tenant_id] = TenantMeter(tenant_id)
+        if time.monotonic() - meter.loaded_at > self.limits_ttl:
+            await self._load(meter)
+        if meter.day != meter.today():
+            await self._roll_over(meter)
+        return meter
+
+    async def _load(self, meter: TenantMeter):
+        tenant = await Tenant.get_motor_collection().find_one(
+            {"_id": ObjectId(meter.tenant_id)}, {"usage_limits": 1, "timezone": 1}
+        ) if ObjectId.is_valid(meter.tenant_id) else None
+        tenant = tenant or {}
+        meter.limits = UsageLimits(**(tenant.get("usage_limits") or {}))
+        try:
+            meter.zone = ZoneInfo(tenant.get("timezone") or "UTC")
+        except (ZoneInfoNotFoundError, ValueError):
+            logger.error(f"Unknown timezone {tenant.get('timezone')} for tenant {meter.tenant_id}, using UTC")
+            meter.zone = ZoneInfo("UTC")
+        meter.loaded_at = time.monotonic()
+        if meter.day == meter.today():
+            await self._sync(meter)
+
+    async def _roll_over(self, meter: TenantMeter):
+        """Start counting a new day; pending usage of the old day is still flushed to it"""
+        meter.day = meter.today()
+        meter.committed_messages = 0
+        meter.committed_media = 0
+        await self._sync(meter)
+
+    async def _sync(self, meter: TenantMeter):
+        counter = await UsageCounter.get_motor_collection().find_one(
+            {"tenant_id": meter.tenant_id, "day": meter.day}, {"messages": 1, "media": 1}
+        )
+        if counter:
+            meter.committed_messages = counter.get("messages", 0)
+            meter.committed_media = counter.get("media", 0)
+
+    async def reserve(self, tenant_id: str, messages: int = 1, media: int = 0, partial: bool = False) -> Dict[str, Any]:
+        """
+        Count `messages` (of which `media` are media messages) against the
+        tenant's daily limits. With `partial` as many as fit are granted,
+        otherwise all or nothing. Raises UsageLimitExceeded when nothing can
+        be granted.
+        """
+        meter = await self._meter(tenant_id)
+        used_messages, used_media = meter.used()
+
+        granted = min(messages, max(meter.limits.max_messages_per_day - used_messages, 0))
+        if media:
+            media_room = max(meter.limits.max_media_per_day - used_media, 0)
+            # All messages of a reservation with media are media messages
+            granted = min(granted, media_room) if media == messages else (granted if media <= media_room else 0)
+        if not partial and granted < messages:
+            granted = 0
+        if messages and not granted:
+            needed = 1 if partial else messages
+            kind = "message" if used_messages + needed > meter.limits.max_messages_per_day else "media"
+            limit = meter.limits.max_media_per_day if kind == "media" else meter.limits.max_messages_per_day
+            raise UsageLimitExceeded(kind, limit, meter.day)
+
+        granted_media = min(media, granted)
+        pending = meter.pending.setdefault(meter.day, [0, 0])
+        pending[0] += granted
+        pending[1] += granted_media
+        return {
+            "granted": granted,
+            "media": granted_media,
+            "day": meter.day,
+            "soft_limited": meter.soft_limited(used_messages + granted, used_media + granted_media)
+        }
+
+    async def release(self, tenant_id: str, reservation: Dict[str, Any], messages: Optional[int] = None):
+        """
+        Give back `messages` of a reservation (all of it by default) whose
+        messages could not be stored or queued. The negative pending count is
+        flushed like any other, so other workers see the room again.
+        """
+        granted = reservation.get("granted", 0)
+        messages = granted if messages is None else min(messages, granted)
+        if messages <= 0:
+            return
+        media = min(reservation.get("media", 0), messages)
+        meter = await self._meter(tenant_id)
+        pending = meter.pending.setdefault(reservation.get("day", meter.day), [0, 0])
+        pending[0] -= messages
+        pending[1] -= media
+
+    async def flush(self):
+        """
+        Write pending local usage to MongoDB and refresh the global totals.
+        Usage being written stays counted as in flight until the write
+        returns, so reservations made meanwhile still see it.
+        """
+        collection = UsageCounter.get_motor_collection()
+        for meter in list(self._meters.values()):
+            if not meter.pending:
+                continue
+            pending, meter.pending = meter.pending, {}
+            for day, (messages, media) in pending.items():
+                meter._count_in_flight(day, messages, media)
+            for day, (messages, media) in pending.items():
+                try:
+                    counter = await collection.find_one_and_update(
+                        {"tenant_id": meter.tenant_id, "day": day},
+                        {"$inc": {"messages": messages, "media": media}, "$set": {"updated_at": datetime.utcnow()}},
+                        upsert=True,
+                        return_document=ReturnDocument.AFTER
+                    )
+                except Exception as e:
+                    logger.error(f"Error flushing usage of tenant {meter.tenant_id}: {str(e)}")
+                    meter._count_in_flight(day, -messages, -media)
+                    restored = meter.pending.setdefault(day, [0, 0])
+                    restored[0] += messages
+                    restored[1] += media
+                    continue
+                meter._count_in_flight(day, -messages, -media)
+                if day == meter.day:
+                    meter.committed_messages = counter.get("messages", 0)
+                    meter.committed_media = counter.get("media", 0)
+
+    async def usage(self, tenant_id: str) -> Dict[str, Any]:
+        meter = await self._meter(tenant_id)
+        await self._sync(meter)
+        used_messages, used_media = meter.used()
+        return {
+            "day": meter.day,
+            "timezone": str(meter.zone),
+            "resets_at": meter.resets_at(),
+            "messages": used_messages,
+            "media": used_media,
+            "max_messages_per_day": meter.limits.max_messages_per_day,
+            "max_media_per_day": meter.limits.max_media_per_day,
+            "soft_limit_percent": meter.limits.soft_limit_percent,
+            "soft_limited": meter.soft_limited(used_messages, used_media),
+            "hard_limited": (
+                used_messages >= meter.limits.max_messages_per_day
+                or used_media >= meter.limits.max_media_per_day
+            )
+        }
+
+    def invalidate(self, tenant_id: str):
+        """Reload limits and timezone on next use, after the tenant was updated"""
+        meter = self._meters.get(str(tenant_id))
+        if meter:
+            meter.loaded_at = 0.0
+
+    def start(self):
+        if self._flusher and not self._flusher.done():
+            return
+        self._flusher = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._flusher:
+            self._flusher.cancel()
+            try:
+                await self._flusher
+            except asyncio.CancelledError:
+                pass
+            self._flusher = None
+        await self.flush()
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            try:
+                await self.flush()
+            except Exception as e:
+                logger.error(f"Error flushing usage counters: {str(e)}")
+
+usage_meter = UsageMeter()
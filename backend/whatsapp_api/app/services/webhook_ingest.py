@@ -0,0 +1,335 @@
+import asyncio
+import logging
+from datetime import datetime
+from typing import List, Dict, Any, Iterator, Optional
+
+from app.core.config import app_settings
+from app.models.message import Message, MessageStatus, MessageCost
+from app.models.webhook import FailedWebhook
+from app.services.tenant_routing import tenant_routing
+from app.services.dedup import message_deduplicator
+from app.services.conversations import record_messages
+from app.models.conversation import MessageDirection
+from app.services.conversations import message_conversation_key, message_preview, message_type_value, conversation_number, find_conversations
+from app.services.message_status import StatusUpdate, parse_status, message_status_applier
+from app.services.billing import get_cost_settings, message_cost, record_costs
+from app.services.realtime import realtime_hub, build_event, EventType
+from app.services.flow_engine import flow_engine
+
+logger = logging.getLogger(__name__)
+
+_STOP = object()  # Queued by stop() behind the pending payloads
+
+def iter_change_values(payload: Dict[str, Any]) -> Iterator[Dict[str, Any]]:
+    """
+    Yield the `value` object of every change in every entry of a webhook payload
+    """
+    for entry in payload.get("entry", []) or []:
+        for change in entry.get("changes", []) or []:
+            value = change.get("value")
+            if value:
+                yield value
+
+class WebhookIngestQueue:
+    """
+    Bounded in-process queue that decouples the webhook response from the
+    database work. Payloads are drained in batches: tenants are resolved once
+    per phone_number_id, all messages of a batch are written with a single
+    insert_many and all delivery receipts with a single bulk_write.
+
+    A batch that fails is retried with backoff up to `max_attempts` times,
+    then its payloads are spilled to `failed_webhooks` and replayed the next
+    time the queue starts. Meta has already been answered 200 by then, so
+    nothing else would redeliver them.
+    """
+
+    def __init__(
+        self,
+        maxsize: int = app_settings.webhook_queue_size,
+        batch_size: int = app_settings.webhook_batch_size,
+        flush_interval: float = app_settings.webhook_flush_interval,
+        max_attempts: int = app_settings.webhook_max_attempts,
+        retry_backoff: float = app_settings.webhook_retry_backoff
+    ):
+        self.maxsize = maxsize
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_attempts = max_attempts
+        self.retry_backoff = retry_backoff
+        self._queue: Optional[asyncio.Queue] = None
+        self._worker: Optional[asyncio.Task] = None
+        self._stopping = False
+
+    def start(self):
+        """Start the background drain task on the running event loop"""
+        if self._worker and not self._worker.done():
+            return
+        self._queue = asyncio.Queue(maxsize=self.maxsize)
+        self._worker = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Drain whatever is queued, including the batch in flight, and stop the drain task"""
+        if not self._worker:
+            return
+        self._stopping = True  # Later submits are processed inline
+        if not self._worker.done():
+            await self._queue.put(_STOP)
+            try:
+                await self._worker
+            except Exception as e:
+                logger.error(f"Webhook ingest worker stopped with an error: {str(e)}")
+        self._worker = None
+
+        # Left behind only if the worker died before reaching the sentinel
+        pending = []
+        while not self._queue.empty():
+            payload = self._queue.get_nowait()
+            if payload is not _STOP:
+                pending.append(payload)
+        if pending:
+            await self._process_with_retry(pending)
+        self._stopping = False
+
+    async def submit(self, payload: Dict[str, Any]):
+        """
+        Queue a webhook payload for ingestion. When the queue is full (or the
+        drain task is not running) the payload is processed inline, so a burst
+        slows the webhook down instead of dropping messages.
+        """
+        if self._queue is not None and self._worker and not self._worker.done() and not self._stopping:
+            try:
+                self._queue.put_nowait(payload)
+                return
+            except asyncio.QueueFull:
+                logger.warning("Webhook ingest queue full, processing payload inline")
+        await self.process([payload])
+
+    async def _run(self):
+        await self._replay_failed()
+
+        loop = asyncio.get_running_loop()
+        while True:
+            first = await self._queue.get()
+            if first is _STOP:
+                return
+            batch = [first]
+            stop = False
+            deadline = loop.time() + self.flush_interval
+            while len(batch) < self.batch_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    payload = await asyncio.wait_for(self._queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+                if payload is _STOP:
+                    stop = True
+                    break
+                batch.append(payload)
+
+            await self._process_with_retry(batch)
+            if stop:
+                return
+
+    async def _process_with_retry(self, batch: List[Dict[str, Any]]):
+        for attempt in range(1, self.max_attempts + 1):
+            try:
+                await self.process(batch)
+                return
+            except Exception as e:
+                error = str(e)
+                if attempt == self.max_attempts:
+                    break
+                delay = self.retry_backoff * (2 ** (attempt - 1))
+                logger.warning(
+                    f"Error ingesting webhook batch of {len(batch)} payloads (attempt {attempt}), "
+                    f"retrying in {delay:.1f}s: {error}"
+                )
+                await asyncio.sleep(delay)
+
+        logger.error(f"Spilling webhook batch of {len(batch)} payloads after {self.max_attempts} attempts: {error}")
+        try:
+            await FailedWebhook.get_motor_collection().insert_many([
+                {"payload": payload, "attempts": self.max_attempts, "last_error": error, "created_at": datetime.utcnow()}
+                for payload in batch
+            ])
+        except Exception as e:
+            logger.error(f"Could not spill {len(batch)} webhook payloads, dropping them: {str(e)}")
+
+    async def _replay_failed(self):
+        """Ingest payloads spilled by earlier failures, oldest first"""
+        collection = FailedWebhook.get_motor_collection()
+        replayed = 0
+        try:
+            while True:
+                documents = await collection.find({}, {"payload": 1}).sort("created_at", 1).to_list(self.batch_size)
+                if not documents:
+                    break
+                await self.process([document["payload"] for document in documents])
+                await collection.delete_many({"_id": {"$in": [document["_id"] for document in documents]}})
+                replayed += len(documents)
+        except Exception as e:
+            logger.error(f"Error replaying failed webhooks, keeping the rest for the next start: {str(e)}")
+        if replayed:
+            logger.info(f"Replayed {replayed} failed webhook payloads")
+
+    async def process(self, payloads: List[Dict[str, Any]]) -> int:
+        """
+        Ingest a batch of webhook payloads and return the number of messages stored
+        """
+        values_by_number: Dict[str, List[Dict[str, Any]]] = {}
+        for payload in payloads:
+            for value in iter_change_values(payload):
+                if not value.get("messages") and not value.get("statuses"):
+                    continue
+                phone_number_id = value.get("metadata", {}).get("phone_number_id")
+                values_by_number.setdefault(phone_number_id, []).append(value)
+
+        if not values_by_number:
+            return 0
+
+        now = datetime.utcnow()
+        documents = []
+        status_updates: List[StatusUpdate] = []
+        for phone_number_id, values in values_by_number.items():
+            routed = await tenant_routing.resolve(phone_number_id)
+            if not routed:
+                logger.warning(f"No tenant found for phone_number_id {phone_number_id}")
+                continue
+
+            tenant_id = routed.tenant_id
+            cost = message_cost(await get_cost_settings(tenant_id), outbound=False)
+            for value in values:
+                display_phone_number = value.get("metadata", {}).get("display_phone_number")
+                for msg in value.get("messages", []) or []:
+                    try:
+                        documents.append(
+                            self._build_message(msg, tenant_id, phone_number_id, display_phone_number, now, cost)
+                        )
+                    except Exception as e:
+                        logger.error(f"Skipping malformed webhook message {msg.get('id')}: {str(e)}")
+                for status in value.get("statuses", []) or []:
+                    update = parse_status(status, tenant_id, phone_number_id, now)
+                    if update:
+                        status_updates.append(update)
+
+        if status_updates:
+            await self._apply_statuses(status_updates)
+
+        if not documents:
+            return 0
+
+        stored = await message_deduplicator.insert_many(documents)
+        if stored:
+            await self._after_insert(stored)
+        return len(stored)
+
+    async def _after_insert(self, stored: List[Message]):
+        """
+        Side effects of newly stored messages. Each step fails on its own and is
+        only logged: a retry of the batch would find these messages already
+        stored, drop them as duplicates and never run the steps for them.
+        """
+        try:
+            await record_costs(stored, outbound=False)
+        except Exception as e:
+            logger.error(f"Error recording costs for {len(stored)} inbound messages: {str(e)}")
+
+        conversations: Dict[Any, Dict[str, Any]] = {}
+        try:
+            conversations = await record_messages(stored, MessageDirection.INBOUND)
+        except Exception as e:
+            logger.error(f"Error updating conversations for {len(stored)} inbound messages: {str(e)}")
+
+        try:
+            await realtime_hub.publish([
+                self._new_message_event(message, conversations.get(message_conversation_key(message, MessageDirection.INBOUND)))
+                for message in stored
+            ])
+        except Exception as e:
+            logger.error(f"Error publishing {len(stored)} inbound message events: {str(e)}")
+
+        try:
+            await flow_engine.handle_inbound(stored, conversations)
+        except Exception as e:
+            logger.error(f"Error running flows for {len(stored)} inbound messages: {str(e)}")
+
+    @staticmethod
+    async def _apply_statuses(updates: List[StatusUpdate]):
+        applied = await message_status_applier.apply(updates)
+        if not applied:
+            return
+
+        keys = {
+            (update.tenant_id, update.whatsapp_account_id, conversation_number(update.recipient_id or ""))
+            for update in applied
+        }
+        try:
+            conversations = await find_conversations(keys)
+        except Exception as e:
+            logger.error(f"Error resolving conversations for status events: {str(e)}")
+            conversations = {}
+
+        events = []
+        for update in applied:
+            key = (update.tenant_id, update.whatsapp_account_id, conversation_number(update.recipient_id or ""))
+            conversation = conversations.get(key) or {}
+            events.append(build_event(
+                EventType.MESSAGE_STATUS,
+                update.tenant_id,
+                {
+                    "whatsapp_message_id": update.whatsapp_message_id,
+                    "conversation_id": str(conversation["_id"]) if conversation.get("_id") else None,
+                    "to_number": update.recipient_id,
+                    "status": update.status.value,
+                    "timestamp": update.timestamp
+                },
+                conversation.get("assigned_agent_id")
+            ))
+        await realtime_hub.publish(events)
+
+    @staticmethod
+    def _new_message_event(message: Message, conversation: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+        conversation = conversation or {}
+        return build_event(
+            EventType.MESSAGE_NEW,
+            message.tenant_id,
+            {
+                "message_id": str(message.id),
+                "conversation_id": str(conversation["_id"]) if conversation.get("_id") else None,
+                "whatsapp_account_id": message.whatsapp_account_id,
+                "from_number": message.from_number,
+                "message_type": message_type_value(message),
+                "preview": message_preview(message_type_value(message), message.content),
+                "created_at": message.created_at
+            },
+            conversation.get("assigned_agent_id")
+        )
+
+    @staticmethod
+    def _build_message(
+        msg: Dict[str, Any],
+        tenant_id: str,
+        phone_number_id: str,
+        display_phone_number: str,
+        now: datetime,
+        cost: Optional[MessageCost] = None
+    ) -> Message:
+        message_type = msg.get("type")
+        timestamp = msg.get("timestamp")
+        return Message(
+            tenant_id=tenant_id,
+            whatsapp_account_id=phone_number_id,
+            from_number=msg.get("from"),
+            to_number=display_phone_number,
+            message_type=message_type,
+            content=msg.get(message_type, {}),
+            whatsapp_message_id=msg.get("id"),
+            status=MessageStatus.DELIVERED,
+            cost=cost,
+            created_at=datetime.utcfromtimestamp(int(timestamp)) if timestamp else now,
+            updated_at=now
+        )
+
+webhook_ingest = WebhookIngestQueue()
@@ -1,35 +1,279 @@
+import asyncio
 import httpx
 import logging
-from datetime import datetime
+import random
+import time
+from datetime import datetime, timedelta
+from typing import Dict, Any, Optional
+from bson import ObjectId
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
 
+from app.core.config import app_settings
 from app.models.message import Message, MessageStatus
+from app.models.rate_limit import SendRateWindow
+from app.services.message_status import higher_statuses
+from app.models.tenant import WhatsAppBusinessAccount
+from app.services.tenant_routing import tenant_routing
+from app.services.realtime import realtime_hub, build_event, EventType
 
 logger = logging.getLogger(__name__)
 
-async def send_whatsapp_message(message_id: str):
+RETRYABLE_STATUS_CODES = {429, 500, 502, 503, 504}
+
+class WhatsAppSendError(Exception):
+    def __init__(self, message: str, retryable: bool = False, retry_after: Optional[float] = None):
+        super().__init__(message)
+        self.retryable = retryable
+        self.retry_after = retry_after  # Seconds the caller should wait before trying again
+
+class SharedRateLimiter:
     """
-    Send a WhatsApp message using the WhatsApp Business API
+    Limits sends for one phone_number_id to `rate` per second across every
+    API and worker process. Each wall-clock second is a SendRateWindow
+    counter; a process claims up to `claim_size` slots of it per round trip
+    and spends them locally, so most sends never touch MongoDB. Slots a
+    process claimed but did not use lapse with their second.
+    """
+
+    def __init__(self, key: str, rate: float, claim_size: int):
+        self.key = key
+        self.rate = max(int(rate), 1)
+        self.claim_size = max(min(claim_size, self.rate), 1)
+        self._window: Optional[int] = None
+        self._slots = 0
+        self._exhausted = False
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        async with self._lock:
+            while True:
+                now = time.time()
+                window = int(now)
+                if window != self._window:
+                    self._window = window
+                    self._slots = 0
+                    self._exhausted = False
+                if self._slots == 0 and not self._exhausted:
+                    self._slots = await self._claim(window)
+                    self._exhausted = self._slots == 0
+                if self._slots > 0:
+                    self._slots -= 1
+                    return
+                await asyncio.sleep(window + 1 - now)
+
+    async def _claim(self, window: int) -> int:
+        collection = SendRateWindow.get_motor_collection()
+        for _ in range(2):
+            try:
+                document = await collection.find_one_and_update(
+                    {"_id": f"{self.key}:{window}"},
+                    {
+                        "$inc": {"used": self.claim_size},
+                        "$setOnInsert": {"expires_at": datetime.utcnow() + timedelta(minutes=1)}
+                    },
+                    upsert=True,
+                    return_document=ReturnDocument.AFTER
+                )
+                break
+            except DuplicateKeyError:
+                continue  # Another process created the window first
+        else:
+            return 0
+        # Slots taken by others before this claim count against it
+        already_used = document["used"] - self.claim_size
+        return max(min(self.claim_size, self.rate - already_used), 0)
+
+_client: Optional[httpx.AsyncClient] = None
+_rate_limiters: Dict[str, SharedRateLimiter] = {}
+
+def get_http_client() -> httpx.AsyncClient:
+    """Shared HTTP/2 client so every send reuses pooled connections to the Graph API"""
+    global _client
+    if _client is None or _client.is_closed:
+        _client = httpx.AsyncClient(
+            base_url=app_settings.whatsapp_api_base_url,
+            http2=True,
+            timeout=app_settings.whatsapp_http_timeout,
+            limits=httpx.Limits(
+                max_connections=app_settings.whatsapp_http_max_connections,
+                max_keepalive_connections=app_settings.whatsapp_http_max_connections
+            )
+        )
+    return _client
+
+async def close_http_client():
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+
+def get_rate_limiter(account: WhatsAppBusinessAccount) -> SharedRateLimiter:
+    """
+    Per phone_number_id limiter at `whatsapp_messages_per_second`. The
+    account's `messaging_limit` is Meta's daily conversation tier, not a
+    throughput, and is deliberately not used here.
+    """
+    limiter = _rate_limiters.get(account.phone_number_id)
+    if limiter is None:
+        limiter = SharedRateLimiter(
+            account.phone_number_id,
+            app_settings.whatsapp_messages_per_second,
+            app_settings.whatsapp_rate_claim_size
+        )
+        _rate_limiters[account.phone_number_id] = limiter
+    return limiter
+
+def build_message_payload(message: Message) -> Dict[str, Any]:
+    message_type = message.message_type.value
+    content = dict(message.content)
+    if message_type == "text" and "body" not in content and "text" in content:
+        # Internal replies (AI assistant, flows) carry the text under "text"
+        content = {"body": content["text"]}
+
+    return {
+        "messaging_product": "whatsapp",
+        "recipient_type": "individual",
+        "to": message.to_number,
+        "type": message_type,
+        message_type: content
+    }
+
+def _retry_after(response: Optional[httpx.Response]) -> Optional[float]:
+    if response is not None:
+        retry_after = response.headers.get("Retry-After")
+        if retry_after and retry_after.isdigit():
+            return float(retry_after)
+    return None
+
+def _retry_delay(attempt: int, response: Optional[httpx.Response]) -> float:
+    retry_after = _retry_after(response)
+    if retry_after is not None:
+        return retry_after
+    delay = app_settings.whatsapp_send_backoff * (2 ** attempt)
+    return delay + random.uniform(0, delay / 2)
+
+async def post_message(
+    account: WhatsAppBusinessAccount,
+    payload: Dict[str, Any],
+    deadline: Optional[float] = None
+) -> str:
+    """
+    POST a message to the Graph API for `account`, retrying 429/5xx and
+    transport errors with exponential backoff. Returns the WhatsApp message ID.
+
+    With a `deadline` (a time.monotonic() value) no attempt runs past it: the
+    HTTP timeout is clamped to the time left, and a retry that would only
+    start after it raises a retryable error carrying the wait instead.
+    """
+    access_token = account.meta_access_token or account.api_key
+    if not access_token:
+        raise WhatsAppSendError(f"No access token configured for {account.phone_number_id}")
+
+    client = get_http_client()
+    limiter = get_rate_limiter(account)
+    max_attempts = app_settings.whatsapp_send_max_attempts
+
+    for attempt in range(max_attempts):
+        await limiter.acquire()
+        timeout = app_settings.whatsapp_http_timeout
+        if deadline is not None:
+            timeout = min(timeout, deadline - time.monotonic())
+            if timeout <= 0:
+                raise WhatsAppSendError("Send deadline reached before the request", retryable=True)
+
+        response = None
+        try:
+            response = await client.post(
+                f"/{account.phone_number_id}/messages",
+                headers={"Authorization": f"Bearer {access_token}"},
+                json=payload,
+                timeout=timeout
+            )
+        except httpx.TransportError as e:
+            error = WhatsAppSendError(f"Transport error: {str(e)}", retryable=True)
+        else:
+            if response.status_code < 300:
+                try:
+                    return response.json()["messages"][0]["id"]
+                except (ValueError, KeyError, IndexError, TypeError):
+                    # Meta accepted the message, so sending again would duplicate it
+                    raise WhatsAppSendError(f"Unexpected WhatsApp API response: {response.text}")
+            error = WhatsAppSendError(
+                f"WhatsApp API error: {response.status_code} {response.text}",
+                retryable=response.status_code in RETRYABLE_STATUS_CODES,
+                retry_after=_retry_after(response)
+            )
+
+        if not error.retryable or attempt == max_attempts - 1:
+            raise error
+
+        delay = _retry_delay(attempt, response)
+        if deadline is not None and time.monotonic() + delay >= deadline:
+            error.retry_after = delay
+            raise error
+
+        logger.warning(f"{error}; retrying in {delay:.2f}s")
+        await asyncio.sleep(delay)
+
+    raise WhatsAppSendError("Exhausted retries", retryable=True)
+
+async def _set_status(message_id, status: MessageStatus, whatsapp_message_id: Optional[str] = None):
+    update = {"status": status.value, "updated_at": datetime.utcnow()}
+    if whatsapp_message_id:
+        update["whatsapp_message_id"] = whatsapp_message_id
+    # A late SENT or FAILED must not overwrite a delivery receipt already applied
+    message = await Message.get_motor_collection().find_one_and_update(
+        {"_id": ObjectId(str(message_id)), "status": {"$nin": higher_statuses(status)}},
+        {"$set": update},
+        projection={"tenant_id": 1, "to_number": 1, "assigned_agent_id": 1, "broadcast_id": 1}
+    )
+    # Broadcast deliveries are followed through the broadcast progress endpoint
+    if message and not message.get("broadcast_id"):
+        await realtime_hub.publish([build_event(
+            EventType.MESSAGE_STATUS,
+            message["tenant_id"],
+            {"message_id": str(message_id), "to_number": message.get("to_number"), "status": status.value},
+            message.get("assigned_agent_id")
+        )])
+
+async def mark_failed(message_id):
+    await _set_status(message_id, MessageStatus.FAILED)
+
+async def deliver_message(message_id: str, deadline: Optional[float] = None):
+    """
+    Send a stored message and record the WhatsApp message ID. Raises
+    WhatsAppSendError without touching the status so the caller decides
+    whether to retry or give up. `deadline` bounds the send, see post_message.
+
+    Nothing raises once the Graph API has accepted the message: a failure to
+    record SENT is only logged, since retrying would send it twice.
     """
     message = await Message.get(message_id)
     if not message:
-        logger.error(f"Message {message_id} not found")
+        raise WhatsAppSendError(f"Message {message_id} not found")
+
+    routed = await tenant_routing.resolve(message.whatsapp_account_id)
+    if not routed or routed.tenant_id != message.tenant_id:
+        raise WhatsAppSendError(f"Unknown WhatsApp account {message.whatsapp_account_id}")
+
+    logger.info(f"Sending message {message_id} to {message.to_number}")
+    whatsapp_message_id = await post_message(routed.account, build_message_payload(message), deadline)
+    try:
+        await _set_status(message.id, MessageStatus.SENT, whatsapp_message_id)
+    except Exception as e:
+        logger.error(f"Message {message_id} sent as {whatsapp_message_id} but its status was not recorded: {str(e)}")
         return
-    
+    logger.info(f"Message {message_id} sent successfully")
+
+async def send_whatsapp_message(message_id: str):
+    """
+    Send a WhatsApp message using the WhatsApp Business API
+    """
     try:
-        logger.info(f"Sending message {message_id} to {message.to_number}")
-        
-        message.status = MessageStatus.SENT
-        message.whatsapp_message_id = f"whatsapp-mock-id-{message_id}"
-        message.updated_at = datetime.utcnow()
-        await message.save()
-        
-        logger.info(f"Message {message_id} sent successfully")
+        await deliver_message(message_id)
         return True
     except Exception as e:
         logger.error(f"Error sending message {message_id}: {str(e)}")
-        
-        message.status = MessageStatus.FAILED
-        message.updated_at = datetime.utcnow()
-        await message.save()
-        
+        await mark_failed(message_id)
         return False
@@ -0,0 +1,49 @@
+"""
+Standalone outbox worker.
+
+Usage:
+    python -m app.worker [--concurrency N] [--lane transactional|broadcast ...]
+
+Run one or more of these next to the API (with OUTBOX_EMBEDDED_WORKER=false)
+to scale message delivery independently of the web workers.
+"""
+import argparse
+import asyncio
+import logging
+
+from app.core.config import app_settings
+from app.db.database import init_db
+from app.models.outbox import OutboxPriority
+from app.services.outbox import OutboxWorker
+from app.services.whatsapp import close_http_client
+
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
+)
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Drain the outbound message outbox")
+    parser.add_argument("--concurrency", type=int, default=app_settings.outbox_concurrency)
+    parser.add_argument(
+        "--lane",
+        action="append",
+        choices=[priority.name.lower() for priority in OutboxPriority],
+        help="Only drain these priority lanes (default: all)"
+    )
+    return parser.parse_args()
+
+async def main():
+    args = parse_args()
+    await init_db(app_settings)
+
+    priorities = [OutboxPriority[lane.upper()] for lane in args.lane] if args.lane else None
+    worker = OutboxWorker(concurrency=args.concurrency, priorities=priorities)
+    try:
+        await worker.run_forever()
+    finally:
+        await worker.stop()
+        await close_http_client()
+
+if __name__ == "__main__":
+    asyncio.run(main())
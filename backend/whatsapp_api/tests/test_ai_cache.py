@@ -0,0 +1,53 @@
+import time
+
+from app.services.ai_cache import AIReplyCache, cache_text
+
+OPENAI = ("openai", "gpt-4o-mini", 0.7)
+DEEPSEEK = ("deepseek", "http://deepseek.local/v1/chat/completions", 0.7)
+
+def test_cache_text_ignores_case_accents_and_punctuation():
+    assert cache_text("Prix ?") == cache_text("prix") == cache_text("  PRIX!!") == "prix"
+    assert cache_text("Épicerie, ouverte?") == "epicerie ouverte"
+    assert cache_text("?!") == ""
+
+def test_exact_hits_share_one_reply():
+    cache = AIReplyCache(maxsize=10, ttl=60, similarity=0)
+    cache.set("t1", "Prix ?", OPENAI, "100 MRU")
+    assert cache.get("t1", "PRIX!", OPENAI) == "100 MRU"
+    assert cache.get("t1", "prix", DEEPSEEK) is None
+    assert cache.stats("t1")["hits"] == 1
+    assert cache.stats("t1")["misses"] == 1
+
+def test_tenants_are_isolated():
+    cache = AIReplyCache(maxsize=1, ttl=60, similarity=0)
+    cache.set("t1", "hours", OPENAI, "9 to 5")
+    cache.set("t2", "hours", OPENAI, "always open")
+    cache.set("t2", "price", OPENAI, "free")  # Evicts within t2 only
+    assert cache.get("t1", "hours", OPENAI) == "9 to 5"
+    assert cache.get("t2", "hours", OPENAI) is None
+    cache.clear("t1")
+    assert cache.get("t1", "hours", OPENAI) is None
+
+def test_entries_expire(monkeypatch):
+    cache = AIReplyCache(maxsize=10, ttl=60, similarity=0)
+    cache.set("t1", "hours", OPENAI, "9 to 5")
+    later = time.monotonic() + 61
+    monkeypatch.setattr(time, "monotonic", lambda: later)
+    assert cache.get("t1", "hours", OPENAI) is None
+
+def test_near_hits_need_enough_word_overlap():
+    cache = AIReplyCache(maxsize=10, ttl=60, similarity=0.6)
+    cache.set("t1", "what are your opening hours", OPENAI, "9 to 5")
+    assert cache.get("t1", "what are your opening hours today", OPENAI) == "9 to 5"
+    assert cache.get("t1", "what is the price", OPENAI) is None
+    assert cache.get("t1", "what are your opening hours today", DEEPSEEK) is None
+    stats = cache.stats()
+    assert (stats["near_hits"], stats["misses"]) == (1, 2)
+    assert stats["hit_rate"] == round(1 / 3, 4)
+
+def test_empty_messages_and_replies_are_not_cached():
+    cache = AIReplyCache(maxsize=10, ttl=60, similarity=0)
+    cache.set("t1", "?", OPENAI, "anything")
+    cache.set("t1", "hello", OPENAI, "")
+    assert cache.stats("t1")["entries"] == 0
+    assert cache.get("t1", "?", OPENAI) is None
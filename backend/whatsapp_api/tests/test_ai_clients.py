@@ -0,0 +1,73 @@
+import time
+
+from app.services.ai_clients import AIClientPool, CircuitBreaker
+
+def _open(breaker):
+    for _ in range(breaker.failure_threshold):
+        assert breaker.allow()
+        breaker.record_failure()
+
+def test_opens_after_consecutive_failures():
+    breaker = CircuitBreaker(failure_threshold=3, reset_timeout=60)
+    breaker.record_failure()
+    breaker.record_failure()
+    breaker.record_success()
+    assert breaker.failures == 0
+    assert breaker.state == CircuitBreaker.CLOSED
+
+    _open(breaker)
+    assert breaker.state == CircuitBreaker.OPEN
+    assert not breaker.allow()
+
+def test_half_open_lets_a_single_trial_through(monkeypatch):
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=30)
+    _open(breaker)
+    later = time.monotonic() + 31
+    monkeypatch.setattr(time, "monotonic", lambda: later)
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    assert breaker.allow()
+    assert not breaker.allow()
+
+    breaker.record_success()
+    assert breaker.state == CircuitBreaker.CLOSED
+    assert breaker.allow()
+
+def test_failed_trial_opens_the_circuit_again(monkeypatch):
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=30)
+    _open(breaker)
+    later = time.monotonic() + 31
+    monkeypatch.setattr(time, "monotonic", lambda: later)
+    assert breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+    assert not breaker.allow()
+
+def test_abandoned_trial_frees_the_slot(monkeypatch):
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=30)
+    _open(breaker)
+    later = time.monotonic() + 31
+    monkeypatch.setattr(time, "monotonic", lambda: later)
+    assert breaker.allow()
+    breaker.abandon()
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    assert breaker.allow()
+
+def test_breakers_are_per_endpoint_and_credential():
+    pool = AIClientPool(breaker_failures=1, breaker_reset=60)
+    url = "https://api.openai.com/v1/chat/completions"
+    endpoint = pool.endpoint(url)
+    assert endpoint == "https://api.openai.com"
+
+    tenant_a = {"Authorization": "Bearer key-a"}
+    tenant_b = {"Authorization": "Bearer key-b"}
+    assert pool.breaker_key(endpoint, tenant_a) != pool.breaker_key(endpoint, tenant_b)
+    assert "key-a" not in pool.breaker_key(endpoint, tenant_a)
+    assert pool.breaker_key(endpoint) == endpoint
+
+    pool.breaker(pool.breaker_key(endpoint, tenant_a)).record_failure()
+    assert not pool.is_available(url, tenant_a)
+    assert pool.is_available(url, tenant_b)
+
+    stats = pool.stats()
+    assert list(stats) == [endpoint]
+    assert stats[endpoint]["open_circuits"] == 1
@@ -0,0 +1,126 @@
+from datetime import datetime, timedelta
+
+import pytest
+from bson import ObjectId
+
+from app.models.flow import ActionType, ChatFlow, FlowEdge, FlowNode
+from app.services.flow_engine import CompiledFlow, EvaluationContext, FlowCompileError, compile_condition
+
+def _node(node_id, node_type, config):
+    return FlowNode(id=node_id, type=node_type, config=config, position={"x": 0, "y": 0})
+
+def _edge(source, target, label=None):
+    return FlowEdge(id=f"{source}-{target}", source=source, target=target, label=label)
+
+def _flow(nodes, edges):
+    # model_construct: CompiledFlow only reads the document, no database is needed
+    return CompiledFlow(ChatFlow.model_construct(
+        id=ObjectId(), tenant_id="t1", name="flow", nodes=nodes, edges=edges, updated_at=datetime(2026, 1, 1)
+    ))
+
+def _quote_flow():
+    return _flow(
+        [
+            _node("trigger", "trigger", {"type": "keyword", "keywords": ["price"]}),
+            _node("ask", "action", {"type": "send_message", "message": "Hi {{name|friend}}, want a quote?"}),
+            _node("answer", "condition", {"field": "message", "operator": "contains", "value": "yes"}),
+            _node("quote", "action", {"type": "send_message", "message": "Here it is"}),
+            _node("tag", "action", {"type": "update_crm", "fields": {"lead": "hot"}}),
+            _node("agent", "action", {"type": "handoff", "agent_id": "a1"}),
+            _node("after_agent", "action", {"type": "send_message", "message": "never sent"}),
+        ],
+        [
+            _edge("trigger", "ask"),
+            _edge("ask", "answer"),
+            _edge("answer", "quote", "yes"),
+            _edge("quote", "tag"),
+            _edge("answer", "agent", "no"),
+            _edge("agent", "after_agent"),
+        ]
+    )
+
+def test_run_stops_at_a_condition_after_sending():
+    flow = _quote_flow()
+    run = flow.run("trigger", EvaluationContext("price please", "text"))
+    assert [action.node_id for action in run.actions] == ["ask"]
+    assert run.state.flow_id == flow.id
+    assert run.state.node_id == "answer"
+    assert run.state.resume_at is None
+    assert flow.needs_contact
+
+def test_reply_takes_the_matching_branch():
+    flow = _quote_flow()
+    run = flow.run("answer", EvaluationContext("YES please", "text"))
+    assert [action.node_id for action in run.actions] == ["quote", "tag"]
+    assert run.state is None
+    assert run.actions[1].type == ActionType.UPDATE_CRM
+
+def test_handoff_ends_the_run():
+    run = _quote_flow().run("answer", EvaluationContext("no thanks", "text"))
+    assert [action.node_id for action in run.actions] == ["agent"]
+    assert run.state is None
+
+def test_delayed_action_waits_for_the_scheduler():
+    flow = _flow(
+        [
+            _node("trigger", "trigger", {"type": "keyword", "keywords": ["hi"]}),
+            _node("now", "action", {"type": "send_message", "message": "Hello"}),
+            _node("later", "action", {"type": "send_message", "message": "Still there?", "delay_minutes": 60}),
+        ],
+        [_edge("trigger", "now"), _edge("now", "later")]
+    )
+    before = datetime.utcnow()
+    run = flow.run("trigger", EvaluationContext("hi", "text"))
+    assert [action.node_id for action in run.actions] == ["now"]
+    assert run.state.node_id == "later"
+    assert before + timedelta(minutes=60) <= run.state.resume_at <= datetime.utcnow() + timedelta(minutes=60)
+
+    resumed = flow.run("later", EvaluationContext("", ""), resumed=True)
+    assert [action.node_id for action in resumed.actions] == ["later"]
+    assert resumed.state is None
+
+def test_cycles_are_cut():
+    flow = _flow(
+        [
+            _node("trigger", "trigger", {"type": "keyword", "keywords": ["loop"]}),
+            _node("a", "action", {"type": "update_crm", "fields": {"seen": "1"}}),
+            _node("b", "action", {"type": "update_crm", "fields": {"seen": "2"}}),
+        ],
+        [_edge("trigger", "a"), _edge("a", "b"), _edge("b", "a")]
+    )
+    run = flow.run("trigger", EvaluationContext("loop", "text"))
+    assert [action.node_id for action in run.actions] == ["a", "b"]
+
+@pytest.mark.parametrize("config, text, contact, expected", [
+    ({"operator": "equals", "value": "Oui"}, "  OUI ", None, True),
+    ({"operator": "starts_with", "value": "prix"}, "Prix svp", None, True),
+    ({"operator": "in", "value": ["yes", "ok"]}, "OK", None, True),
+    ({"operator": "regex", "value": r"^\d{4}$"}, "2026", None, True),
+    ({"field": "custom_age", "operator": "gte", "value": 18}, "", {"custom_fields": {"age": "21"}}, True),
+    ({"field": "custom_age", "operator": "gte", "value": 18}, "", {"custom_fields": {"age": "n/a"}}, False),
+    ({"field": "variant_tier", "operator": "exists"}, "", {"variant_field_values": {"tier": "gold"}}, True),
+    ({"field": "name", "operator": "not_exists"}, "", {}, True),
+])
+def test_conditions(config, text, contact, expected):
+    predicate, _ = compile_condition(config)
+    assert predicate(EvaluationContext(text, "text", contact)) is expected
+
+@pytest.mark.parametrize("config", [
+    {"field": "unknown"},
+    {"operator": "like"},
+    {"operator": "regex", "value": "("},
+    {"operator": "gt", "value": "many"},
+])
+def test_invalid_conditions_are_rejected(config):
+    with pytest.raises(FlowCompileError):
+        compile_condition(config)
+
+@pytest.mark.parametrize("config", [
+    {"type": "update_crm", "fields": {"a.b": "x"}},
+    {"type": "update_crm", "fields": {"$set": "x"}},
+    {"type": "webhook", "url": "file:///etc/passwd"},
+    {"type": "send_message", "message": "hi", "delay_minutes": -1},
+])
+def test_invalid_actions_are_rejected(config):
+    with pytest.raises(FlowCompileError):
+        _flow([_node("action", "action", config)], [])
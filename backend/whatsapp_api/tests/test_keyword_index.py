@@ -0,0 +1,54 @@
+from app.services.keyword_index import KeywordAutomaton, normalize_text
+
+def _build(*keywords):
+    automaton = KeywordAutomaton()
+    for keyword in keywords:
+        automaton.add(keyword, keyword)
+    return automaton
+
+def test_normalize_text_folds_case_accents_and_whitespace():
+    assert normalize_text("  Épicerie\tOUVERTE ") == "epicerie ouverte"
+    assert normalize_text("ÉPICERIE") == normalize_text("epicerie")
+
+def test_normalize_text_folds_arabic_variants():
+    assert normalize_text("أهلا") == normalize_text("اهلا")
+    assert normalize_text("مدرسة") == "مدرسه"
+    assert normalize_text("سـلام") == "سلام"
+    assert normalize_text("٣٤") == "34"
+
+def test_add_rejects_keywords_that_normalise_to_nothing():
+    automaton = KeywordAutomaton()
+    assert not automaton.add("   ", "blank")
+    assert automaton.add("hi", "hi")
+    assert automaton.size == 1
+
+def test_matches_whole_words_only():
+    automaton = _build("hi")
+    assert [payload for _, _, payload in automaton.search("hi there")] == ["hi"]
+    assert automaton.search("this") == []
+    assert automaton.search("hit") == []
+
+def test_reports_positions_of_every_occurrence():
+    automaton = _build("price")
+    assert [(start, end) for start, end, _ in automaton.search("price? price!")] == [(0, 5), (7, 12)]
+
+def test_overlapping_keywords_are_all_reported():
+    automaton = _build("he", "she", "hers", "his")
+    assert sorted(payload for _, _, payload in automaton.search("ushers she his")) == ["his", "she"]
+    assert sorted(payload for _, _, payload in automaton.search("she hers")) == ["hers", "she"]
+
+def test_multi_word_keywords_match_across_spaces():
+    automaton = _build("opening hours", "hours")
+    matches = automaton.search("What are your OPENING   hours?")
+    assert sorted(payload for _, _, payload in matches) == ["hours", "opening hours"]
+
+def test_matches_accented_and_arabic_text():
+    automaton = _build("épicerie", "سعر")
+    assert [payload for _, _, payload in automaton.search("EPICERIE du coin")] == ["épicerie"]
+    assert [payload for _, _, payload in automaton.search("ما هو السعر و سعر")] == ["سعر"]
+
+def test_keywords_added_after_a_search_are_matched():
+    automaton = _build("hello")
+    assert automaton.search("hello bye") != []
+    automaton.add("bye", "bye")
+    assert sorted(payload for _, _, payload in automaton.search("hello bye")) == ["bye", "hello"]
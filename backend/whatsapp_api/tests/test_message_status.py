@@ -0,0 +1,65 @@
+from datetime import datetime
+
+from app.models.message import MessageStatus
+from app.services.message_status import (
+    MessageStatusApplier,
+    StatusUpdate,
+    higher_statuses,
+    lower_statuses,
+    parse_status,
+)
+
+NOW = datetime(2026, 3, 1, 12, 0)
+
+def _update(whatsapp_message_id, status, tenant_id="t1"):
+    return StatusUpdate(whatsapp_message_id, status, NOW, "22236123456", tenant_id, "pn")
+
+def test_status_ladder():
+    assert lower_statuses(MessageStatus.SENT) == []
+    assert set(lower_statuses(MessageStatus.READ)) == {"sent", "failed", "delivered"}
+    assert higher_statuses(MessageStatus.READ) == []
+    assert set(higher_statuses(MessageStatus.SENT)) == {"failed", "delivered", "read"}
+    assert set(higher_statuses(MessageStatus.FAILED)) == {"delivered", "read"}
+
+def test_parse_status():
+    update = parse_status({"id": "wamid.1", "status": "delivered", "timestamp": "1767225600", "recipient_id": "222"}, "t1", "pn", NOW)
+    assert update.status == MessageStatus.DELIVERED
+    assert update.timestamp == datetime(2026, 1, 1)
+    assert parse_status({"id": "wamid.1", "status": "deleted"}, "t1", "pn", NOW) is None
+    assert parse_status({"status": "read"}, "t1", "pn", NOW) is None
+    assert parse_status({"id": "wamid.1", "status": "read"}, "t1", "pn", NOW).timestamp == NOW
+
+def test_coalesce_keeps_the_highest_status_per_message():
+    applier = MessageStatusApplier()
+    fresh = applier.coalesce([
+        _update("w1", MessageStatus.DELIVERED),
+        _update("w1", MessageStatus.READ),
+        _update("w1", MessageStatus.DELIVERED),
+        _update("w2", MessageStatus.FAILED),
+    ])
+    assert {(update.whatsapp_message_id, update.status) for update in fresh} == {
+        ("w1", MessageStatus.READ),
+        ("w2", MessageStatus.FAILED),
+    }
+    assert applier.received == 4
+    assert applier.coalesced == 2
+
+def test_coalesce_drops_sent_receipts():
+    applier = MessageStatusApplier()
+    assert applier.coalesce([_update("w1", MessageStatus.SENT)]) == []
+    assert applier.dropped_in_memory == 1
+
+def test_coalesce_drops_receipts_that_cannot_advance_an_applied_status():
+    applier = MessageStatusApplier()
+    applier._applied.set(("t1", "w1"), 2)  # Delivered
+    fresh = applier.coalesce([
+        _update("w1", MessageStatus.DELIVERED),
+        _update("w1", MessageStatus.READ, tenant_id="t2"),
+    ])
+    assert [(update.tenant_id, update.status) for update in fresh] == [("t2", MessageStatus.READ)]
+    assert [update.status for update in applier.coalesce([_update("w1", MessageStatus.READ)])] == [MessageStatus.READ]
+
+def test_coalesce_keeps_tenants_apart():
+    applier = MessageStatusApplier()
+    fresh = applier.coalesce([_update("w1", MessageStatus.READ, "t1"), _update("w1", MessageStatus.DELIVERED, "t2")])
+    assert sorted((update.tenant_id, update.status.value) for update in fresh) == [("t1", "read"), ("t2", "delivered")]
@@ -0,0 +1,51 @@
+from datetime import datetime
+
+import pytest
+from bson import ObjectId
+
+from app.services.pagination import (
+    InvalidCursorError,
+    decode_cursor,
+    encode_cursor,
+    encode_id_cursor,
+    id_keyset_filter,
+    keyset_filter,
+)
+
+def test_cursor_round_trips():
+    created_at = datetime(2026, 3, 1, 12, 30, 15, 123000)
+    document_id = ObjectId()
+    cursor = encode_cursor(created_at, document_id)
+    assert "=" not in cursor
+    assert decode_cursor(cursor) == (created_at, document_id)
+
+@pytest.mark.parametrize("cursor", ["", "not-a-cursor", "W10", encode_id_cursor(ObjectId())])
+def test_decode_rejects_malformed_cursors(cursor):
+    with pytest.raises(InvalidCursorError):
+        decode_cursor(cursor)
+
+def test_keyset_filter_without_cursor_is_empty():
+    assert keyset_filter("created_at", None) == {}
+    assert id_keyset_filter(None) == {}
+
+def test_keyset_filter_breaks_ties_on_id():
+    created_at = datetime(2026, 3, 1)
+    document_id = ObjectId()
+    cursor = encode_cursor(created_at, document_id)
+    assert keyset_filter("created_at", cursor) == {"$or": [
+        {"created_at": {"$lt": created_at}},
+        {"created_at": created_at, "_id": {"$lt": document_id}},
+    ]}
+    assert keyset_filter("created_at", cursor, descending=False) == {"$or": [
+        {"created_at": {"$gt": created_at}},
+        {"created_at": created_at, "_id": {"$gt": document_id}},
+    ]}
+
+def test_id_cursor_round_trips():
+    document_id = ObjectId()
+    assert id_keyset_filter(encode_id_cursor(document_id)) == {"_id": {"$gt": document_id}}
+
+@pytest.mark.parametrize("cursor", ["%%%", "AAAA"])
+def test_id_keyset_filter_rejects_malformed_cursors(cursor):
+    with pytest.raises(InvalidCursorError):
+        id_keyset_filter(cursor)
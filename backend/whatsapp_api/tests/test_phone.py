@@ -0,0 +1,29 @@
+import pytest
+
+from app.services.phone import InvalidPhoneNumberError, normalize_phone_number
+
+@pytest.mark.parametrize("raw, expected", [
+    ("+222 36 12 34 56", "+22236123456"),
+    ("+222-36-12-34-56", "+22236123456"),
+    ("(+222) 36.12.34.56", "+22236123456"),
+    ("0022236123456", "+22236123456"),
+    ("22236123456", "+22236123456"),
+])
+def test_international_numbers(raw, expected):
+    assert normalize_phone_number(raw) == expected
+
+def test_national_numbers_get_the_default_country_code():
+    assert normalize_phone_number("36123456", "222") == "+22236123456"
+    assert normalize_phone_number("0612345678", "+33") == "+33612345678"
+    # An international prefix wins over the default
+    assert normalize_phone_number("+212600000001", "33") == "+212600000001"
+
+@pytest.mark.parametrize("raw", ["0612345678", "+0612345678", "00 0612345678"])
+def test_trunk_prefixed_numbers_without_a_country_code_are_rejected(raw):
+    with pytest.raises(InvalidPhoneNumberError):
+        normalize_phone_number(raw)
+
+@pytest.mark.parametrize("raw", [None, "", "+", "1234567", "+1234567890123456", "+222 36 12 34 5x"])
+def test_invalid_numbers_are_rejected(raw):
+    with pytest.raises(InvalidPhoneNumberError):
+        normalize_phone_number(raw)
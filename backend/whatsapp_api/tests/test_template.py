@@ -0,0 +1,60 @@
+from app.services.template import CompiledContent, CompiledTemplate, contact_projection
+
+CONTACT = {
+    "name": "Aminata",
+    "phone_number": "+22236123456",
+    "custom_fields": {"city": "Nouakchott", "tier": "silver"},
+    "variant_field_values": {"tier": "gold"},
+}
+
+def test_static_template_renders_its_source():
+    template = CompiledTemplate("Hello everyone")
+    assert template.is_static
+    assert template.fields == set()
+    assert template.render(CONTACT) == "Hello everyone"
+
+def test_placeholders_are_filled_from_the_contact():
+    template = CompiledTemplate("Hi {{ name }}, your number is {{phone_number}}")
+    assert template.fields == {"name", "phone_number"}
+    assert template.render(CONTACT) == "Hi Aminata, your number is +22236123456"
+
+def test_variant_values_win_over_custom_fields():
+    assert CompiledTemplate("{{tier}} in {{city}}").render(CONTACT) == "gold in Nouakchott"
+
+def test_missing_values_use_the_default():
+    template = CompiledTemplate("Hi {{name|friend}}, {{plan | none yet}}{{unknown}}!")
+    assert template.render({}) == "Hi friend, none yet!"
+    assert template.render(CONTACT) == "Hi Aminata, none yet!"
+
+def test_builtins_are_not_read_from_the_document_for_other_fields():
+    assert CompiledTemplate("{{created_at}}").render({"created_at": "2026-01-01"}) == ""
+
+def test_content_renders_nested_structures():
+    content = CompiledContent({
+        "body": "Hello {{name}}",
+        "buttons": [{"title": "Yes"}, {"title": "{{city|here}}"}],
+        "preview_url": False,
+    })
+    assert not content.is_static
+    assert content.fields == {"name", "city"}
+    assert content.render(CONTACT) == {
+        "body": "Hello Aminata",
+        "buttons": [{"title": "Yes"}, {"title": "Nouakchott"}],
+        "preview_url": False,
+    }
+
+def test_static_content_is_shared_between_renders():
+    body = {"body": "Same for all", "buttons": [{"title": "OK"}]}
+    content = CompiledContent(body)
+    assert content.is_static
+    assert content.render(CONTACT) is body
+
+def test_validate_reports_unknown_placeholders():
+    content = CompiledContent({"body": "{{name}} {{tier}} {{plan}} {{nope}}"})
+    assert content.validate({"tier": None}) == ["nope", "plan"]
+    assert content.validate({"tier", "plan", "nope"}) == []
+
+def test_contact_projection_only_loads_fields_when_needed():
+    assert contact_projection(CompiledContent({"body": "static"})) == {"phone_number": 1}
+    assert "custom_fields" in contact_projection(CompiledContent({"body": "{{city}}"}))
+    assert contact_projection(None) == {"phone_number": 1}